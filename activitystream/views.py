@@ -61,7 +61,7 @@ class ActivityStreamView(ListAPIView):
         filter = SubmissionFilter(
             request.GET,
             queryset=Submission.objects.all().exclude(
-                meta__action_name=constants.ACTION_NAME_HCSAT_SUBMISSION
+                action_name=constants.ACTION_NAME_HCSAT_SUBMISSION
             ),
         )
 
@@ -103,7 +103,7 @@ class ActivityStreamDomesticHCSATFeedbackDataView(ActivityStreamView):
         filter = SubmissionFilter(
             request.GET,
             queryset=Submission.objects.all().filter(
-                meta__action_name=constants.ACTION_NAME_HCSAT_SUBMISSION
+                action_name=constants.ACTION_NAME_HCSAT_SUBMISSION
             ),
         )
 
@@ -0,0 +1,31 @@
+"""
+Microbenchmarks for hot paths. They need the same Postgres and Redis as the test suite, e.g.
+
+    ENV_FILES='secrets-do-not-commit,test,dev' python -m benchmarks.ratelimit
+"""
+
+import os
+import time
+
+import django
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    django.setup()
+
+
+def setup_test_database():
+    """Run against a migrated copy of the test database rather than touching real data."""
+    from django.db import connection
+
+    connection.creation.create_test_db(verbosity=0, keepdb=True)
+
+
+def measure(function, iterations):
+    """Return the mean wall time of function in microseconds."""
+    function()  # warm up connections and script caches
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1_000_000
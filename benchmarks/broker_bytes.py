@@ -0,0 +1,56 @@
+"""
+Broker message size per submission: task messages carrying the action kwargs, as queued by older releases,
+against reference-only messages carrying the submission id and action name.
+"""
+
+import argparse
+
+from benchmarks import setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--body-size", type=int, default=20_000, help="Characters in html_body."
+    )
+    options = parser.parse_args()
+
+    setup()
+
+    from kombu.serialization import dumps
+
+    from submission import constants, tasks
+    from submission.models import Submission
+
+    submission = Submission(
+        pk=1,
+        data={
+            "text_body": "x" * (options.body_size // 2),
+            "html_body": f"<p>{'x' * options.body_size}</p>",
+        },
+        meta={
+            "action_name": constants.ACTION_NAME_EMAIL,
+            "subject": "Enquiry",
+            "reply_to": ["reply@example.com"],
+            "recipients": ["to@example.com"],
+        },
+    )
+    submission.action_name = constants.ACTION_NAME_EMAIL
+
+    def full_message():
+        kwargs = {**tasks.get_action_kwargs(submission), "submission_id": submission.pk}
+        return dumps(((), kwargs, {}), serializer="json")[2]
+
+    def reference_message():
+        kwargs = {"submission_id": submission.pk, "action_name": submission.action_name}
+        return dumps(((), kwargs, {}), serializer="json")[2]
+
+    for name, function in [
+        ("kwargs", full_message),
+        ("reference-only", reference_message),
+    ]:
+        print(f"{name}: {len(function())} bytes per message")
+
+
+if __name__ == "__main__":
+    main()
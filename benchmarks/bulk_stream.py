@@ -0,0 +1,75 @@
+"""
+Peak memory allocated while the gov-notify-bulk-email endpoint handles a request, parsing the body into
+request.data and validating it together, and with ?stream=true. Excludes the request body itself. Runs with DEBUG
+off, as Django keeps the SQL of every query with it on.
+
+    ENV_FILES='test,dev' python -m benchmarks.bulk_stream --entries 1000 10000 50000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+import uuid
+
+from benchmarks import setup, setup_test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10_000, 50_000])
+    options = parser.parse_args()
+
+    setup()
+    setup_test_database()
+
+    from django.test import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    from client.models import Client
+    from submission.models import Submission
+
+    client = Client.objects.create(name=f"benchmark-{uuid.uuid4()}")
+    api_client = APIClient()
+    api_client.force_authenticate(user=client)
+    url = reverse("api_v2:gov-notify-bulk-email")
+
+    try:
+        with override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=["testserver"],
+            SIGAUTH_URL_NAMES_WHITELIST=["gov-notify-bulk-email"],
+            DATA_UPLOAD_MAX_MEMORY_SIZE=None,
+            BULK_SUBMISSION_MAX_BYTES=2**40,
+            BULK_SUBMISSION_MAX_ENTRIES=2**40,
+        ):
+            for count in options.entries:
+                body = json.dumps(
+                    {
+                        "template_id": str(uuid.uuid4()),
+                        "bulk_email_entries": [
+                            {"email_address": f"recipient+{i}@example.com", "name": f"Recipient {i}"}
+                            for i in range(count)
+                        ],
+                    }
+                ).encode()
+                for name, query in [("request.data", ""), ("stream", "?stream=true")]:
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    response = api_client.post(url + query, data=body, content_type="application/json")
+                    elapsed = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    assert response.status_code == 201, response.content[:200]
+                    print(
+                        f"{count} entries ({len(body) / 2**20:.1f}MB), {name}: "
+                        f"{(peak - len(body)) / 2**20:.1f}MB peak, {elapsed:.2f}s"
+                    )
+                    Submission.objects.filter(client=client).delete()
+    finally:
+        client.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Queries and wall time to save the entries of a gov-notify-bulk-email request: a SubmissionModelSerializer per
+entry, as GovNotifyBulkEmailAPIView used to, and helpers.bulk_create_submissions.
+
+    ENV_FILES='test,dev' python -m benchmarks.bulk_submissions --entries 1000 10000 100000
+"""
+
+import argparse
+import time
+import uuid
+from types import SimpleNamespace
+
+from benchmarks import setup, setup_test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    options = parser.parse_args()
+
+    setup()
+    setup_test_database()
+
+    from django.db import connection, transaction
+
+    from client.models import Client
+    from submission import constants, helpers, serializers
+    from submission.models import Submission
+
+    client = Client.objects.create(name=f"benchmark-{uuid.uuid4()}")
+    request = SimpleNamespace(user=client)
+    template_id = str(uuid.uuid4())
+
+    def get_meta(entry):
+        return {
+            "action_name": constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+            "template_id": template_id,
+            "email_address": entry["email_address"],
+        }
+
+    def per_entry(entries):
+        for entry in entries:
+            submission = serializers.SubmissionModelSerializer(
+                data={"data": entry, "meta": get_meta(entry)}, context={"request": request}
+            )
+            if submission.is_valid(raise_exception=True):
+                submission.save()
+
+    def bulk(entries):
+        helpers.bulk_create_submissions(
+            Submission(
+                data=entry,
+                meta=get_meta(entry),
+                action_name=constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+                form_url="",
+                client=client,
+            )
+            for entry in entries
+        )
+
+    try:
+        for count in options.entries:
+            entries = [
+                {"email_address": f"recipient+{i}@example.com", "name": f"Recipient {i}"}
+                for i in range(count)
+            ]
+            for name, function in [("bulk_create", bulk), ("per entry", per_entry)]:
+                queries = 0
+
+                def count_query(execute, *args):
+                    nonlocal queries
+                    queries += 1
+                    return execute(*args)
+
+                with connection.execute_wrapper(count_query):
+                    start = time.perf_counter()
+                    with transaction.atomic():
+                        function(entries)
+                    elapsed = time.perf_counter() - start
+                print(f"{count} entries, {name}: {queries} queries, {elapsed:.2f}s")
+                Submission.objects.filter(client=client).delete()
+    finally:
+        client.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cost of marking submissions as sent: get() + save() as SaveSubmissionTask.on_success used to, a single column
+UPDATE per submission, and the Redis buffer flushed with one UPDATE ... WHERE id = ANY(...).
+"""
+
+import argparse
+import time
+
+from benchmarks import setup, setup_test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument(
+        "--body-size", type=int, default=20_000, help="Characters in data."
+    )
+    options = parser.parse_args()
+
+    setup()
+    setup_test_database()
+
+    from django.conf import settings
+
+    from submission import constants, helpers
+    from submission.models import Submission, SubmissionDelivery
+
+    settings.SUBMISSION_STATUS_FLUSH_INTERVAL = 0.25
+    submission_ids = [
+        submission.pk
+        for submission in Submission.objects.bulk_create(
+            Submission(
+                data={"html_body": "x" * options.body_size},
+                meta={"action_name": constants.ACTION_NAME_EMAIL},
+                action_name=constants.ACTION_NAME_EMAIL,
+            )
+            for _ in range(options.submissions)
+        )
+    ]
+
+    SubmissionDelivery.objects.bulk_create(
+        SubmissionDelivery(
+            submission_id=submission_id, action_name=constants.ACTION_NAME_EMAIL
+        )
+        for submission_id in submission_ids
+    )
+
+    def get_and_save(submission_id):
+        submission = Submission.objects.get(id=submission_id)
+        submission.is_sent = True
+        submission.save()
+
+    def single_update(submission_id):
+        helpers.mark_submissions_sent([submission_id])
+
+    try:
+        for name, function, finish in [
+            ("get() + save()", get_and_save, None),
+            ("single column UPDATE", single_update, None),
+            (
+                "buffered UPDATE ... ANY",
+                helpers.sent_status_buffer.add,
+                helpers.sent_status_buffer.flush,
+            ),
+        ]:
+            Submission.objects.filter(id__in=submission_ids).update(is_sent=False)
+            SubmissionDelivery.objects.filter(submission_id__in=submission_ids).update(
+                status=constants.DELIVERY_STATUS_PENDING
+            )
+            start = time.perf_counter()
+            for submission_id in submission_ids:
+                function(submission_id)
+            if finish:
+                finish()
+            elapsed = time.perf_counter() - start
+            assert not Submission.objects.filter(
+                id__in=submission_ids, is_sent=False
+            ).exists()
+            print(f"{name}: {options.submissions / elapsed:.0f} submissions/s")
+    finally:
+        Submission.objects.filter(id__in=submission_ids).delete()
+
+
+if __name__ == "__main__":
+    main()
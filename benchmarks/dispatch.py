@@ -0,0 +1,177 @@
+"""
+Throughput of send_gov_notify_email tasks against a local stub of Notify answering after --latency seconds, run
+the way the prefork pool runs them (one task at a time in each of --processes processes) and the way the gevent
+pool does (up to --concurrency greenlets in each process). Both include the database bookkeeping of
+SaveSubmissionTask. Run each pool in its own process, as gevent has to patch the standard library first:
+
+    ENV_FILES='test,dev' python -m benchmarks.dispatch --pool prefork
+    ENV_FILES='test,dev' python -m benchmarks.dispatch --pool gevent
+
+The gain shows as tasks/s per process: on a machine with fewer cores than --processes both pools run out of CPU.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import time
+import uuid
+
+from benchmarks import setup, setup_test_database
+
+
+def serve_stub_notify(port, latency):
+    import gevent
+    from gevent.pywsgi import WSGIServer
+
+    def application(environ, start_response):
+        gevent.sleep(latency)
+        start_response("201 Created", [("Content-Type", "application/json")])
+        return [json.dumps({"id": str(uuid.uuid4())}).encode()]
+
+    WSGIServer(("127.0.0.1", port), application, log=None).serve_forever()
+
+
+def configure(port):
+    from django.conf import settings
+
+    from submission import helpers
+
+    settings.GOV_NOTIFY_API_KEY = f"benchmark-{uuid.uuid4()}-{uuid.uuid4()}"
+    settings.GOV_NOTIFY_RATE_LIMIT = ""
+
+    def create_client(api_key):
+        client = helpers.create_notify_client(api_key)
+        client.base_url = f"http://127.0.0.1:{port}"
+        client.request_session.mount("http://", client.request_session.get_adapter("https://"))
+        return client
+
+    helpers.notify_client_pool.factory = create_client
+
+
+def build_send():
+    from celery.app.trace import build_tracer
+    from celery.utils import uuid
+
+    from submission import constants, tasks
+
+    # Like the worker, trace every task with one tracer built up front. Task.apply builds one per call, and under
+    # gevent each greenlet would load its own result backend.
+    task = tasks.send_gov_notify_email
+    tracer = build_tracer(task.name, task, app=task.app)
+
+    def send(submission_id):
+        task_id = uuid()
+        kwargs = {"submission_id": submission_id, "action_name": constants.ACTION_NAME_GOV_NOTIFY_EMAIL}
+        tracer(task_id, [], kwargs, {"id": task_id, "task": task.name, "delivery_info": {}})
+
+    return send
+
+
+def send_all(port, submission_ids):
+    from django import db
+
+    configure(port)
+    send = build_send()
+    for submission_id in submission_ids:
+        send(submission_id)
+    db.connections.close_all()
+
+
+def spawn_all(port, submission_ids, concurrency):
+    from gevent.pool import Pool
+
+    from conf.gunicorn import patch_with_psycogreen_gevent
+
+    patch_with_psycogreen_gevent()
+    configure(port)
+    Pool(concurrency).map(build_send(), submission_ids)
+
+
+def run(port, submission_ids, processes, target, *args):
+    from django import db
+
+    # Every process opens its own database connections.
+    db.connections.close_all()
+    workers = [
+        multiprocessing.get_context("fork").Process(target=target, args=(port, submission_ids[i::processes], *args))
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pool", choices=["prefork", "gevent"], required=True)
+    parser.add_argument("--submissions", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds Notify takes to answer.")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=100, help="Greenlets in each gevent process.")
+    parser.add_argument("--port", type=int, default=8765)
+    options = parser.parse_args()
+
+    stub = multiprocessing.get_context("fork").Process(
+        target=serve_stub_notify, args=(options.port, options.latency), daemon=True
+    )
+    stub.start()
+    if options.pool == "gevent":
+        from gevent import monkey
+
+        monkey.patch_all()
+
+    setup()
+    setup_test_database()
+    logging.disable(logging.INFO)
+
+    from django.conf import settings
+
+    from submission import constants
+    from submission.models import Submission, SubmissionDelivery
+
+    settings.PROVIDER_CONCURRENCY = {"notify": options.concurrency}
+    submissions = Submission.objects.bulk_create(
+        Submission(
+            data={"name": "Jim"},
+            meta={
+                "action_name": constants.ACTION_NAME_GOV_NOTIFY_EMAIL,
+                "template_id": str(uuid.uuid4()),
+                "email_address": "jim@example.com",
+            },
+            action_name=constants.ACTION_NAME_GOV_NOTIFY_EMAIL,
+        )
+        for _ in range(options.submissions)
+    )
+    submission_ids = [submission.pk for submission in submissions]
+    SubmissionDelivery.objects.bulk_create(
+        SubmissionDelivery(
+            submission_id=submission_id,
+            action_name=constants.ACTION_NAME_GOV_NOTIFY_EMAIL,
+        )
+        for submission_id in submission_ids
+    )
+
+    try:
+        start = time.perf_counter()
+        if options.pool == "prefork":
+            run(options.port, submission_ids, options.processes, send_all)
+            workers = f"{options.processes} processes"
+        else:
+            run(options.port, submission_ids, options.processes, spawn_all, options.concurrency)
+            workers = f"{options.processes} processes of {options.concurrency} greenlets"
+        elapsed = time.perf_counter() - start
+
+        sent = Submission.objects.filter(id__in=submission_ids, is_sent=True).count()
+        print(
+            f"{options.pool} ({workers}): {sent}/{len(submission_ids)} sent in {elapsed:.1f}s, "
+            f"{sent / elapsed:,.0f} tasks/s"
+        )
+    finally:
+        Submission.objects.filter(id__in=submission_ids).delete()
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
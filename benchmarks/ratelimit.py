@@ -0,0 +1,54 @@
+"""
+Per check cost of the submission rate limit: the RequestFactory + django-ratelimit shim this replaced against
+core.limiter, which makes one Redis round trip per check whatever the number of limits.
+"""
+
+import argparse
+
+from benchmarks import measure, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5000)
+    options = parser.parse_args()
+
+    setup()
+
+    import ratelimit.utils
+    from django.test.client import RequestFactory
+
+    from core import limiter
+
+    rate = "1000000/h"
+
+    def request_factory_shim():
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+        ratelimit.utils.is_ratelimited(
+            request=request, group="benchmark", key="ip", rate=rate, increment=True
+        )
+
+    sliding_window_limiter = limiter.SlidingWindowLimiter(prefix="benchmark")
+
+    def sliding_window():
+        sliding_window_limiter.check([("ip", "10.0.0.1", rate)])
+
+    def sliding_window_all_keys():
+        sliding_window_limiter.check(
+            [
+                ("ip", "10.0.0.1", rate),
+                ("sender", "sender@example.com", rate),
+                ("client", "client", rate),
+            ]
+        )
+
+    for name, function in [
+        ("RequestFactory + django-ratelimit (ip)", request_factory_shim),
+        ("core.limiter (ip)", sliding_window),
+        ("core.limiter (ip, sender and client)", sliding_window_all_keys),
+    ]:
+        print(f"{name}: {measure(function, options.iterations):.1f}us per check")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ class ClientAdmin(admin.ModelAdmin):
         "name",
         "identifier",
         "is_active",
+        "weight",
     )
     list_filter = (
         "created",
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("client", "0005_auto_20190814_1056"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="client",
+            name="weight",
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                help_text=(
+                    "Share of the bulk email workers given to this client while other clients are waiting, "
+                    "relative to the weights of the others."
+                ),
+            ),
+        ),
+    ]
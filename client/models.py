@@ -29,6 +29,13 @@ class Client(core.helpers.TimeStampedModel):
         unique=True,
     )
     is_active = models.BooleanField(default=True)
+    weight = models.PositiveSmallIntegerField(
+        default=1,
+        help_text=(
+            "Share of the bulk email workers given to this client while other clients are waiting, "
+            "relative to the weights of the others."
+        ),
+    )
 
     def __str__(self):
         return str(self.name)
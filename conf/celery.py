@@ -3,7 +3,7 @@ from __future__ import absolute_import, unicode_literals
 import os
 from ssl import CERT_NONE
 
-from celery import Celery
+from celery import Celery, signals
 from celery.schedules import crontab
 from dbt_copilot_python.celery_health_check import healthcheck
 from django.conf import settings
@@ -24,6 +24,18 @@ app.conf.beat_schedule = {
         "task": "submission.tasks.send_gov_notify_bulk_email",
         "schedule": crontab(minute="*/15"),
     },
+    "flush_submission_status_every_10_seconds": {
+        "task": "submission.tasks.flush_submission_status",
+        "schedule": 10.0,
+    },
+    "sweep_submission_deliveries_every_minute": {
+        "task": "submission.tasks.sweep_submission_deliveries",
+        "schedule": crontab(minute="*"),
+    },
+    "relay_submission_outbox_every_minute": {
+        "task": "submission.tasks.relay_submission_outbox",
+        "schedule": crontab(minute="*"),
+    },
 }
 
 if settings.FEATURE_REDIS_USE_SSL:
@@ -36,6 +48,40 @@ if settings.FEATURE_REDIS_USE_SSL:
     app.conf.broker_use_ssl = ssl_conf
     app.conf.redis_backend_use_ssl = ssl_conf
 
+
+def is_gevent_pool():
+    """Whether this worker runs tasks on greenlets (celery worker -P gevent), which patches the socket module."""
+
+    from gevent import monkey
+
+    return monkey.is_module_patched("socket")
+
+
+@signals.worker_init.connect
+def patch_psycopg_for_gevent(**kwargs):
+    # As for gunicorn, database queries must yield to the other greenlets instead of blocking the process.
+    if is_gevent_pool():
+        from conf.gunicorn import patch_with_psycogreen_gevent
+
+        patch_with_psycogreen_gevent()
+
+
+def get_queue_depths():
+    """The number of messages waiting in each queue, by tier, for core.metrics."""
+
+    queues = [
+        (tier, queue)
+        for tier, tier_queues in settings.TASK_QUEUE_TIERS.items()
+        for queue in tier_queues
+    ]
+    with app.connection_for_read() as connection:
+        pipeline = connection.default_channel.client.pipeline()
+        for _, queue in queues:
+            pipeline.llen(queue)
+        depths = pipeline.execute()
+    return {f"{tier}.{queue}": depth for (tier, queue), depth in zip(queues, depths)}
+
+
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
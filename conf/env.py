@@ -59,6 +59,7 @@ class BaseSettings(PydanticBaseSettings):
     zendesk_token_euexit: str
     zendesk_email_euexit: str
     zendesk_custom_field_id_euexit: str
+    zendesk_user_cache_timeout: int = 60 * 60 * 24
 
     email_backend_class_name: str = "default"
 
@@ -68,9 +69,28 @@ class BaseSettings(PydanticBaseSettings):
     email_host_password: str
     email_use_tls: bool = True
     default_from_email: str
+    email_batching_enabled: bool = False
+    email_batch_max_size: int = 50
+    email_batch_linger_seconds: float = 2
 
     feature_redis_use_ssl: bool = False
     celery_always_eager: bool = True
+    submission_outbox_enabled: bool = False
+    submission_outbox_batch_size: int = 100
+    submission_outbox_poll_interval: float = 1
+    submission_outbox_max_attempts: int = 5
+    submission_status_batching_enabled: bool = False
+    submission_status_flush_interval: float = 0.25
+    submission_batch_max_size: int = 500
+    submission_bulk_create_batch_size: int = 1000
+    bulk_submission_max_bytes: int = 6 * 1024 * 1024
+    bulk_submission_max_entries: int = 50_000
+    delivery_retry_backoff: int = 60 * 5
+    delivery_retry_backoff_max: int = 60 * 60 * 6
+    delivery_max_attempts: int = 8
+    delivery_max_attempts_by_action: dict[str, int] = {}
+    delivery_sweep_batch_size: int = 100
+    delivery_lease_ttl: int = 60
 
     gov_notify_api_key: str
     buy_from_uk_enquiry_template_id: str = "b3212b30-6321-46e7-9dba-ad37bd92df89"
@@ -84,8 +104,35 @@ class BaseSettings(PydanticBaseSettings):
     activity_stream_secret_access_key: str
 
     ratelimit_rate: str = "15/h"
+    ratelimit_sender_rate: str = ""
+    ratelimit_client_rate: str = ""
+    blocklist_ip_timeout: int = 60 * 60 * 24
+    gov_notify_rate_limit: str = "3000/m"
+    zendesk_rate_limit: str = "200/m"
+    pardot_rate_limit: str = ""
+    rate_shaping_burst_seconds: float = 1
+    rate_shaping_max_wait: float = 5
+    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_failure_window: int = 60
+    circuit_breaker_recovery_timeout: int = 30
+    provider_concurrency: dict[str, int] = {
+        "notify": 200,
+        "zendesk": 20,
+        "pardot": 50,
+        "email": 20,
+    }
+    gevent_database_connections: int = 10
+
+    pardot_connect_timeout: float = 3.05
+    pardot_read_timeout: float = 10
+    pardot_pool_maxsize: int = 10
+    pardot_max_retries: int = 3
+    pardot_retry_backoff_factor: float = 0.5
 
     submission_filter_hours: int = 72
+    gov_notify_bulk_email_chunk_size: int = 100
+    gov_notify_bulk_email_concurrency: int = 4
+    gov_notify_bulk_email_client_refresh_interval: float = 30
 
 
 class CIEnvironment(BaseSettings):
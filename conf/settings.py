@@ -330,6 +330,8 @@ ZENDESK_CREDENTIALS = {
         "custom_field_id": env.zendesk_custom_field_id_euexit,
     },
 }
+# How long (in seconds) to remember the Zendesk user id of an email address.
+ZENDESK_USER_CACHE_TIMEOUT = env.zendesk_user_cache_timeout
 
 # Email
 EMAIL_BACKED_CLASSES = {
@@ -344,6 +346,11 @@ EMAIL_HOST_USER = env.email_host_user
 EMAIL_HOST_PASSWORD = env.email_host_password
 EMAIL_USE_TLS = env.email_use_tls
 DEFAULT_FROM_EMAIL = env.default_from_email
+# When enabled email actions are queued and delivered in batches of up to EMAIL_BATCH_MAX_SIZE over one SMTP
+# connection per worker, waiting at most EMAIL_BATCH_LINGER_SECONDS for a batch to fill.
+EMAIL_BATCHING_ENABLED = env.email_batching_enabled
+EMAIL_BATCH_MAX_SIZE = env.email_batch_max_size
+EMAIL_BATCH_LINGER_SECONDS = env.email_batch_linger_seconds
 
 # Celery
 # separate to REDIS_URL as needs to start with 'redis' and SSL conf
@@ -357,6 +364,74 @@ CELERY_TIMEZONE = "UTC"
 CELERY_BROKER_POOL_LIMIT = None
 FEATURE_REDIS_USE_SSL = env.feature_redis_use_ssl
 CELERY_TASK_ALWAYS_EAGER = env.celery_always_eager
+# Each action and background job has its own queue, so a bulk campaign or report never holds up a contact form.
+# Queues are grouped into tiers, each served by a separately sized worker pool (see Procfile).
+CELERY_TASK_DEFAULT_QUEUE = "celery"
+CELERY_TASK_ROUTES = {
+    "submission.tasks.create_zendesk_ticket": {"queue": "zendesk"},
+    "submission.tasks.send_email": {"queue": "email"},
+    "submission.tasks.send_email_batch": {"queue": "email"},
+    "submission.tasks.send_gov_notify_email": {"queue": "gov-notify-email"},
+    "submission.tasks.send_gov_notify_letter": {"queue": "gov-notify-letter"},
+    "submission.tasks.send_pardot": {"queue": "pardot"},
+    "submission.tasks.no_operation": {"queue": "no-operation"},
+    "submission.tasks.sweep_submission_deliveries": {"queue": "sweeper"},
+    "submission.tasks.relay_submission_outbox": {"queue": "outbox"},
+    "submission.tasks.flush_submission_status": {"queue": "status"},
+    "submission.tasks.send_gov_notify_bulk_email": {"queue": "gov-notify-bulk-email"},
+    "submission.tasks.send_gov_notify_bulk_email_chunks": {"queue": "gov-notify-bulk-email"},
+    "submission.tasks.send_buy_from_uk_enquiries_as_csv": {"queue": "reports"},
+}
+# In priority order.
+TASK_QUEUE_TIERS = {
+    "interactive": [
+        "zendesk",
+        "email",
+        "gov-notify-email",
+        "gov-notify-letter",
+        "pardot",
+        "no-operation",
+        "sweeper",
+        "outbox",
+        "status",
+        CELERY_TASK_DEFAULT_QUEUE,
+    ],
+    "bulk": ["gov-notify-bulk-email"],
+    "reports": ["reports"],
+}
+# When enabled submission actions are written to an outbox table in the same transaction as the submission
+# and published to the broker by the relay_outbox command, SUBMISSION_OUTBOX_BATCH_SIZE at a time, so the API
+# never waits on the broker. The relay polls every SUBMISSION_OUTBOX_POLL_INTERVAL seconds when idle.
+SUBMISSION_OUTBOX_ENABLED = env.submission_outbox_enabled
+SUBMISSION_OUTBOX_BATCH_SIZE = env.submission_outbox_batch_size
+SUBMISSION_OUTBOX_POLL_INTERVAL = env.submission_outbox_poll_interval
+# Failures after which a message that cannot be published, other than while the broker is unavailable, is
+# removed and its delivery marked as dead.
+SUBMISSION_OUTBOX_MAX_ATTEMPTS = env.submission_outbox_max_attempts
+# When enabled the ids of submissions whose action completed are collected in Redis and marked as sent with one
+# UPDATE at most every SUBMISSION_STATUS_FLUSH_INTERVAL seconds, rather than one UPDATE per submission.
+SUBMISSION_STATUS_BATCHING_ENABLED = env.submission_status_batching_enabled
+SUBMISSION_STATUS_FLUSH_INTERVAL = env.submission_status_flush_interval
+# The most submissions accepted in one request to the api/submission/batch/ endpoint.
+SUBMISSION_BATCH_MAX_SIZE = env.submission_batch_max_size
+# Rows inserted by each INSERT when the batch and V2 endpoints create many submissions at once.
+SUBMISSION_BULK_CREATE_BATCH_SIZE = env.submission_bulk_create_batch_size
+# Limits on requests to the V2 bulk endpoints, checked before their entries are parsed. Requests are also bound by
+# DATA_UPLOAD_MAX_MEMORY_SIZE, as their signatures are checked against the whole body.
+BULK_SUBMISSION_MAX_BYTES = env.bulk_submission_max_bytes
+BULK_SUBMISSION_MAX_ENTRIES = env.bulk_submission_max_entries
+# Undelivered submissions are retried by the sweep_submission_deliveries task, DELIVERY_SWEEP_BATCH_SIZE at a
+# time, after DELIVERY_RETRY_BACKOFF seconds doubling with every attempt up to DELIVERY_RETRY_BACKOFF_MAX. After
+# DELIVERY_MAX_ATTEMPTS, which can be overridden per action name in DELIVERY_MAX_ATTEMPTS_BY_ACTION (JSON), they
+# are given up on and marked as dead.
+DELIVERY_RETRY_BACKOFF = env.delivery_retry_backoff
+DELIVERY_RETRY_BACKOFF_MAX = env.delivery_retry_backoff_max
+DELIVERY_MAX_ATTEMPTS = env.delivery_max_attempts
+DELIVERY_MAX_ATTEMPTS_BY_ACTION = env.delivery_max_attempts_by_action
+DELIVERY_SWEEP_BATCH_SIZE = env.delivery_sweep_batch_size
+# Seconds before an attempt to send a submission is presumed dead, once its worker stops renewing its lease, and
+# another attempt may be made. See SaveSubmissionTask.
+DELIVERY_LEASE_TTL = env.delivery_lease_ttl
 
 # Gov UK Notify
 GOV_NOTIFY_API_KEY = env.gov_notify_api_key
@@ -375,11 +450,55 @@ FEATURE_TEST_API_ENABLED = env.feature_test_api_enabled
 ACTIVITY_STREAM_ACCESS_KEY_ID = env.activity_stream_access_key_id
 ACTIVITY_STREAM_SECRET_ACCESS_KEY = env.activity_stream_secret_access_key
 
+# Pardot
+# Timeouts are in seconds. PARDOT_POOL_MAXSIZE bounds the connections kept open to each Pardot host, and only
+# failures where Pardot cannot have processed the request (connection errors and 429s) are retried.
+PARDOT_CONNECT_TIMEOUT = env.pardot_connect_timeout
+PARDOT_READ_TIMEOUT = env.pardot_read_timeout
+PARDOT_POOL_MAXSIZE = env.pardot_pool_maxsize
+PARDOT_MAX_RETRIES = env.pardot_max_retries
+PARDOT_RETRY_BACKOFF_FACTOR = env.pardot_retry_backoff_factor
+
 # Ratelimit config
-# Set RATELIMIT_ENABLE to enable/disable
-# the number of requests per unit time allowed in (s/m/h/d)
+# the number of submissions per unit time allowed in (s/m/h/d) from one IP address, sender email address and
+# client. An empty rate disables that limit.
 RATELIMIT_RATE = env.ratelimit_rate
+RATELIMIT_SENDER_RATE = env.ratelimit_sender_rate
+RATELIMIT_CLIENT_RATE = env.ratelimit_client_rate
+# How long (in seconds) an IP address that exceeded RATELIMIT_RATE is refused without touching the database.
+BLOCKLIST_IP_TIMEOUT = env.blocklist_ip_timeout
+
+# Rate shaping
+# Calls to each provider credential (Notify API key, Zendesk subdomain, Pardot host) are limited to these rates
+# across all workers. A bucket holds RATE_SHAPING_BURST_SECONDS worth of calls. Tasks wait up to
+# RATE_SHAPING_MAX_WAIT seconds for capacity and are otherwise deferred. An empty rate disables shaping.
+GOV_NOTIFY_RATE_LIMIT = env.gov_notify_rate_limit
+ZENDESK_RATE_LIMIT = env.zendesk_rate_limit
+PARDOT_RATE_LIMIT = env.pardot_rate_limit
+RATE_SHAPING_BURST_SECONDS = env.rate_shaping_burst_seconds
+RATE_SHAPING_MAX_WAIT = env.rate_shaping_max_wait
+
+# Circuit breakers
+# A provider's breaker opens after CIRCUIT_BREAKER_FAILURE_THRESHOLD failed calls within
+# CIRCUIT_BREAKER_FAILURE_WINDOW seconds. Tasks for the provider are then deferred without calling it, until a
+# trial call made CIRCUIT_BREAKER_RECOVERY_TIMEOUT seconds later succeeds.
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = env.circuit_breaker_failure_threshold
+CIRCUIT_BREAKER_FAILURE_WINDOW = env.circuit_breaker_failure_window
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT = env.circuit_breaker_recovery_timeout
+
+# The most calls each worker process has in flight to each provider (JSON). Only reached by workers running the
+# gevent pool (CELERY_INTERACTIVE_POOL=gevent, see Procfile), where each process runs many tasks at once.
+PROVIDER_CONCURRENCY = env.provider_concurrency
+# The most database connections each gevent worker process opens at once, see submission.tasks.database_connection.
+GEVENT_DATABASE_CONNECTIONS = env.gevent_database_connections
 
 # When filtering submissions to action (i.e. send email, send letter, send to gov.notify), how many hours
 # should we filter?
 SUBMISSION_FILTER_HOURS = env.submission_filter_hours
+
+# Bulk gov.notify emails are drained in chunks of GOV_NOTIFY_BULK_EMAIL_CHUNK_SIZE rows by
+# GOV_NOTIFY_BULK_EMAIL_CONCURRENCY parallel tasks. Clients take turns, sending Client.weight chunks each.
+GOV_NOTIFY_BULK_EMAIL_CHUNK_SIZE = env.gov_notify_bulk_email_chunk_size
+GOV_NOTIFY_BULK_EMAIL_CONCURRENCY = env.gov_notify_bulk_email_concurrency
+# Seconds between lookups of the clients with pending bulk emails, each of which scans all of them.
+GOV_NOTIFY_BULK_EMAIL_CLIENT_REFRESH_INTERVAL = env.gov_notify_bulk_email_client_refresh_interval
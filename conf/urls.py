@@ -11,7 +11,7 @@ import submission.views
 import testapi.views
 from activitystream.views import (ActivityStreamDomesticHCSATFeedbackDataView,
                                   ActivityStreamView)
-from core.views import PingDomView
+from core.views import MetricsView, PingDomView
 
 admin.autodiscover()
 
@@ -21,6 +21,7 @@ healthcheck_urls = [
         r"^$", directory_healthcheck.views.HealthcheckView.as_view(), name="healthcheck"
     ),
     re_path(r"^ping/$", directory_healthcheck.views.PingView.as_view(), name="ping"),
+    re_path(r"^metrics/$", MetricsView.as_view(), name="metrics"),
 ]
 
 api_urls = [
@@ -29,6 +30,11 @@ api_urls = [
         submission.views.SubmissionCreateAPIView.as_view(),
         name="submission",
     ),
+    re_path(
+        r"^submission/batch/$",
+        submission.views.SubmissionBatchCreateAPIView.as_view(),
+        name="submission-batch",
+    ),
     re_path(
         r"^delete-submissions/(?P<email_address>.*)$",
         submission.views.SubmissionDestroyAPIView.as_view(),
@@ -5,7 +5,24 @@ from django import db
 from django.core.management import call_command
 from django.db.migrations.executor import MigrationExecutor
 
-from submission import constants
+from core import circuitbreaker
+from submission import constants, helpers
+
+
+@pytest.fixture(autouse=True)
+def clear_client_pools():
+    yield
+    helpers.notify_client_pool.clear()
+    helpers.zendesk_client_pool.clear()
+    helpers.pardot_session_pool.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    # Failures recorded by one test must not open a provider's circuit for the next.
+    yield
+    for breaker in circuitbreaker.breakers.values():
+        breaker.redis.delete(breaker.key, breaker.failures_key)
 
 
 @pytest.fixture
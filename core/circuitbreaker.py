@@ -0,0 +1,166 @@
+"""
+Circuit breakers around calls to external providers, with their state shared by every process through Redis.
+
+A breaker is closed until CIRCUIT_BREAKER_FAILURE_THRESHOLD failures happen within
+CIRCUIT_BREAKER_FAILURE_WINDOW seconds, when it opens and calls fail fast with CircuitOpen. After
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT seconds it is half-open: a single trial call is let through, which closes the
+breaker if it succeeds and opens it again if it fails. While closed a call costs one round trip to Redis.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Exported as gauges by states().
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# KEYS: the breaker hash.
+# ARGV: now and the recovery timeout in seconds.
+# Returns the state the call is made in, or the state and the seconds until a trial call is allowed.
+ALLOW_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state then
+    return {'closed', '0'}
+end
+local now = tonumber(ARGV[1])
+local remaining = tonumber(redis.call('HGET', KEYS[1], 'changed')) + tonumber(ARGV[2]) - now
+if remaining > 0 then
+    return {state, tostring(remaining)}
+end
+redis.call('HSET', KEYS[1], 'state', 'half-open', 'changed', tostring(now))
+return {'half-open', '0'}
+"""
+
+# KEYS: the breaker hash and failure counter.
+# ARGV: now, the failure threshold and the failure window in seconds.
+# Returns the new state when the failure opened the breaker, otherwise an empty string.
+FAILURE_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if state == 'open' then
+    return ''
+end
+local failures = 0
+if state ~= 'half-open' then
+    failures = redis.call('INCR', KEYS[2])
+    if failures == 1 then
+        redis.call('EXPIRE', KEYS[2], ARGV[3])
+    end
+end
+if state == 'half-open' or failures >= tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'changed', ARGV[1])
+    redis.call('DEL', KEYS[2])
+    return 'open'
+end
+return ''
+"""
+
+breakers = {}
+
+
+class CircuitOpen(Exception):
+
+    def __init__(self, name, countdown):
+        super().__init__(f"{name} circuit is open for another {countdown:.1f}s")
+        self.name = name
+        self.countdown = countdown
+
+
+class CircuitBreaker:
+    """
+    Calls inside guard() that raise one of failure_exceptions count as failures, unless the exception carries an
+    HTTP response with a status that shows the provider is working, i.e. anything but 5xx or 429. A trial call that
+    fails for any other reason leaves the breaker half-open, and another trial is allowed after the recovery timeout.
+    """
+
+    def __init__(self, name, failure_exceptions, prefix="circuit"):
+        self.name = name
+        self.failure_exceptions = failure_exceptions
+        self.key = f"{prefix}:{name}"
+        self.failures_key = f"{prefix}:{name}:failures"
+        self.scripts = {}
+        breakers[name] = self
+
+    @property
+    def redis(self):
+        return get_redis_connection("default")
+
+    def run_script(self, script, keys, args):
+        if script not in self.scripts:
+            self.scripts[script] = self.redis.register_script(script)
+        return self.scripts[script](keys=keys, args=args)
+
+    def is_failure(self, exception):
+        if not isinstance(exception, self.failure_exceptions):
+            return False
+        status_code = getattr(getattr(exception, "response", None), "status_code", None)
+        return not isinstance(status_code, int) or status_code >= 500 or status_code == 429
+
+    def changed(self, state):
+        logger.warning("%s circuit is now %s", self.name, state)
+        metrics.increment(f"circuit.{self.name}.{state}")
+
+    def allow(self, now=None):
+        """Return the state the call would be made in, raising CircuitOpen if it is not allowed."""
+        state, countdown = self.run_script(
+            ALLOW_SCRIPT,
+            keys=[self.key],
+            args=[time.time() if now is None else now, settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT],
+        )
+        state, countdown = state.decode(), float(countdown)
+        if countdown:
+            raise CircuitOpen(self.name, countdown)
+        if state == HALF_OPEN:
+            self.changed(HALF_OPEN)
+        return state
+
+    def record_success(self, state):
+        if state != CLOSED:
+            self.redis.delete(self.key, self.failures_key)
+            self.changed(CLOSED)
+
+    def record_failure(self, now=None):
+        state = self.run_script(
+            FAILURE_SCRIPT,
+            keys=[self.key, self.failures_key],
+            args=[
+                time.time() if now is None else now,
+                settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                settings.CIRCUIT_BREAKER_FAILURE_WINDOW,
+            ],
+        )
+        if state:
+            self.changed(state.decode())
+
+    @contextmanager
+    def guard(self):
+        state = self.allow()
+        try:
+            yield
+        except Exception as exception:
+            if self.is_failure(exception):
+                self.record_failure()
+            elif getattr(exception, "response", None) is not None:
+                # The provider answered, even if it rejected the request.
+                self.record_success(state)
+            raise
+        self.record_success(state)
+
+    def get_state(self):
+        state = self.redis.hget(self.key, "state")
+        return state.decode() if state else CLOSED
+
+
+def states():
+    """The state of every breaker, for core.metrics."""
+    return {name: STATE_VALUES[breaker.get_state()] for name, breaker in breakers.items()}
@@ -40,7 +40,7 @@ def generate_csv(file_object, queryset, excluded_fields):
         [
             field.name
             for field in model._meta.get_fields()
-            if field.name not in excluded_fields
+            if field.concrete and field.name not in excluded_fields
         ]
     )
 
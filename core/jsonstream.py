@@ -0,0 +1,117 @@
+"""
+Incremental parsing of a JSON object holding one large list, so the items of the list can be validated and saved as
+they are read rather than after the whole document has been built in memory as Python objects.
+
+Only the item being read and one chunk of the stream are held at a time. Each value is decoded by the standard
+library's json.JSONDecoder.raw_decode, reading further chunks while it is incomplete.
+"""
+
+import codecs
+import json
+
+from rest_framework.exceptions import ParseError
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+
+decoder = json.JSONDecoder()
+
+
+class Reader:
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+
+    def fill(self):
+        """Read another chunk onto the buffer, returning False at the end of the stream."""
+        # Read at least as much as is buffered, so a value spanning many chunks is decoded a logarithmic number of
+        # times.
+        chunk = self.stream.read(max(self.chunk_size, len(self.buffer) - self.position))
+        try:
+            text = self.text_decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as error:
+            raise ParseError(f"JSON parse error - {error}")
+        # Drop what has been parsed, so the buffer only ever holds the value being read.
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        return bool(chunk)
+
+    def peek(self):
+        """The next character other than whitespace, or "" at the end of the stream."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters):
+        """Consume the next character, which must be one of characters, and return it."""
+        character = self.peek()
+        if not character or character not in characters:
+            expected = " or ".join(repr(character) for character in characters)
+            raise ParseError(f"JSON parse error - Expecting {expected}")
+        self.position += 1
+        return character
+
+    def value(self):
+        if not self.peek():
+            raise ParseError("JSON parse error - Expecting value")
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError as error:
+                if self.fill():
+                    continue
+                raise ParseError(f"JSON parse error - {error.msg}")
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.position = end
+            return value
+
+    def items(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_object(stream, list_key, chunk_size=CHUNK_SIZE):
+    """
+    Yields the (key, value) pairs of the JSON object read from stream, in order. The value of list_key must be a
+    list, and is yielded as an iterator over its items which reads them as it is consumed. Raises ParseError when
+    the stream does not hold a JSON object.
+    """
+
+    reader = Reader(stream, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.position += 1
+    else:
+        while True:
+            if reader.peek() != '"':
+                raise ParseError("JSON parse error - Expecting property name enclosed in double quotes")
+            key = reader.value()
+            reader.expect(":")
+            if key == list_key:
+                items = reader.items()
+                yield key, items
+                # Skip whatever the consumer left unread.
+                for _ in items:
+                    pass
+            else:
+                yield key, reader.value()
+            if reader.expect(",}") == "}":
+                break
+    if reader.peek():
+        raise ParseError("JSON parse error - Extra data")
@@ -0,0 +1,169 @@
+"""
+Redis backed rate limiting.
+
+Limits use a sliding window counter: the count for the current fixed window plus the previous window's count
+weighted by how much of it still overlaps the sliding window. Every check, whatever the number of limits, is a
+single round trip running one Lua script, which only counts the hit when no limit has been exceeded.
+
+Outgoing traffic is shaped with token buckets instead, so callers learn how long to wait for capacity.
+"""
+
+import hashlib
+import re
+import time
+
+from django_redis import get_redis_connection
+
+RATE_PATTERN = re.compile(r"^(?P<limit>\d+)/(?P<multiplier>\d*)(?P<unit>[smhd])$")
+UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+# KEYS: current and previous window counters, in pairs, one pair per limit.
+# ARGV: limit, window in milliseconds and elapsed fraction of the current window, in triples, one per limit.
+# Returns the 1-based position of the first exceeded limit, or 0 when the hit was counted.
+SLIDING_WINDOW_SCRIPT = """
+local limits = #KEYS / 2
+for i = 1, limits do
+    local current = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    local elapsed = tonumber(ARGV[i * 3])
+    if previous * (1 - elapsed) + current >= tonumber(ARGV[i * 3 - 2]) then
+        return i
+    end
+end
+for i = 1, limits do
+    redis.call('INCR', KEYS[i * 2 - 1])
+    redis.call('PEXPIRE', KEYS[i * 2 - 1], tonumber(ARGV[i * 3 - 1]) * 2)
+end
+return 0
+"""
+
+
+# KEYS: the bucket hash.
+# ARGV: tokens per second, capacity, now in seconds and the tokens requested.
+# Returns the seconds to wait before the tokens will be available, or 0 when they were taken.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local requested = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now), 'rate', tostring(rate),
+    'capacity', tostring(capacity))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+def parse_rate(rate):
+    """Parse a django-ratelimit style rate such as '15/h' or '100/5m' into (limit, window in seconds)."""
+    match = RATE_PATTERN.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate {rate}")
+    multiplier = int(match["multiplier"] or 1)
+    return int(match["limit"]), multiplier * UNITS[match["unit"]]
+
+
+def hash_key(value):
+    """Keep personal data such as email addresses out of Redis key names."""
+    return hashlib.sha256(str(value).lower().encode()).hexdigest()
+
+
+class SlidingWindowLimiter:
+
+    def __init__(self, prefix="ratelimit"):
+        self.prefix = prefix
+        self.script = None
+
+    def get_script(self):
+        if self.script is None:
+            self.script = get_redis_connection("default").register_script(
+                SLIDING_WINDOW_SCRIPT
+            )
+        return self.script
+
+    def check(self, limits, now=None):
+        """
+        Count a hit against every (name, value, rate) in limits unless one of them has been exceeded, in which
+        case the name of the first exceeded limit is returned. Limits with an empty value or rate are skipped.
+        """
+
+        now = time.time() if now is None else now
+        limits = [(name, value, rate) for name, value, rate in limits if value and rate]
+        keys = []
+        args = []
+        for name, value, rate in limits:
+            limit, window = parse_rate(rate)
+            current_window, elapsed = divmod(now, window)
+            key = f"{self.prefix}:{name}:{window}:{hash_key(value)}"
+            keys += [f"{key}:{int(current_window)}", f"{key}:{int(current_window) - 1}"]
+            args += [limit, window * 1000, elapsed / window]
+        if not keys:
+            return None
+        exceeded = self.get_script()(keys=keys, args=args)
+        return limits[exceeded - 1][0] if exceeded else None
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets shared by every process through Redis. A rate such as '3000/m' refills the bucket at 50 tokens a
+    second and burst_seconds sets how many seconds worth of tokens it holds, so bursts are smoothed out.
+    """
+
+    def __init__(self, prefix="bucket", burst_seconds=1):
+        self.prefix = prefix
+        self.burst_seconds = burst_seconds
+        self.script = None
+
+    def get_script(self):
+        if self.script is None:
+            self.script = get_redis_connection("default").register_script(
+                TOKEN_BUCKET_SCRIPT
+            )
+        return self.script
+
+    def get_key(self, name, value):
+        return f"{self.prefix}:{name}:{hash_key(value)}"
+
+    def acquire(self, name, value, rate, tokens=1, now=None):
+        """
+        Take tokens from the (name, value) bucket, returning 0, or the seconds to wait until they would be
+        available, in which case none are taken. An empty rate is never limited.
+        """
+
+        if not rate:
+            return 0
+        limit, window = parse_rate(rate)
+        per_second = limit / window
+        capacity = max(per_second * self.burst_seconds, tokens)
+        now = time.time() if now is None else now
+        wait = self.get_script()(
+            keys=[self.get_key(name, value)], args=[per_second, capacity, now, tokens]
+        )
+        return float(wait)
+
+    def levels(self, now=None):
+        """The tokens currently in every bucket, keyed by name and the start of the hashed value."""
+        connection = get_redis_connection("default")
+        now = time.time() if now is None else now
+        levels = {}
+        for key in connection.scan_iter(match=f"{self.prefix}:*", count=100):
+            tokens, updated, rate, capacity = [
+                float(value) if value is not None else None
+                for value in connection.hmget(key, "tokens", "updated", "rate", "capacity")
+            ]
+            if tokens is None:
+                continue
+            _, name, value_hash = key.decode().rsplit(":", 2)
+            levels[f"{name}.{value_hash[:8]}"] = min(
+                capacity, tokens + max(0, now - updated) * rate
+            )
+        return levels
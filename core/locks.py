@@ -0,0 +1,107 @@
+"""
+Leases held in Redis, so a job runs on a single node of the cluster at a time.
+
+A lease expires after its ttl unless renewed, so it is released automatically when the process holding it dies.
+While held through Lease.hold() a heartbeat thread renews it every third of its ttl, so jobs may run for longer
+than the ttl. Leases are only renewed and released with the random token they were acquired with, so a holder
+whose lease expired can never release one acquired since by another node.
+"""
+
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django_redis import get_redis_connection
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# KEYS: the lease.
+# ARGV: the holder's token and the ttl in milliseconds.
+# Returns 1 when the lease was renewed, 0 when it is no longer held with the token.
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: the lease.
+# ARGV: the holder's token.
+# Returns 1 when the lease was released, 0 when it is no longer held with the token.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class Lease:
+
+    def __init__(self, name, ttl, prefix="lease"):
+        self.name = name
+        self.ttl = ttl
+        self.key = f"{prefix}:{name}"
+        self.token = None
+
+    def run_script(self, script):
+        connection = get_redis_connection("default")
+        return connection.eval(script, 1, self.key, self.token, int(self.ttl * 1000))
+
+    def acquire(self):
+        """Take the lease unless another holder has it, returning whether it was taken."""
+        token = uuid.uuid4().hex
+        if get_redis_connection("default").set(self.key, token, nx=True, px=int(self.ttl * 1000)):
+            self.token = token
+            return True
+        return False
+
+    def renew(self):
+        """Extend the lease by its ttl, returning False when it has expired and been lost."""
+        return self.token is not None and bool(self.run_script(RENEW_SCRIPT))
+
+    def release(self):
+        if self.token is not None:
+            self.run_script(RELEASE_SCRIPT)
+            self.token = None
+
+    def heartbeat(self, stopped):
+        while not stopped.wait(self.ttl / 3):
+            try:
+                renewed = self.renew()
+            except Exception:
+                # Keep trying, the lease only lapses if Redis is unavailable for the rest of its ttl.
+                logger.exception("Unable to renew the %s lease", self.name)
+                continue
+            if not renewed:
+                logger.error("The %s lease expired before it was renewed", self.name)
+                metrics.increment(f"lease.{self.name}.lost")
+                return
+
+    @contextmanager
+    def hold(self):
+        """
+        Yields whether the lease was acquired, keeping it renewed until the block exits when it was, like
+        django_pglocks.advisory_lock(wait=False).
+        """
+
+        if not self.acquire():
+            yield False
+            return
+        stopped = threading.Event()
+        # Under the gevent pool threading is patched, and the heartbeat is a greenlet.
+        heartbeat = threading.Thread(target=self.heartbeat, args=(stopped,), daemon=True)
+        heartbeat.start()
+        try:
+            yield True
+        finally:
+            stopped.set()
+            heartbeat.join()
+            self.release()
+
+    def is_held(self):
+        """Whether anyone holds the lease."""
+        return bool(get_redis_connection("default").exists(self.key))
@@ -0,0 +1,88 @@
+"""
+Cluster wide operational metrics.
+
+Counters, gauges and timings are kept in Redis hashes so the numbers recorded by every web and worker process
+can be read back in one place (see core.views.MetricsView). Recording a metric must never break the code being
+measured, so Redis errors are logged and swallowed.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "metrics:counters"
+GAUGES_KEY = "metrics:gauges"
+TIMINGS_KEY = "metrics:timings"
+
+# Gauges that are cheaper to compute on read than to keep up to date, e.g. queue depths.
+collectors = {}
+
+
+def get_connection():
+    return get_redis_connection("default")
+
+
+def increment(name, value=1):
+    if not value:
+        return
+    try:
+        get_connection().hincrby(COUNTERS_KEY, name, value)
+    except RedisError:
+        logger.warning("Unable to increment metric %s", name, exc_info=True)
+
+
+def set_gauge(name, value):
+    try:
+        get_connection().hset(GAUGES_KEY, name, value)
+    except RedisError:
+        logger.warning("Unable to set metric %s", name, exc_info=True)
+
+
+def observe(name, seconds):
+    try:
+        pipeline = get_connection().pipeline(transaction=False)
+        pipeline.hincrby(TIMINGS_KEY, f"{name}.count", 1)
+        pipeline.hincrbyfloat(TIMINGS_KEY, f"{name}.sum", seconds)
+        pipeline.execute()
+    except RedisError:
+        logger.warning("Unable to observe metric %s", name, exc_info=True)
+
+
+@contextmanager
+def timer(name):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - start)
+
+
+def register_collector(name, collector):
+    """Register a callable returning a dict of gauges to be included in every snapshot."""
+    collectors[name] = collector
+
+
+def _decode(values, cast):
+    return {key.decode(): cast(value) for key, value in values.items()}
+
+
+def snapshot():
+    connection = get_connection()
+    gauges = _decode(connection.hgetall(GAUGES_KEY), float)
+    for name, collector in collectors.items():
+        try:
+            gauges.update(
+                {f"{name}.{key}": value for key, value in collector().items()}
+            )
+        except Exception:
+            logger.exception("Metrics collector %s failed", name)
+    return {
+        "counters": _decode(connection.hgetall(COUNTERS_KEY), int),
+        "gauges": gauges,
+        "timings": _decode(connection.hgetall(TIMINGS_KEY), float),
+    }
@@ -0,0 +1,112 @@
+from unittest import mock
+
+import pytest
+import requests
+from django.core.cache import cache
+
+from core import circuitbreaker
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def breaker(settings):
+    settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD = 2
+    settings.CIRCUIT_BREAKER_FAILURE_WINDOW = 60
+    settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT = 30
+    with mock.patch.dict(circuitbreaker.breakers, clear=True):
+        yield circuitbreaker.CircuitBreaker(
+            "test", failure_exceptions=(requests.RequestException,), prefix="test-circuit"
+        )
+
+
+def http_error(status_code):
+    return requests.HTTPError(response=mock.Mock(status_code=status_code))
+
+
+def test_circuit_breaker_opens_after_threshold(breaker):
+    assert breaker.allow(now=100) == circuitbreaker.CLOSED
+    breaker.record_failure(now=100)
+    assert breaker.get_state() == circuitbreaker.CLOSED
+    breaker.record_failure(now=101)
+    assert breaker.get_state() == circuitbreaker.OPEN
+
+    with pytest.raises(circuitbreaker.CircuitOpen) as exc_info:
+        breaker.allow(now=111)
+    assert exc_info.value.countdown == 20
+
+
+def test_circuit_breaker_half_open_allows_one_trial(breaker):
+    breaker.record_failure(now=100)
+    breaker.record_failure(now=100)
+
+    assert breaker.allow(now=130) == circuitbreaker.HALF_OPEN
+    with pytest.raises(circuitbreaker.CircuitOpen):
+        breaker.allow(now=131)
+
+    breaker.record_success(circuitbreaker.HALF_OPEN)
+    assert breaker.get_state() == circuitbreaker.CLOSED
+    assert breaker.allow(now=131) == circuitbreaker.CLOSED
+
+
+def test_circuit_breaker_failed_trial_reopens(breaker):
+    breaker.record_failure(now=100)
+    breaker.record_failure(now=100)
+    breaker.allow(now=130)
+
+    breaker.record_failure(now=130)
+
+    assert breaker.get_state() == circuitbreaker.OPEN
+    with pytest.raises(circuitbreaker.CircuitOpen):
+        breaker.allow(now=159)
+    assert breaker.allow(now=160) == circuitbreaker.HALF_OPEN
+
+
+@pytest.mark.parametrize(
+    "exception,is_failure",
+    [
+        (requests.ConnectionError(), True),
+        (requests.Timeout(), True),
+        (http_error(503), True),
+        (http_error(429), True),
+        (http_error(400), False),
+        (ValueError(), False),
+    ],
+)
+def test_circuit_breaker_is_failure(breaker, exception, is_failure):
+    assert breaker.is_failure(exception) is is_failure
+
+
+@mock.patch("core.circuitbreaker.metrics.increment")
+def test_circuit_breaker_guard(mock_increment, breaker):
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            with breaker.guard():
+                raise requests.ConnectionError()
+    with pytest.raises(circuitbreaker.CircuitOpen):
+        with breaker.guard():
+            pytest.fail("The call should not be made while the circuit is open")
+
+    assert breaker.get_state() == circuitbreaker.OPEN
+    assert mock_increment.call_args_list == [mock.call("circuit.test.open")]
+    assert circuitbreaker.states() == {"test": 2}
+
+
+@mock.patch("core.circuitbreaker.metrics.increment")
+def test_circuit_breaker_guard_closes_on_rejected_request(mock_increment, breaker):
+    breaker.record_failure(now=100)
+    breaker.record_failure(now=100)
+    mock_increment.reset_mock()
+
+    with pytest.raises(requests.HTTPError):
+        with breaker.guard():
+            raise http_error(400)
+
+    assert breaker.get_state() == circuitbreaker.CLOSED
+    assert mock_increment.call_args_list == [
+        mock.call("circuit.test.half-open"),
+        mock.call("circuit.test.closed"),
+    ]
@@ -30,7 +30,7 @@ def test_generate_csv():
     file_object.seek(0)
 
     assert file_object.read() == (
-        "data,is_sent,meta\r\nHello,True,\"{'form_url': '/the/form/tests', "
+        "action_name,data,is_sent,meta\r\nemail,Hello,True,\"{'form_url': '/the/form/tests', "
         "'reply_to': 'test@testsubmission.com', 'recipients': ['foo@bar.com'], "
         "'action_name': 'email', 'funnel_steps': ['one', 'two', 'three']}\"\r\n"
     )
@@ -56,7 +56,7 @@ def test_generate_csv_no_body():
     )
     file_object.seek(0)
     assert file_object.read() == (
-        "data,is_sent,meta\r\nHello,True,\"{'form_url': '/the/form/tests', "
+        "action_name,data,is_sent,meta\r\nemail,Hello,True,\"{'form_url': '/the/form/tests', "
         "'reply_to': 'test@testsubmission.com', 'recipients': ['foo@bar.com'], "
         "'action_name': 'email', 'funnel_steps': ['one', 'two', 'three']}\"\r\n"
     )
@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+from rest_framework.exceptions import ParseError
+
+from core import jsonstream
+
+
+def read(document, list_key="entries", chunk_size=3):
+    pairs = []
+    for key, value in jsonstream.iter_object(io.BytesIO(document.encode()), list_key, chunk_size=chunk_size):
+        pairs.append((key, list(value) if key == list_key else value))
+    return pairs
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64 * 1024])
+def test_iter_object(chunk_size):
+    document = {
+        "template_id": "1234",
+        "entries": [{"name": "Zoë", "count": 12345, "tags": ["a", {"b": None}]}, 1.5e3, "", []],
+        "email_reply_to_id": 5678,
+    }
+
+    assert read(json.dumps(document), chunk_size=chunk_size) == list(document.items())
+
+
+def test_iter_object_whitespace_and_empty_list():
+    assert read(' \n{ "entries" : [ ] , "a" : true }\n ') == [("entries", []), ("a", True)]
+    assert read("{}") == []
+
+
+def test_iter_object_reads_items_lazily():
+    stream = io.BytesIO(json.dumps({"entries": [{"id": i} for i in range(1000)]}).encode())
+    pairs = jsonstream.iter_object(stream, "entries", chunk_size=64)
+    key, items = next(pairs)
+
+    assert next(items) == {"id": 0}
+    assert stream.tell() < 128
+
+
+def test_iter_object_skips_unread_items():
+    pairs = jsonstream.iter_object(io.BytesIO(b'{"entries": [1, 2, 3], "a": 1}'), "entries")
+
+    assert next(pairs)[0] == "entries"
+    assert next(pairs) == ("a", 1)
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        "",
+        "[]",
+        '{"entries": [1, 2',
+        '{"entries": [1 2]}',
+        '{"entries": {}}',
+        '{"a": tru}',
+        '{"a": 1,}',
+        '{1: 2}',
+        '{"a": 1} {}',
+        '{"a": "\\ud83d',
+    ],
+)
+def test_iter_object_invalid(document):
+    with pytest.raises(ParseError):
+        read(document)
+
+
+def test_iter_object_invalid_utf8():
+    with pytest.raises(ParseError):
+        list(jsonstream.iter_object(io.BytesIO(b'{"a": "\xff"}'), "entries"))
@@ -0,0 +1,93 @@
+import pytest
+from django.core.cache import cache
+
+from core import limiter
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.mark.parametrize(
+    "rate,expected",
+    [
+        ("15/h", (15, 3600)),
+        ("5/m", (5, 60)),
+        ("100/5m", (100, 300)),
+        ("1/d", (1, 86400)),
+    ],
+)
+def test_parse_rate(rate, expected):
+    assert limiter.parse_rate(rate) == expected
+
+
+def test_parse_rate_invalid():
+    with pytest.raises(ValueError):
+        limiter.parse_rate("15 per hour")
+
+
+def test_sliding_window_limiter():
+    sliding_window_limiter = limiter.SlidingWindowLimiter(prefix="test")
+    limits = [("ip", "1.2.3.4", "3/m")]
+
+    assert [sliding_window_limiter.check(limits, now=60) for _ in range(4)] == [
+        None,
+        None,
+        None,
+        "ip",
+    ]
+    # Half way through the next window half of the previous window still counts.
+    assert [sliding_window_limiter.check(limits, now=150) for _ in range(3)] == [
+        None,
+        None,
+        "ip",
+    ]
+    # Once the sliding window has moved past the previous hits they no longer count.
+    assert sliding_window_limiter.check(limits, now=240) is None
+
+
+def test_sliding_window_limiter_counts_all_or_nothing():
+    sliding_window_limiter = limiter.SlidingWindowLimiter(prefix="test")
+
+    assert sliding_window_limiter.check([("client", "a", "1/m")], now=60) is None
+    limits = [("ip", "1.2.3.4", "2/m"), ("client", "a", "1/m")]
+    assert sliding_window_limiter.check(limits, now=60) == "client"
+    assert sliding_window_limiter.check(limits, now=60) == "client"
+    # The rejected hits were not counted against the IP address.
+    assert sliding_window_limiter.check([("ip", "1.2.3.4", "2/m")], now=60) is None
+
+
+def test_sliding_window_limiter_skips_empty_limits():
+    sliding_window_limiter = limiter.SlidingWindowLimiter(prefix="test")
+
+    assert (
+        sliding_window_limiter.check([("ip", None, "1/m"), ("client", "a", "")]) is None
+    )
+    assert (
+        sliding_window_limiter.check([("ip", None, "1/m"), ("client", "a", "")]) is None
+    )
+
+
+def test_token_bucket_limiter():
+    bucket_limiter = limiter.TokenBucketLimiter(prefix="test-bucket", burst_seconds=2)
+
+    # 60/m refills a token a second and holds two seconds worth
+    assert [
+        bucket_limiter.acquire("notify", "key", "60/m", now=100) for _ in range(3)
+    ] == [0, 0, 1]
+    assert bucket_limiter.acquire("notify", "key", "60/m", now=100.5) == 0.5
+    assert bucket_limiter.acquire("notify", "key", "60/m", now=101) == 0
+    # Other credentials have their own bucket
+    assert bucket_limiter.acquire("notify", "other-key", "60/m", now=101) == 0
+    assert bucket_limiter.acquire("notify", "key", "", now=101) == 0
+
+
+def test_token_bucket_limiter_levels():
+    bucket_limiter = limiter.TokenBucketLimiter(prefix="test-bucket", burst_seconds=10)
+    bucket_limiter.acquire("zendesk", "subdomain", "60/m", tokens=4, now=100)
+
+    key_hash = limiter.hash_key("subdomain")[:8]
+    assert bucket_limiter.levels(now=100) == {f"zendesk.{key_hash}": 6}
+    assert bucket_limiter.levels(now=102) == {f"zendesk.{key_hash}": 8}
+    assert bucket_limiter.levels(now=200) == {f"zendesk.{key_hash}": 10}
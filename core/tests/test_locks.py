@@ -0,0 +1,65 @@
+import time
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from core import locks
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def test_lease_exclusive():
+    lease = locks.Lease("test", ttl=60)
+    other = locks.Lease("test", ttl=60)
+
+    assert lease.acquire() is True
+    assert other.acquire() is False
+    assert other.is_held() is True
+
+    lease.release()
+
+    assert other.acquire() is True
+
+
+def test_lease_only_released_by_holder():
+    lease = locks.Lease("test", ttl=0.1)
+    lease.acquire()
+    time.sleep(0.2)
+    other = locks.Lease("test", ttl=60)
+    # The first holder's lease expired, as when the worker holding it dies.
+    assert other.acquire() is True
+
+    assert lease.renew() is False
+    lease.release()
+
+    assert other.is_held() is True
+    assert other.renew() is True
+
+
+def test_lease_hold_heartbeat():
+    lease = locks.Lease("test", ttl=0.3)
+
+    with lease.hold() as acquired:
+        assert acquired is True
+        time.sleep(0.5)
+        assert lease.is_held() is True
+        with locks.Lease("test", ttl=0.3).hold() as other_acquired:
+            assert other_acquired is False
+
+    assert lease.is_held() is False
+
+
+@mock.patch("core.locks.metrics.increment")
+def test_lease_hold_lost(mock_increment):
+    lease = locks.Lease("test", ttl=0.3)
+
+    with lease.hold():
+        get_redis_connection("default").delete(lease.key)
+        time.sleep(0.2)
+
+    assert mock_increment.call_args == mock.call("lease.test.lost")
@@ -0,0 +1,56 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from redis.exceptions import ConnectionError
+
+from core import metrics
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def test_metrics_snapshot(monkeypatch):
+    monkeypatch.setattr(metrics, "collectors", {})
+    metrics.increment("sent")
+    metrics.increment("sent", 2)
+    metrics.set_gauge("depth", 4)
+    with metrics.timer("call"):
+        pass
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["counters"] == {"sent": 3}
+    assert snapshot["gauges"] == {"depth": 4.0}
+    assert snapshot["timings"]["call.count"] == 1
+
+
+def test_metrics_collector(monkeypatch):
+    monkeypatch.setattr(metrics, "collectors", {})
+    metrics.register_collector("queue", lambda: {"default": 7})
+
+    assert metrics.snapshot()["gauges"] == {"queue.default": 7}
+
+
+def test_metrics_redis_unavailable(monkeypatch):
+    def get_connection():
+        raise ConnectionError()
+
+    monkeypatch.setattr(metrics, "get_connection", get_connection)
+
+    metrics.increment("sent")
+    metrics.set_gauge("depth", 1)
+    metrics.observe("call", 1)
+
+
+def test_metrics_view(client, settings):
+    metrics.increment("sent")
+    url = reverse("healthcheck:metrics")
+
+    assert client.get(url).status_code == 403
+
+    response = client.get(url, {"token": settings.DIRECTORY_HEALTHCHECK_TOKEN})
+
+    assert response.status_code == 200
+    assert response.json()["counters"] == {"sent": 1}
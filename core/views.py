@@ -1,11 +1,15 @@
 import logging
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.template.loader import render_to_string
+from django.utils.crypto import constant_time_compare
 from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.decorators.cache import never_cache
 from django.views.generic import TemplateView
 
+from core import metrics
 from core.pingdom.services import health_check_services
 
 logger = logging.getLogger(__name__)
@@ -49,3 +53,15 @@ class PingDomView(TemplateView):
                 status=500,
                 content_type="text/xml",
             )
+
+
+class MetricsView(View):
+    """Exposes core.metrics, protected by the same token as the healthcheck."""
+
+    @method_decorator(never_cache)
+    def get(self, request, *args, **kwargs):
+        if not constant_time_compare(
+            request.GET.get("token"), settings.DIRECTORY_HEALTHCHECK_TOKEN
+        ):
+            return HttpResponseForbidden()
+        return JsonResponse(metrics.snapshot())
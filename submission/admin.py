@@ -7,6 +7,7 @@ from django.contrib.postgres import fields
 from django.db.models import Count
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils import timezone
 from django_json_widget.widgets import JSONEditorWidget
 
 import core.helpers
@@ -71,10 +72,24 @@ class ActionFilter(SimpleListFilter):
     def queryset(self, request, queryset):
         value = self.value()
         if value:
-            queryset = queryset.filter(meta__action_name=value)
+            queryset = queryset.filter(action_name=value)
         return queryset
 
 
+class SubmissionDeliveryInline(admin.StackedInline):
+    model = models.SubmissionDelivery
+    can_delete = False
+    readonly_fields = (
+        "client",
+        "status",
+        "attempts",
+        "last_error",
+        "next_attempt_at",
+        "provider_reference",
+    )
+    exclude = ("action_name",)
+
+
 @admin.register(models.Submission)
 class SubmissionAdmin(core.helpers.DownloadCSVMixin, admin.ModelAdmin):
     formfield_overrides = {
@@ -84,7 +99,7 @@ class SubmissionAdmin(core.helpers.DownloadCSVMixin, admin.ModelAdmin):
         "data",
         "meta",
     )
-    readonly_fields = ("client", "created", "is_sent", "form_url")
+    readonly_fields = ("client", "created", "is_sent", "form_url", "action_name")
     list_display = (
         "get_pretty_client",
         "form_url",
@@ -102,7 +117,9 @@ class SubmissionAdmin(core.helpers.DownloadCSVMixin, admin.ModelAdmin):
         FormUrlFilter,
         "created",
         "is_sent",
+        "delivery__status",
     )
+    inlines = [SubmissionDeliveryInline]
 
     actions = core.helpers.DownloadCSVMixin.actions + ["retry"]
 
@@ -122,13 +139,33 @@ class SubmissionAdmin(core.helpers.DownloadCSVMixin, admin.ModelAdmin):
         return " > ".join(obj.funnel)
 
     def retry(self, request, queryset):
-        """Resend action that previously failed."""
-        for item in queryset:
-            if item.is_sent:
-                messages.info(request, f"{item.pk} already sent. Skipped.")
-            else:
-                tasks.execute_for_submission(item)
-                messages.success(request, f"{item.pk} send triggered.")
+        """
+        Resend action that previously failed. Bulk emails are sent by the next scheduled
+        send_gov_notify_bulk_email run.
+        """
+        deliveries = models.SubmissionDelivery.objects.filter(
+            submission__in=queryset
+        ).select_related("submission", "submission__sender")
+        for delivery in deliveries:
+            # A manual retry starts a new series of attempts, even for dead deliveries. The delivery is only
+            # reset if it has not been sent since it was loaded, e.g. by an attempt that was still running.
+            reset = (
+                models.SubmissionDelivery.objects.filter(pk=delivery.pk)
+                .exclude(status=constants.DELIVERY_STATUS_SENT)
+                .update(
+                    status=constants.DELIVERY_STATUS_PENDING,
+                    attempts=0,
+                    next_attempt_at=timezone.now(),
+                )
+            )
+            if not reset:
+                messages.info(
+                    request, f"{delivery.submission_id} already sent. Skipped."
+                )
+                continue
+            if delivery.action_name != constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL:
+                tasks.execute_for_submission(delivery.submission)
+            messages.success(request, f"{delivery.submission_id} send triggered.")
         return redirect(reverse("admin:submission_submission_changelist"))
 
     retry.short_description = "Retry sending this action."
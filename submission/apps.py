@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class SubmissionConfig(AppConfig):
     name = "submission"
+
+    def ready(self):
+        from conf.celery import get_queue_depths
+        from core import circuitbreaker, metrics
+        from submission import helpers
+
+        metrics.register_collector("rate_shaping", helpers.provider_limiter.levels)
+        metrics.register_collector("circuit", circuitbreaker.states)
+        metrics.register_collector("queue", get_queue_depths)
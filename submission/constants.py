@@ -6,5 +6,16 @@ ACTION_NAME_GOV_NOTIFY_LETTER = "gov-notify-letter"
 ACTION_NAME_PARDOT = "pardot"
 ACTION_NAME_SAVE_ONLY_IN_DB = "save-only-in-db"
 ACTION_NAME_HCSAT_SUBMISSION = "hcsat-feedback-submission"
+# Actions with nothing to deliver once the submission is saved.
+SAVE_ONLY_ACTION_NAMES = (ACTION_NAME_SAVE_ONLY_IN_DB, ACTION_NAME_HCSAT_SUBMISSION)
 IP_RESTRICTED = "IP"
 BLACKLISTED_REASON_CHOICES = [("MA", "Manual"), (IP_RESTRICTED, "IP Restricted")]
+DELIVERY_STATUS_PENDING = "pending"
+DELIVERY_STATUS_SENT = "sent"
+# Gave up after too many attempts, or could not be sent at all.
+DELIVERY_STATUS_DEAD = "dead"
+DELIVERY_STATUS_CHOICES = [
+    (DELIVERY_STATUS_PENDING, "Pending"),
+    (DELIVERY_STATUS_SENT, "Sent"),
+    (DELIVERY_STATUS_DEAD, "Dead"),
+]
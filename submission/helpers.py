@@ -1,31 +1,272 @@
 import csv
+import hashlib
+import itertools
 import json
+import logging
+import os
+import smtplib
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import ExitStack, contextmanager
 from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
 
-import ratelimit.utils
 import requests
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.test.client import RequestFactory
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from django.utils.safestring import mark_safe
+from django_redis import get_redis_connection
 from notifications_python_client import NotificationsAPIClient, prepare_upload
+from notifications_python_client.errors import APIError as NotifyAPIError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from zenpy import Zenpy
 from zenpy.lib.api_objects import Ticket
 from zenpy.lib.api_objects import User as ZendeskUser
+from zenpy.lib.exception import APIException as ZendeskAPIException
 
+from core import circuitbreaker, limiter, metrics
 from submission import constants, models
 
+logger = logging.getLogger(__name__)
+
+
+class ProviderThrottled(Exception):
+    """Raised when a provider's rate limit would keep the caller waiting for longer than RATE_SHAPING_MAX_WAIT."""
+
+    def __init__(self, provider, countdown):
+        super().__init__(f'{provider} is rate limited for another {countdown:.1f}s')
+        self.provider = provider
+        self.countdown = countdown
+
+
+provider_limiter = limiter.TokenBucketLimiter(
+    prefix='bucket', burst_seconds=settings.RATE_SHAPING_BURST_SECONDS
+)
+
+
+def wait_for_provider(provider, credential, rate):
+    """
+    Take a token from the bucket shared by every worker calling the provider with the credential, sleeping until
+    one is available if that is within RATE_SHAPING_MAX_WAIT seconds and raising ProviderThrottled otherwise.
+    """
+
+    deadline = time.monotonic() + settings.RATE_SHAPING_MAX_WAIT
+    while True:
+        wait = provider_limiter.acquire(provider, credential, rate)
+        if not wait:
+            return
+        if time.monotonic() + wait > deadline:
+            metrics.increment(f'{provider}.throttled')
+            raise ProviderThrottled(provider, wait)
+        metrics.increment(f'{provider}.throttle_waits')
+        time.sleep(wait)
+
+
+# Only errors that point at the provider being down or overloaded open a breaker. Errors with an HTTP response
+# other than 5xx or 429, such as a rejected payload, do not.
+notify_breaker = circuitbreaker.CircuitBreaker(
+    'notify', failure_exceptions=(NotifyAPIError, requests.RequestException)
+)
+zendesk_breaker = circuitbreaker.CircuitBreaker(
+    'zendesk', failure_exceptions=(ZendeskAPIException, requests.RequestException)
+)
+pardot_breaker = circuitbreaker.CircuitBreaker(
+    'pardot', failure_exceptions=(requests.RequestException,)
+)
+email_breaker = circuitbreaker.CircuitBreaker(
+    'email',
+    failure_exceptions=(
+        smtplib.SMTPServerDisconnected,
+        smtplib.SMTPConnectError,
+        ConnectionError,
+        TimeoutError,
+    ),
+)
+
+
+ERROR_RETRYABLE = 'retryable'
+ERROR_THROTTLED = 'throttled'
+ERROR_PERMANENT = 'permanent'
+
+# Worth retrying straight away: the provider could not be reached or did not answer.
+TRANSIENT_EXCEPTIONS = (
+    requests.RequestException,
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def get_status_code(exception):
+    if isinstance(exception, NotifyAPIError):
+        # Notify reports errors without a response, e.g. a timeout, as a 503.
+        return exception.status_code
+    status_code = getattr(getattr(exception, 'response', None), 'status_code', None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def classify_provider_error(exception):
+    """
+    Return ERROR_THROTTLED when the provider asked us to slow down, ERROR_RETRYABLE when it failed or could not be
+    reached, ERROR_PERMANENT when it rejected the request and None for anything else.
+    """
+
+    if isinstance(exception, (ProviderThrottled, circuitbreaker.CircuitOpen)):
+        return ERROR_THROTTLED
+    status_code = get_status_code(exception)
+    if status_code is None:
+        return ERROR_RETRYABLE if isinstance(exception, TRANSIENT_EXCEPTIONS) else None
+    if status_code == 429:
+        return ERROR_THROTTLED
+    if status_code >= 500 or status_code == 408:
+        return ERROR_RETRYABLE
+    if status_code in (401, 403):
+        # Bad credentials are fixed in our configuration, not in the submission.
+        return None
+    if status_code >= 400:
+        return ERROR_PERMANENT
+    return None
+
+
+def get_retry_after(exception):
+    """The seconds to wait given by the Retry-After header of the exception's response, if there is one."""
+
+    headers = getattr(getattr(exception, 'response', None), 'headers', None)
+    if not isinstance(headers, Mapping) or not headers.get('Retry-After'):
+        return None
+    value = headers['Retry-After']
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_throttling(response, *args, **kwargs):
+    # Zenpy sleeps through a 429's Retry-After itself, holding the worker. Leave the wait to the task instead.
+    if response.status_code == 429:
+        raise requests.HTTPError(f'429 Too Many Requests for url: {response.url}', response=response)
+
+
+# Created at import, after the gevent pool has monkey patched threading, so waiting only blocks the greenlet.
+provider_semaphores = {
+    provider: threading.BoundedSemaphore(limit)
+    for provider, limit in settings.PROVIDER_CONCURRENCY.items()
+}
+
+
+@contextmanager
+def provider_slot(provider):
+    """Wait until the process has fewer than PROVIDER_CONCURRENCY calls to the provider in flight."""
+
+    semaphore = provider_semaphores.get(provider)
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
+
 
 def pprint_json(data):
     dumped = json.dumps(data, indent=4, sort_keys=True)
     return mark_safe(f'<pre>{dumped}</pre>')
 
 
+class ClientPool:
+    """
+    Per-process cache of API clients keyed by credentials, so that each client's HTTP session, and with it the
+    keep-alive connections, is reused across calls and Celery tasks.
+
+    The cache is discarded whenever the process id changes so sockets opened before a fork are never shared with
+    the child. The lock is a plain threading.Lock, which gevent's monkey patching makes greenlet aware.
+    """
+
+    def __init__(self, name, factory, get_session):
+        self.name = name
+        self.factory = factory
+        self.get_session = get_session
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.clients = {}
+        self.recorded = {'requests': 0, 'connections': 0}
+
+    def get(self, key):
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            try:
+                return self.clients[key]
+            except KeyError:
+                client = self.clients[key] = self.factory(key)
+        metrics.increment(f'{self.name}.clients_created')
+        return client
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def stats(self):
+        """Totals of requests sent and connections opened by this process' clients."""
+        stats = {'requests': 0, 'connections': 0}
+        with self.lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            for adapter in self.get_session(client).adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        stats['requests'] += pool.num_requests
+                        stats['connections'] += pool.num_connections
+        stats['connections_reused'] = stats['requests'] - stats['connections']
+        return stats
+
+    def record_usage(self):
+        """Add the requests and connections made since the last call to the cluster wide metrics."""
+        stats = self.stats()
+        with self.lock:
+            requests = max(stats['requests'] - self.recorded['requests'], 0)
+            connections = max(stats['connections'] - self.recorded['connections'], 0)
+            self.recorded = stats
+        metrics.increment(f'{self.name}.requests', requests)
+        metrics.increment(f'{self.name}.connections_opened', connections)
+        metrics.increment(f'{self.name}.connections_reused', requests - connections)
+
+
+def create_notify_client(api_key):
+    client = NotificationsAPIClient(api_key)
+    # Keep a connection alive for every call the process may have in flight, rather than requests' default 10.
+    adapter = HTTPAdapter(pool_maxsize=max(settings.PROVIDER_CONCURRENCY.get('notify', 0), 10))
+    client.request_session.mount('https://', adapter)
+    return client
+
+
+notify_client_pool = ClientPool(
+    name='notify',
+    factory=create_notify_client,
+    get_session=lambda client: client.request_session,
+)
+
+
 class ZendeskClient:
 
     def __init__(self, email, token, subdomain, custom_field_id):
         self.client = Zenpy(timeout=5, email=email, token=token, subdomain=subdomain)
+        self.client.users.session.hooks['response'].append(raise_for_throttling)
         self.custom_field_id = custom_field_id
 
     def get_or_create_user(self, full_name, email_address):
@@ -54,6 +295,44 @@ class ZendeskClient:
         return self.client.tickets.create(ticket)
 
 
+zendesk_client_pool = ClientPool(
+    name='zendesk',
+    factory=lambda key: ZendeskClient(**dict(key)),
+    get_session=lambda client: client.client.users.session,
+)
+
+
+def get_zendesk_user(client, subdomain, full_name, email_address):
+    """
+    Resolve the Zendesk user for an email address, remembering the user id in the cache so the
+    users.create_or_update round trip is only made once per ZENDESK_USER_CACHE_TIMEOUT. Concurrent
+    callers for the same address wait on a lock and share a single upsert.
+    """
+
+    email_hash = hashlib.sha256(email_address.lower().encode()).hexdigest()
+    key = f'zendesk-user:{subdomain}:{email_hash}'
+    user_id = cache.get(key)
+    if user_id is not None:
+        return ZendeskUser(id=user_id)
+
+    lock = cache.lock(f'{key}:lock', timeout=30)
+    acquired = lock.acquire(blocking_timeout=10)
+    try:
+        user_id = cache.get(key)
+        if user_id is not None:
+            return ZendeskUser(id=user_id)
+        wait_for_provider('zendesk', subdomain, settings.ZENDESK_RATE_LIMIT)
+        with provider_slot('zendesk'):
+            zendesk_user = client.get_or_create_user(
+                full_name=full_name, email_address=email_address
+            )
+        cache.set(key, zendesk_user.id, timeout=settings.ZENDESK_USER_CACHE_TIMEOUT)
+        return zendesk_user
+    finally:
+        if acquired:
+            lock.release()
+
+
 def create_zendesk_ticket(
     subject, full_name, email_address, payload, service_name, subdomain
 ):
@@ -62,25 +341,35 @@ def create_zendesk_ticket(
     except KeyError:
         raise NotImplementedError(f'subdomain {subdomain} not supported')
 
-    client = ZendeskClient(
-        email=credentials['email'],
-        token=credentials['token'],
-        subdomain=subdomain,
-        custom_field_id=credentials['custom_field_id'],
+    client = zendesk_client_pool.get(
+        (
+            ('email', credentials['email']),
+            ('token', credentials['token']),
+            ('subdomain', subdomain),
+            ('custom_field_id', credentials['custom_field_id']),
+        )
     )
 
-    zendesk_user = client.get_or_create_user(
-        full_name=full_name, email_address=email_address
-    )
-    return client.create_ticket(
-        subject=subject,
-        payload=payload,
-        zendesk_user=zendesk_user,
-        service_name=service_name,
-    )
+    with zendesk_breaker.guard():
+        zendesk_user = get_zendesk_user(
+            client=client,
+            subdomain=subdomain,
+            full_name=full_name,
+            email_address=email_address,
+        )
+        wait_for_provider('zendesk', subdomain, settings.ZENDESK_RATE_LIMIT)
+        with provider_slot('zendesk'):
+            ticket = client.create_ticket(
+                subject=subject,
+                payload=payload,
+                zendesk_user=zendesk_user,
+                service_name=service_name,
+            )
+    zendesk_client_pool.record_usage()
+    return ticket
 
 
-def send_email(subject, reply_to, recipients, text_body, html_body=None):
+def build_email_message(subject, reply_to, recipients, text_body, html_body=None):
     message = EmailMultiAlternatives(
         subject=subject,
         body=text_body,
@@ -89,41 +378,427 @@ def send_email(subject, reply_to, recipients, text_body, html_body=None):
     )
     if html_body:
         message.attach_alternative(html_body, 'text/html')
-    message.send()
+    return message
+
+
+def send_email(subject, reply_to, recipients, text_body, html_body=None):
+    message = build_email_message(
+        subject=subject,
+        reply_to=reply_to,
+        recipients=recipients,
+        text_body=text_body,
+        html_body=html_body,
+    )
+    with email_breaker.guard(), provider_slot('email'):
+        message.send()
+
+
+def mark_submissions_sent(submission_ids, provider_references=None):
+    """
+    Record the delivery of submissions, and flip Submission.is_sent, with one UPDATE per table. Neither the data
+    and meta of the rows are rewritten through save() nor rows that are already sent touched. provider_references
+    optionally maps submission ids to the id of whatever the provider created. Returns the number of submissions
+    updated.
+    """
+
+    if not submission_ids:
+        return 0
+    submission_ids = list(submission_ids)
+    provider_references = provider_references or {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {models.SubmissionDelivery._meta.db_table} AS delivery '
+            'SET status = %s, attempts = attempts + 1, last_error = \'\', next_attempt_at = NULL, '
+            'provider_reference = COALESCE(sent.provider_reference, delivery.provider_reference) '
+            'FROM unnest(%s::integer[], %s::text[]) AS sent(submission_id, provider_reference) '
+            'WHERE delivery.submission_id = sent.submission_id AND delivery.status <> %s',
+            [
+                constants.DELIVERY_STATUS_SENT,
+                submission_ids,
+                [provider_references.get(id) for id in submission_ids],
+                constants.DELIVERY_STATUS_SENT,
+            ],
+        )
+        cursor.execute(
+            f'UPDATE {models.Submission._meta.db_table} SET is_sent = true '
+            'WHERE id = ANY(%s) AND NOT is_sent',
+            [submission_ids],
+        )
+        return cursor.rowcount
+
+
+def get_retry_delay(attempts):
+    return timedelta(
+        seconds=min(
+            settings.DELIVERY_RETRY_BACKOFF * 2**attempts,
+            settings.DELIVERY_RETRY_BACKOFF_MAX,
+        )
+    )
+
+
+def get_max_attempts(action_name):
+    return settings.DELIVERY_MAX_ATTEMPTS_BY_ACTION.get(
+        action_name, settings.DELIVERY_MAX_ATTEMPTS
+    )
+
+
+def record_delivery_failure(submission_id, error):
+    """
+    Count a failed attempt against the submission's delivery, leaving the Submission row alone. The delivery is
+    due again after get_retry_delay, or is marked as dead once the action's maximum attempts have been made.
+    """
+
+    max_attempts = 'COALESCE((%(max_attempts)s::jsonb ->> action_name)::integer, %(default_max_attempts)s)'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {models.SubmissionDelivery._meta.db_table}
+            SET
+                attempts = attempts + 1,
+                last_error = %(error)s,
+                status = CASE WHEN attempts + 1 >= {max_attempts} THEN %(dead)s ELSE %(pending)s END,
+                next_attempt_at = CASE
+                    WHEN attempts + 1 >= {max_attempts} THEN NULL
+                    ELSE GREATEST(
+                        next_attempt_at,
+                        NOW() + LEAST(%(backoff)s * POWER(2, attempts), %(backoff_max)s) * INTERVAL '1 second'
+                    )
+                END
+            WHERE submission_id = %(submission_id)s AND status = %(pending)s
+            """,
+            {
+                'error': type(error).__name__,
+                'max_attempts': json.dumps(settings.DELIVERY_MAX_ATTEMPTS_BY_ACTION),
+                'default_max_attempts': settings.DELIVERY_MAX_ATTEMPTS,
+                'dead': constants.DELIVERY_STATUS_DEAD,
+                'pending': constants.DELIVERY_STATUS_PENDING,
+                'backoff': settings.DELIVERY_RETRY_BACKOFF,
+                'backoff_max': settings.DELIVERY_RETRY_BACKOFF_MAX,
+                'submission_id': submission_id,
+            },
+        )
+
+
+def defer_delivery(submission_id, countdown):
+    """Keep sweep_submission_deliveries away from a delivery while its task waits countdown seconds to retry."""
+
+    next_attempt_at = timezone.now() + timedelta(seconds=countdown) + get_retry_delay(0)
+    models.SubmissionDelivery.objects.filter(
+        submission_id=submission_id, status=constants.DELIVERY_STATUS_PENDING
+    ).update(next_attempt_at=Greatest('next_attempt_at', next_attempt_at))
+
+
+def mark_delivery_dead(submission_id, reason):
+    models.SubmissionDelivery.objects.filter(submission_id=submission_id).exclude(
+        status=constants.DELIVERY_STATUS_SENT
+    ).update(
+        status=constants.DELIVERY_STATUS_DEAD, last_error=reason, next_attempt_at=None
+    )
+
+
+# Atomically read and delete the buffered submissions.
+POP_HASH_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return items
+"""
+
+
+class SentStatusBuffer:
+    """
+    Collects the ids of completed submissions, with their provider references, in a Redis hash and marks them
+    sent in bulk, at most once every SUBMISSION_STATUS_FLUSH_INTERVAL seconds across all workers. The flush
+    piggybacks on whichever task completes once the interval has passed, the flush_submission_status task picks
+    up anything left behind.
+    """
+
+    key = 'submission-status:sent'
+    flush_key = 'submission-status:flushed'
+
+    @property
+    def redis(self):
+        return get_redis_connection('default')
+
+    def add(self, submission_id, provider_reference=None):
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.hset(self.key, submission_id, provider_reference or '')
+        pipeline.set(
+            self.flush_key,
+            1,
+            nx=True,
+            px=int(settings.SUBMISSION_STATUS_FLUSH_INTERVAL * 1000),
+        )
+        _, is_due = pipeline.execute()
+        if is_due:
+            self.flush()
+
+    def contains(self, submission_id):
+        """Whether the submission completed and is waiting to be marked as sent."""
+        return bool(self.redis.hexists(self.key, submission_id))
+
+    def flush(self):
+        """Mark every collected submission as sent. Returns the number of submissions flushed."""
+        items = self.redis.register_script(POP_HASH_SCRIPT)(keys=[self.key])
+        if not items:
+            return 0
+        provider_references = {
+            int(submission_id): reference.decode() or None
+            for submission_id, reference in zip(items[::2], items[1::2])
+        }
+        try:
+            mark_submissions_sent(list(provider_references), provider_references)
+        except Exception:
+            self.redis.hset(
+                self.key,
+                mapping={
+                    submission_id: reference or ''
+                    for submission_id, reference in provider_references.items()
+                },
+            )
+            raise
+        return len(provider_references)
+
+
+sent_status_buffer = SentStatusBuffer()
+
+
+def get_smtp_error_code(exception):
+    """The reply code the SMTP server rejected a message with, or None when the exception is not a rejection."""
+
+    if isinstance(exception, smtplib.SMTPRecipientsRefused):
+        return min(code for code, _ in exception.recipients.values())
+    if isinstance(exception, smtplib.SMTPResponseException):
+        return exception.smtp_code
+    return None
+
+
+class EmailBatchDispatcher:
+    """
+    Queues email actions in Redis and delivers them in batches over one long lived SMTP connection per worker
+    process.
+
+    The first email queued schedules a drain after EMAIL_BATCH_LINGER_SECONDS, or straight away once
+    EMAIL_BATCH_MAX_SIZE emails are waiting. A dropped connection is detected with a NOOP before each batch and
+    reopened. The emails of a batch are sent one at a time and each marked as sent once it has gone out, so if the
+    connection fails part way through only those not yet sent are queued again.
+    """
+
+    queue_key = 'email-batch:queue'
+    scheduled_key = 'email-batch:scheduled'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.connection = None
+
+    @property
+    def redis(self):
+        return get_redis_connection('default')
+
+    def enqueue(self, submission_id, **kwargs):
+        """Queue an email and return the countdown a drain should be scheduled with, or None if one is pending."""
+        item = json.dumps({'submission_id': submission_id, 'kwargs': kwargs})
+        size = self.redis.rpush(self.queue_key, item)
+        if size >= settings.EMAIL_BATCH_MAX_SIZE:
+            return 0
+        linger = settings.EMAIL_BATCH_LINGER_SECONDS
+        if self.redis.set(self.scheduled_key, 1, nx=True, ex=int(linger) + 60):
+            return linger
+        return None
+
+    def pop_batch(self):
+        pipeline = self.redis.pipeline()
+        pipeline.lrange(self.queue_key, 0, settings.EMAIL_BATCH_MAX_SIZE - 1)
+        pipeline.ltrim(self.queue_key, settings.EMAIL_BATCH_MAX_SIZE, -1)
+        items, _ = pipeline.execute()
+        return [json.loads(item) for item in items]
+
+    def requeue(self, items):
+        if items:
+            self.redis.rpush(self.queue_key, *[json.dumps(item) for item in items])
+
+    def get_connection(self):
+        if self.pid != os.getpid():
+            # Never reuse a socket inherited from the parent process.
+            self.pid = os.getpid()
+            self.connection = None
+        if self.connection is None:
+            self.connection = get_connection()
+        smtp = getattr(self.connection, 'connection', None)
+        if smtp is not None:
+            try:
+                smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                logger.info('SMTP connection dropped, reconnecting')
+                self.close()
+                return self.get_connection()
+        self.connection.open()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def send_batch(self, items):
+        """
+        Send the items one at a time, marking each as sent straight after, and return how many were sent.
+
+        Items whose delivery is no longer pending are skipped, so an email queued again by the sweep or the admin
+        while it waited is sent once. An email the server rejects permanently is marked as dead and one it defers
+        counts as a failed attempt, leaving the rest of the batch to be sent. If the connection fails the items not
+        yet sent are queued again and the error raised, as is the whole batch when the email circuit is open.
+        """
+
+        pending = set(
+            models.SubmissionDelivery.objects.filter(
+                submission_id__in=[item['submission_id'] for item in items],
+                status=constants.DELIVERY_STATUS_PENDING,
+            ).values_list('submission_id', flat=True)
+        )
+        sent = 0
+        with self.lock, ExitStack() as stack:
+            try:
+                # Entered here so the batch is queued again when the breaker is open too.
+                stack.enter_context(email_breaker.guard())
+                connection = self.get_connection()
+            except Exception:
+                self.close()
+                self.requeue(items)
+                raise
+            for position, item in enumerate(items):
+                submission_id = item['submission_id']
+                if submission_id not in pending:
+                    metrics.increment('delivery.duplicate_skipped')
+                    continue
+                # A submission queued twice in the batch is only sent once.
+                pending.discard(submission_id)
+                try:
+                    message = build_email_message(**item['kwargs'])
+                except Exception as e:
+                    mark_delivery_dead(submission_id, type(e).__name__)
+                    continue
+                try:
+                    connection.send_messages([message])
+                except Exception as e:
+                    code = get_smtp_error_code(e)
+                    if code is None or code == 421:
+                        # The connection failed or is being closed by the server.
+                        self.close()
+                        self.requeue(items[position:])
+                        raise
+                    if code >= 500:
+                        mark_delivery_dead(submission_id, f'{type(e).__name__}: {code}')
+                    else:
+                        record_delivery_failure(submission_id, e)
+                    continue
+                mark_submissions_sent([submission_id])
+                sent += 1
+        metrics.increment('email.batches')
+        metrics.increment('email.sent', sent)
+        return sent
+
+    def drain(self):
+        """Send everything queued, a batch at a time. Returns the number of emails sent."""
+        self.redis.delete(self.scheduled_key)
+        sent = 0
+        while True:
+            items = self.pop_batch()
+            if not items:
+                return sent
+            sent += self.send_batch(items)
+
+
+email_batch_dispatcher = EmailBatchDispatcher()
+
+
+def get_notification_id(response):
+    return response.get('id') if isinstance(response, dict) else None
 
 
 def send_gov_notify_email(
     template_id, email_address, personalisation, email_reply_to_id=None
 ):
-    client = NotificationsAPIClient(
-        settings.GOV_NOTIFY_API_KEY,
-    )
-    client.send_email_notification(
-        email_address=email_address,
-        template_id=template_id,
-        personalisation=personalisation,
-        email_reply_to_id=email_reply_to_id,
-    )
+    with notify_breaker.guard():
+        wait_for_provider(
+            'notify', settings.GOV_NOTIFY_API_KEY, settings.GOV_NOTIFY_RATE_LIMIT
+        )
+        client = notify_client_pool.get(settings.GOV_NOTIFY_API_KEY)
+        with provider_slot('notify'):
+            response = client.send_email_notification(
+                email_address=email_address,
+                template_id=template_id,
+                personalisation=personalisation,
+                email_reply_to_id=email_reply_to_id,
+            )
+    notify_client_pool.record_usage()
+    return get_notification_id(response)
 
 
 def send_gov_notify_letter(template_id, personalisation):
     # Use of separate key so we can use test keys for dev environments.
     # Test keys allow previewing in PDF and not send the letter
-    client = NotificationsAPIClient(
-        settings.GOV_NOTIFY_LETTER_API_KEY,
+    with notify_breaker.guard():
+        wait_for_provider(
+            'notify', settings.GOV_NOTIFY_LETTER_API_KEY, settings.GOV_NOTIFY_RATE_LIMIT
+        )
+        client = notify_client_pool.get(settings.GOV_NOTIFY_LETTER_API_KEY)
+        with provider_slot('notify'):
+            response = client.send_letter_notification(
+                template_id=template_id,
+                personalisation=personalisation,
+            )
+    notify_client_pool.record_usage()
+    return get_notification_id(response)
+
+
+def create_pardot_session():
+    retry = Retry(
+        total=settings.PARDOT_MAX_RETRIES,
+        connect=settings.PARDOT_MAX_RETRIES,
+        read=0,
+        # A 429 is raised by send_pardot and retried by the task, rather than waited out in the worker.
+        status=0,
+        allowed_methods=['POST'],
+        backoff_factor=settings.PARDOT_RETRY_BACKOFF_FACTOR,
+        raise_on_status=False,
     )
-    client.send_letter_notification(
-        template_id=template_id,
-        personalisation=personalisation,
+    adapter = HTTPAdapter(
+        pool_maxsize=settings.PARDOT_POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=retry,
     )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+pardot_session_pool = ClientPool(
+    name='pardot',
+    factory=lambda key: create_pardot_session(),
+    get_session=lambda session: session,
+)
 
 
 def send_pardot(pardot_url, payload):
-    return requests.post(
-        pardot_url,
-        payload,
-        allow_redirects=False,
-    )
+    with pardot_breaker.guard():
+        wait_for_provider('pardot', urlparse(pardot_url).netloc, settings.PARDOT_RATE_LIMIT)
+        session = pardot_session_pool.get('default')
+        with provider_slot('pardot'), metrics.timer('pardot.request'):
+            response = session.post(
+                pardot_url,
+                payload,
+                allow_redirects=False,
+                timeout=(settings.PARDOT_CONNECT_TIMEOUT, settings.PARDOT_READ_TIMEOUT),
+            )
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+    pardot_session_pool.record_usage()
+    return response
 
 
 def get_sender_email_address(submission_meta):
@@ -146,6 +821,54 @@ def get_sender_email_address(submission_meta):
         return None
 
 
+def get_or_create_senders(email_addresses):
+    '''
+    The senders with the email addresses, keyed by address, creating those missing. One query finds the existing
+    senders, and only if some are missing one multi-row INSERT creates them and one more query reads them back.
+    '''
+
+    email_addresses = set(email_addresses)
+    senders = {
+        sender.email_address: sender
+        for sender in models.Sender.objects.filter(email_address__in=email_addresses)
+    }
+    missing = email_addresses - senders.keys()
+    if missing:
+        # Conflicts are senders created by another request since.
+        models.Sender.objects.bulk_create(
+            [models.Sender(email_address=email_address) for email_address in missing],
+            ignore_conflicts=True,
+        )
+        senders.update(
+            (sender.email_address, sender)
+            for sender in models.Sender.objects.filter(email_address__in=missing)
+        )
+    return senders
+
+
+def bulk_create_submissions(submissions):
+    '''
+    Insert new submissions and their deliveries SUBMISSION_BULK_CREATE_BATCH_SIZE at a time, setting the senders
+    from their meta as SubmissionModelSerializer does. submissions may be a generator, only one batch is built at a
+    time. Each batch and its deliveries are inserted in one transaction. Returns the submissions created.
+    '''
+
+    submissions = iter(submissions)
+    created = []
+    while True:
+        batch = list(itertools.islice(submissions, settings.SUBMISSION_BULK_CREATE_BATCH_SIZE))
+        if not batch:
+            return created
+        sender_email_addresses = [get_sender_email_address(submission.meta) for submission in batch]
+        senders = get_or_create_senders(filter(None, sender_email_addresses))
+        for submission, email_address in zip(batch, sender_email_addresses):
+            submission.sender = senders.get(email_address)
+        with transaction.atomic(savepoint=False):
+            models.Submission.objects.bulk_create(batch)
+            models.SubmissionDelivery.objects.bulk_create([submission.build_delivery() for submission in batch])
+        created += batch
+
+
 def get_recipient_email_address(submission_meta):
     action_name = submission_meta['action_name']
     if action_name == constants.ACTION_NAME_ZENDESK:
@@ -166,21 +889,62 @@ def get_recipient_email_address(submission_meta):
         return None
 
 
-def is_ratelimited(ip_address):
+submission_limiter = limiter.SlidingWindowLimiter(prefix='ratelimit:submission')
+
+
+def is_ratelimited(ip_address, sender_email_address=None, client_id=None):
+    """Return the first exceeded limit ('ip', 'sender' or 'client') for a submission, or None."""
     # Not every action may have an IP address also if the client isn't setting the IP address
     # we need to let the request through to maintain backward compatibility
-    if not ip_address:
-        return False
-    request = RequestFactory().get('/', REMOTE_ADDR=ip_address)
-    return ratelimit.utils.is_ratelimited(
-        request=request,
-        group='submission',
-        key='ip',
-        rate=settings.RATELIMIT_RATE,
-        increment=True,
+    return submission_limiter.check(
+        [
+            ('ip', ip_address, settings.RATELIMIT_RATE),
+            ('sender', sender_email_address, settings.RATELIMIT_SENDER_RATE),
+            ('client', client_id, settings.RATELIMIT_CLIENT_RATE),
+        ]
     )
 
 
+class SubmissionBlocklist:
+    """
+    Redis copy of blacklisted senders and rate limited IP addresses, so their submissions can be refused
+    before anything is written to the database. Values are hashed to keep personal data out of key names.
+    """
+
+    prefix = 'blocklist'
+
+    @property
+    def redis(self):
+        return get_redis_connection('default')
+
+    def get_key(self, kind, value):
+        return f'{self.prefix}:{kind}:{limiter.hash_key(value)}'
+
+    def block(self, email_address=None, ip_address=None):
+        pipeline = self.redis.pipeline()
+        if email_address:
+            pipeline.set(self.get_key('sender', email_address), 1)
+        if ip_address:
+            pipeline.set(
+                self.get_key('ip', ip_address), 1, ex=settings.BLOCKLIST_IP_TIMEOUT
+            )
+        pipeline.execute()
+
+    def unblock(self, email_address):
+        self.redis.delete(self.get_key('sender', email_address))
+
+    def is_blocked(self, email_address=None, ip_address=None):
+        keys = []
+        if email_address:
+            keys.append(self.get_key('sender', email_address))
+        if ip_address:
+            keys.append(self.get_key('ip', ip_address))
+        return bool(keys) and self.redis.exists(*keys) > 0
+
+
+blocklist = SubmissionBlocklist()
+
+
 def send_buy_from_uk_enquiries_as_csv(form_url='/international/trade/contact/'):
     '''A method to create last seven days data for buy from uk contact details'''
     today = timezone.now()
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from submission import tasks
+
+
+class Command(BaseCommand):
+    """Run on as many nodes as required, each claims its own outbox messages."""
+
+    help = "Publishes submission tasks from the outbox to the broker."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.SUBMISSION_OUTBOX_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.SUBMISSION_OUTBOX_POLL_INTERVAL,
+            help="Seconds to wait when the outbox has been drained.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Publish one batch and exit."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            published = tasks.relay_outbox(batch_size=batch_size)
+            if published:
+                self.stdout.write(f"Published {published} outbox messages")
+            if options["once"]:
+                return
+            if published < batch_size:
+                time.sleep(options["interval"])
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("submission", "0015_alter_submission_data_alter_submission_meta"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="action_name",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000
+
+
+def backfill_action_name(apps, schema_editor):
+    """
+    Copy meta->>'action_name' into the new column in id ranges, committing each
+    batch separately so the table is never locked for the whole backfill.
+    """
+
+    Submission = apps.get_model("submission", "Submission")
+    table = Submission._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+        min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        return
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE {table}
+                    SET action_name = COALESCE(meta->>'action_name', 'unknown action')
+                    WHERE id >= %s AND id < %s AND action_name = ''
+                    """,
+                    [start, start + BATCH_SIZE],
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("submission", "0016_submission_action_name"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_action_name, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("submission", "0017_backfill_submission_action_name"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="submission",
+            index=models.Index(
+                fields=["action_name", "created", "id"],
+                name="submission_action_created_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="submission",
+            index=models.Index(
+                fields=["action_name", "is_sent", "created"],
+                name="submission_action_sent_idx",
+            ),
+        ),
+    ]
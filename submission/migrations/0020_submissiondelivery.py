@@ -0,0 +1,63 @@
+# Generated by Django 4.2.19 on 2026-10-18 10:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("submission", "0019_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubmissionDelivery",
+            fields=[
+                (
+                    "submission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="delivery",
+                        serialize=False,
+                        to="submission.submission",
+                    ),
+                ),
+                ("action_name", models.CharField(max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("sent", "Sent"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=15,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "last_error",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("next_attempt_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "provider_reference",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "submission deliveries",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["action_name", "next_attempt_at"],
+                        include=("submission",),
+                        name="delivery_pending_idx",
+                    )
+                ],
+            },
+        ),
+    ]
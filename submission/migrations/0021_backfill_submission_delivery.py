@@ -0,0 +1,56 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000
+
+
+def backfill_submission_delivery(apps, schema_editor):
+    """
+    Create the delivery of every existing submission from is_sent in id ranges, committing
+    each batch separately so the table is never locked for the whole backfill.
+    """
+
+    Submission = apps.get_model("submission", "Submission")
+    SubmissionDelivery = apps.get_model("submission", "SubmissionDelivery")
+    table = Submission._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+        min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        return
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {SubmissionDelivery._meta.db_table} (
+                        submission_id, action_name, status, attempts, last_error,
+                        next_attempt_at, provider_reference
+                    )
+                    SELECT
+                        id,
+                        action_name,
+                        CASE WHEN is_sent THEN 'sent' ELSE 'pending' END,
+                        0,
+                        '',
+                        CASE WHEN is_sent THEN NULL ELSE COALESCE(created, NOW()) END,
+                        ''
+                    FROM {table}
+                    WHERE id >= %s AND id < %s
+                    ON CONFLICT (submission_id) DO NOTHING
+                    """,
+                    [start, start + BATCH_SIZE],
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("submission", "0020_submissiondelivery"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_submission_delivery, migrations.RunPython.noop),
+    ]
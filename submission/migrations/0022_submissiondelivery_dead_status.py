@@ -0,0 +1,32 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("submission", "0021_backfill_submission_delivery"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="submissiondelivery",
+            name="status",
+            field=models.CharField(
+                choices=[("pending", "Pending"), ("sent", "Sent"), ("dead", "Dead")],
+                default="pending",
+                max_length=15,
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="submissiondelivery",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["next_attempt_at"],
+                include=["action_name"],
+                name="delivery_due_idx",
+            ),
+        ),
+    ]
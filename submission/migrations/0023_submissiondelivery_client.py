@@ -0,0 +1,73 @@
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 10000
+
+
+def backfill_delivery_client(apps, schema_editor):
+    """
+    Copy the client of every pending delivery's submission in id ranges, committing each batch separately.
+    Only pending deliveries are claimed by client, so the rest are left alone.
+    """
+
+    Submission = apps.get_model("submission", "Submission")
+    SubmissionDelivery = apps.get_model("submission", "SubmissionDelivery")
+    table = SubmissionDelivery._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT MIN(submission_id), MAX(submission_id) FROM {table} WHERE status = 'pending'"
+        )
+        min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        return
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE {table} AS delivery
+                    SET client_id = submission.client_id
+                    FROM {Submission._meta.db_table} AS submission
+                    WHERE submission.id = delivery.submission_id
+                        AND delivery.status = 'pending'
+                        AND delivery.submission_id >= %s
+                        AND delivery.submission_id < %s
+                    """,
+                    [start, start + BATCH_SIZE],
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("client", "0006_client_weight"),
+        ("submission", "0022_submissiondelivery_dead_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submissiondelivery",
+            name="client",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="client.client",
+            ),
+        ),
+        migrations.RunPython(backfill_delivery_client, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="submissiondelivery",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["action_name", "client", "submission"],
+                name="delivery_pending_client_idx",
+            ),
+        ),
+    ]
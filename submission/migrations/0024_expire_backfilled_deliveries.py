@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000
+
+
+def expire_backfilled_deliveries(apps, schema_editor):
+    """
+    Mark the pending deliveries of submissions older than SUBMISSION_FILTER_HOURS as dead in id ranges, committing
+    each batch separately. 0021 backfilled every unsent submission as pending and due, which would otherwise have
+    the sweep send all of them again.
+    """
+
+    Submission = apps.get_model("submission", "Submission")
+    SubmissionDelivery = apps.get_model("submission", "SubmissionDelivery")
+    table = SubmissionDelivery._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT MIN(submission_id), MAX(submission_id) FROM {table} WHERE status = 'pending'"
+        )
+        min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        return
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE {table} AS delivery
+                    SET status = 'dead', last_error = 'Expired', next_attempt_at = NULL
+                    FROM {Submission._meta.db_table} AS submission
+                    WHERE submission.id = delivery.submission_id
+                        AND delivery.status = 'pending'
+                        AND submission.created < NOW() - make_interval(hours => %s)
+                        AND delivery.submission_id >= %s
+                        AND delivery.submission_id < %s
+                    """,
+                    [settings.SUBMISSION_FILTER_HOURS, start, start + BATCH_SIZE],
+                )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("submission", "0023_submissiondelivery_client"),
+    ]
+
+    operations = [
+        migrations.RunPython(expire_backfilled_deliveries, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 import core.helpers
 from submission import constants, helpers
@@ -8,9 +9,22 @@ class Submission(core.helpers.TimeStampedModel):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(
+                fields=["action_name", "created", "id"],
+                name="submission_action_created_idx",
+            ),
+            models.Index(
+                fields=["action_name", "is_sent", "created"],
+                name="submission_action_sent_idx",
+            ),
+        ]
 
     data = models.JSONField()
     meta = models.JSONField()
+    # Denormalised copy of meta["action_name"] so hot queries can use an index
+    # rather than extracting the value from the JSON blob.
+    action_name = models.CharField(max_length=255, blank=True, default="")
     is_sent = models.BooleanField(default=False)
     form_url = models.TextField(blank=True, null=True)
     client = models.ForeignKey(
@@ -28,9 +42,47 @@ class Submission(core.helpers.TimeStampedModel):
         on_delete=models.CASCADE,
     )
 
-    @property
-    def action_name(self):
-        return self.meta.get("action_name", "unknown action")
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Fill the column from meta as soon as a submission is built rather than only once it is saved. Read
+        # through __dict__ so a row loaded with either field deferred is not fetched again.
+        meta = self.__dict__.get("meta")
+        if not self.__dict__.get("action_name", True) and isinstance(meta, dict) and meta.get("action_name"):
+            self.action_name = meta["action_name"]
+
+    def save(self, **kwargs):
+        if not self.action_name:
+            self.action_name = self.meta.get("action_name", "unknown action")
+        is_new = self._state.adding
+        # A new submission is never committed without its delivery.
+        with transaction.atomic(savepoint=False):
+            super().save(**kwargs)
+            if is_new:
+                self.build_delivery().save(force_insert=True)
+
+    def build_delivery(self):
+        """The unsaved delivery of a new submission, also used when submissions are created with bulk_create."""
+        return SubmissionDelivery(
+            submission=self,
+            action_name=self.action_name,
+            client_id=self.client_id,
+            status=(
+                constants.DELIVERY_STATUS_SENT
+                if self.is_sent
+                else constants.DELIVERY_STATUS_PENDING
+            ),
+            next_attempt_at=self.get_first_attempt_at(),
+        )
+
+    def get_first_attempt_at(self):
+        """When the delivery is first due: bulk emails wait for the next run of send_gov_notify_bulk_email,
+        everything else is dispatched straight away and only swept up if it has not been sent by then. Save only
+        actions are never swept, though one whose task fails is retried like any other."""
+        if self.is_sent or self.action_name in constants.SAVE_ONLY_ACTION_NAMES:
+            return None
+        if self.action_name == constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL:
+            return timezone.now()
+        return timezone.now() + helpers.get_retry_delay(attempts=0)
 
     @property
     def recipient_email(self):
@@ -57,6 +109,84 @@ class Submission(core.helpers.TimeStampedModel):
         return
 
 
+class SubmissionDelivery(models.Model):
+    """
+    Delivery state of a submission's action, kept out of the wide Submission row so that recording an attempt
+    only rewrites a few narrow columns. Submission.is_sent is still set once delivered, for reporting.
+    """
+
+    class Meta:
+        verbose_name_plural = "submission deliveries"
+        indexes = [
+            models.Index(
+                fields=["action_name", "next_attempt_at"],
+                include=["submission"],
+                condition=models.Q(status=constants.DELIVERY_STATUS_PENDING),
+                name="delivery_pending_idx",
+            ),
+            models.Index(
+                fields=["next_attempt_at"],
+                include=["action_name"],
+                condition=models.Q(status=constants.DELIVERY_STATUS_PENDING),
+                name="delivery_due_idx",
+            ),
+            models.Index(
+                fields=["action_name", "client", "submission"],
+                condition=models.Q(status=constants.DELIVERY_STATUS_PENDING),
+                name="delivery_pending_client_idx",
+            ),
+        ]
+
+    submission = models.OneToOneField(
+        Submission,
+        primary_key=True,
+        related_name="delivery",
+        on_delete=models.CASCADE,
+    )
+    action_name = models.CharField(max_length=255)
+    # Copied from the submission so each client's pending deliveries can be claimed in turn.
+    client = models.ForeignKey(
+        "client.Client",
+        related_name="+",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        # Covered by delivery_pending_client_idx.
+        db_index=False,
+    )
+    status = models.CharField(
+        max_length=15,
+        choices=constants.DELIVERY_STATUS_CHOICES,
+        default=constants.DELIVERY_STATUS_PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Class name of the exception raised by the last failed attempt.
+    last_error = models.CharField(max_length=255, blank=True, default="")
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    # Id of the notification, ticket etc. created by the provider.
+    provider_reference = models.CharField(max_length=255, blank=True, default="")
+
+    def __str__(self):
+        return f"{self.action_name} for submission {self.submission_id}: {self.status}"
+
+
+class OutboxMessage(core.helpers.TimeStampedModel):
+    """A submission task waiting to be published to the broker by the relay_outbox command."""
+
+    class Meta:
+        ordering = ["id"]
+
+    submission = models.ForeignKey(
+        Submission, related_name="outbox_messages", on_delete=models.CASCADE
+    )
+    task_name = models.CharField(max_length=255)
+    kwargs = models.JSONField()
+    attempts = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.task_name} for submission {self.submission_id}"
+
+
 class Sender(core.helpers.TimeStampedModel):
 
     email_address = models.EmailField(unique=True)
@@ -76,7 +206,17 @@ class Sender(core.helpers.TimeStampedModel):
     def is_enabled(self):
         return self.is_whitelisted or not self.is_blacklisted
 
-    def blacklist(self, reason):
+    def save(self, **kwargs):
+        # Lift any block on a sender that has been whitelisted or un-blacklisted, e.g. in the admin.
+        if self.pk and self.is_enabled:
+            helpers.blocklist.unblock(self.email_address)
+        super().save(**kwargs)
+
+    def blacklist(self, reason, ip_address=None):
         self.is_blacklisted = True
         self.blacklisted_reason = reason
         self.save()
+        if not self.is_enabled:
+            helpers.blocklist.block(
+                email_address=self.email_address, ip_address=ip_address
+            )
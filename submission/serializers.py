@@ -133,6 +133,7 @@ class SubmissionModelSerializer(serializers.ModelSerializer):
                 email_address=sender_email_address
             )
             validated_data["sender_id"] = sender.id
+        validated_data["action_name"] = validated_data["meta"]["action_name"]
         return super().create(validated_data)
 
     def to_internal_value(self, data):
@@ -1,59 +1,276 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
 from datetime import timedelta
 
 import celery
 import sentry_sdk
+from celery.exceptions import Ignore
+from celery.utils.time import get_exponential_backoff_interval
+from kombu.exceptions import OperationalError
+from rest_framework.exceptions import ValidationError
 from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
 from django.utils import timezone
-from requests.exceptions import RequestException
 
-from conf.celery import app
+from conf.celery import app, is_gevent_pool
+from client.models import Client
+from core import circuitbreaker, locks, metrics
 from submission import constants, helpers, models, serializers
-from submission.models import Submission
+from submission.models import OutboxMessage, SubmissionDelivery
+
+logger = logging.getLogger(__name__)
+
+SINGLETON_SKIP = "skip"
+SINGLETON_QUEUE = "queue"
+
+database_semaphore = threading.BoundedSemaphore(settings.GEVENT_DATABASE_CONNECTIONS)
+idle_database_connections = []
+
+
+@contextmanager
+def database_connection():
+    """
+    Under the gevent pool every greenlet would open a database connection of its own, so hundreds of tasks
+    waiting on providers would hold hundreds of connections, and each task would pay for connecting. Each burst
+    of queries instead borrows one of at most GEVENT_DATABASE_CONNECTIONS connections that are kept open between
+    tasks. Does nothing in the prefork pool.
+    """
+
+    if not is_gevent_pool():
+        yield
+        return
+    with database_semaphore:
+        try:
+            wrapper = idle_database_connections.pop()
+        except IndexError:
+            wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+            # Greenlets count as threads to Django, which otherwise refuses to share connections between them.
+            wrapper.inc_thread_sharing()
+        previous, connections[DEFAULT_DB_ALIAS] = connections[DEFAULT_DB_ALIAS], wrapper
+        try:
+            yield
+        finally:
+            connections[DEFAULT_DB_ALIAS] = previous
+            if wrapper.errors_occurred and not wrapper.is_usable():
+                wrapper.close()
+            wrapper.errors_occurred = False
+            idle_database_connections.append(wrapper)
 
 
 class BaseTask(celery.Task):
     """
     The BaseTask class sets retry / error handling defaults.
+
+    Provider errors are rescheduled rather than retried in the worker: retryable errors up to max_retries times
+    and throttling until the provider has capacity again. The countdown is the provider's Retry-After when it
+    gives one, otherwise a jittered exponential backoff, so retries from many workers do not arrive together.
+
+    Tasks declared with singleton=True hold one of singleton_slots core.locks.Lease while they run, so at most
+    that many runs happen at once across the cluster. A run which finds every slot taken is skipped, or with
+    singleton_overlap=SINGLETON_QUEUE retried in singleton_queue_countdown seconds, with at most one run waiting.
     """
 
     retry_kwargs = {"max_retries": 5}
-    exponential_backoff = 2
-    retry_jitter = False
+    retry_backoff = 30
+    retry_backoff_max = 60 * 10
+    retry_jitter = True
+    retry_after_max = 60 * 60
+
+    singleton = False
+    singleton_slots = 1
+    singleton_ttl = 60
+    singleton_overlap = SINGLETON_SKIP
+    singleton_queue_countdown = 60
+
+    def __call__(self, *args, **kwargs):
+        if not self.singleton:
+            return self.call_with_retries(*args, **kwargs)
+        for slot in range(self.singleton_slots):
+            with locks.Lease(f"{self.name}:{slot}", self.singleton_ttl).hold() as acquired:
+                if acquired:
+                    if self.singleton_overlap == SINGLETON_QUEUE and cache.get(self.queued_key) == self.request.id:
+                        cache.delete(self.queued_key)
+                    return self.call_with_retries(*args, **kwargs)
+        return self.on_overlap()
+
+    @property
+    def queued_key(self):
+        return f"singleton-queued:{self.name}"
+
+    def on_overlap(self):
+        """Called instead of running the task while every one of its singleton slots is taken."""
+
+        if self.singleton_overlap == SINGLETON_QUEUE:
+            timeout = self.singleton_queue_countdown * 2
+            if cache.add(self.queued_key, self.request.id, timeout) or (
+                cache.get(self.queued_key) == self.request.id
+            ):
+                cache.touch(self.queued_key, timeout)
+                raise self.retry(countdown=self.singleton_queue_countdown, max_retries=None)
+        logger.info("Skipped %s as it is already running", self.name)
+        metrics.increment(f"singleton.{self.name}.skipped")
+
+    def call_with_retries(self, *args, **kwargs):
+        try:
+            return super().__call__(*args, **kwargs)
+        except Exception as exc:
+            error = helpers.classify_provider_error(exc)
+            if error not in (helpers.ERROR_RETRYABLE, helpers.ERROR_THROTTLED):
+                raise
+            countdown = self.get_retry_countdown(exc)
+            self.on_reschedule(exc, countdown)
+            # Throttling does not use up the retries.
+            max_retries = None if error == helpers.ERROR_THROTTLED else self.retry_kwargs["max_retries"]
+            raise self.retry(exc=exc, countdown=countdown, max_retries=max_retries)
+
+    def get_retry_countdown(self, exc):
+        countdown = getattr(exc, "countdown", None) or helpers.get_retry_after(exc)
+        if countdown is None:
+            countdown = get_exponential_backoff_interval(
+                factor=self.retry_backoff,
+                retries=self.request.retries,
+                maximum=self.retry_backoff_max,
+                full_jitter=self.retry_jitter,
+            )
+        return min(countdown, self.retry_after_max)
+
+    def on_reschedule(self, exc, countdown):
+        """Called before the task is retried in countdown seconds because of a provider error."""
 
 
 class SaveSubmissionTask(BaseTask):
     """
     Used for all legacy V1 API /submission tasks. Ensures submissions are marked as sent when complete.
+
+    Each submission's action is sent at most once, however many times it is dispatched, e.g. by a retry from the
+    admin while an earlier attempt is still running or by the broker redelivering a task after a worker died.
+    An attempt holds a core.locks.Lease on the submission's action while it runs and is skipped when another
+    holds it, or when the delivery has already been sent. The lease is only released after the submission is
+    marked as sent.
     """
 
+    # The task instance is shared by every task the process runs at once on the gevent pool, so the submission
+    # is kept per greenlet. threading.local is greenlet local once gevent has patched it.
+    current = threading.local()
+
+    @property
+    def submission_id(self):
+        return self.current.submission_id
+
+    @submission_id.setter
+    def submission_id(self, submission_id):
+        self.current.submission_id = submission_id
+
     def __call__(self, submission_id, *args, **kwargs):
         self.submission_id = submission_id
-        return super().__call__(*args, **kwargs)
-
-    def on_success(self, *args, **kwargs):
-        submission = models.Submission.objects.get(id=self.submission_id)
-        submission.is_sent = True
-        submission.save()
+        lease = locks.Lease(f"delivery:{submission_id}:{self.name}", settings.DELIVERY_LEASE_TTL)
+        with lease.hold() as acquired:
+            if not acquired:
+                self.skip_duplicate("is already being sent")
+            with database_connection():
+                submission = (
+                    models.Submission.objects.select_related("delivery").filter(id=submission_id).first()
+                )
+            if self.is_sent(submission):
+                self.skip_duplicate("has already been sent")
+            if not args and set(kwargs) == {"action_name"}:
+                # Reference-only message (see execute_for_submission), the kwargs are rebuilt from the submission.
+                # Messages queued by older releases carry the kwargs themselves.
+                if submission is None:
+                    logger.warning("Submission %s no longer exists", submission_id)
+                    raise Ignore()
+                kwargs = get_action_kwargs(submission)
+            retval = super().__call__(*args, **kwargs)
+            self.mark_sent(retval)
+            return retval
+
+    def is_sent(self, submission):
+        if submission is None:
+            return False
+        try:
+            if submission.delivery.status == constants.DELIVERY_STATUS_SENT:
+                return True
+        except SubmissionDelivery.DoesNotExist:
+            return submission.is_sent
+        return settings.SUBMISSION_STATUS_BATCHING_ENABLED and helpers.sent_status_buffer.contains(submission.id)
+
+    def skip_duplicate(self, reason):
+        logger.info("Skipped %s for submission %s as it %s", self.name, self.submission_id, reason)
+        metrics.increment("delivery.duplicate_skipped")
+        raise Ignore()
+
+    def mark_sent(self, retval):
+        # Tasks may return the provider's reference for what they created, e.g. a notification id.
+        provider_reference = retval if isinstance(retval, str) else None
+        if settings.SUBMISSION_STATUS_BATCHING_ENABLED:
+            helpers.sent_status_buffer.add(self.submission_id, provider_reference)
+        else:
+            with database_connection():
+                helpers.mark_submissions_sent(
+                    [self.submission_id], {self.submission_id: provider_reference}
+                )
+
+    def on_reschedule(self, exc, countdown):
+        # The sweeper must not pick the delivery up while the retry is waiting.
+        with database_connection():
+            helpers.defer_delivery(self.submission_id, countdown)
+
+    def on_retry(self, exc, *args, **kwargs):
+        # Throttling is not counted as a failed attempt.
+        if helpers.classify_provider_error(exc) != helpers.ERROR_THROTTLED:
+            with database_connection():
+                helpers.record_delivery_failure(self.submission_id, exc)
+
+    def on_failure(self, exc, *args, **kwargs):
+        with database_connection():
+            if helpers.classify_provider_error(exc) == helpers.ERROR_PERMANENT:
+                # Sending it again would be rejected again.
+                status_code = helpers.get_status_code(exc)
+                helpers.mark_delivery_dead(self.submission_id, f"{type(exc).__name__}: {status_code}")
+            else:
+                # Retried by sweep_submission_deliveries once the backoff has passed.
+                helpers.record_delivery_failure(self.submission_id, exc)
 
 
-@app.task(base=SaveSubmissionTask, autoretry_for=(RequestException,))
+@app.task(base=SaveSubmissionTask)
 def create_zendesk_ticket(*args, **kwargs):
     helpers.create_zendesk_ticket(*args, **kwargs)
 
 
-@app.task(base=SaveSubmissionTask)
-def send_email(*args, **kwargs):
+@app.task(base=SaveSubmissionTask, bind=True)
+def send_email(self, *args, **kwargs):
+    if settings.EMAIL_BATCHING_ENABLED:
+        countdown = helpers.email_batch_dispatcher.enqueue(
+            submission_id=self.submission_id, **kwargs
+        )
+        if countdown is not None:
+            send_email_batch.apply_async(countdown=countdown)
+        # The submission is marked as sent by send_email_batch once delivered.
+        raise Ignore()
     helpers.send_email(*args, **kwargs)
 
 
+@app.task(base=BaseTask, bind=True, autoretry_for=(Exception,))
+def send_email_batch(self):
+    try:
+        helpers.email_batch_dispatcher.drain()
+    except circuitbreaker.CircuitOpen as exc:
+        # The batch is back on the queue, wait for the SMTP server without using up the retries.
+        raise self.retry(exc=exc, countdown=exc.countdown, max_retries=None)
+
+
 @app.task(base=SaveSubmissionTask)
 def send_gov_notify_email(*args, **kwargs):
-    helpers.send_gov_notify_email(*args, **kwargs)
+    return helpers.send_gov_notify_email(*args, **kwargs)
 
 
 @app.task(base=SaveSubmissionTask)
 def send_gov_notify_letter(*args, **kwargs):
-    helpers.send_gov_notify_letter(*args, **kwargs)
+    return helpers.send_gov_notify_letter(*args, **kwargs)
 
 
 @app.task(base=SaveSubmissionTask)
@@ -98,50 +315,353 @@ action_map = {
 }
 
 
+def get_action_kwargs(submission):
+    _, kwargs_builder_class = action_map[submission.action_name]
+    kwargs_builder = kwargs_builder_class.from_submission(submission)
+    kwargs_builder.is_valid(raise_exception=True)
+    return kwargs_builder.validated_data
+
+
 def execute_for_submission(submission):
+    """
+    Queues the action of the submission. The message only references the submission, SaveSubmissionTask
+    rebuilds the kwargs from it on the worker. They are validated here so invalid submissions are still
+    reported to the client.
+    """
+
     if submission.sender is None or submission.sender.is_enabled:
-        task, kwargs_builder_class = action_map[submission.action_name]
-        kwargs_builder = kwargs_builder_class.from_submission(submission)
-        kwargs_builder.is_valid(raise_exception=True)
-        task.delay(**kwargs_builder.validated_data, submission_id=submission.pk)
+        task, _ = action_map[submission.action_name]
+        get_action_kwargs(submission)
+        kwargs = {"submission_id": submission.pk, "action_name": submission.action_name}
+        if settings.SUBMISSION_OUTBOX_ENABLED:
+            OutboxMessage.objects.create(
+                submission=submission, task_name=task.name, kwargs=kwargs
+            )
+        else:
+            task.delay(**kwargs)
+
 
+def execute_for_submissions(submissions):
+    """
+    Queues the actions of many submissions, whose kwargs have already been validated, with one INSERT into the
+    outbox or over one broker connection.
+    """
+
+    messages = [
+        (action_map[submission.action_name][0], submission)
+        for submission in submissions
+        if submission.sender is None or submission.sender.is_enabled
+    ]
+    if not messages:
+        return
+    if settings.SUBMISSION_OUTBOX_ENABLED:
+        OutboxMessage.objects.bulk_create(
+            OutboxMessage(
+                submission=submission,
+                task_name=task.name,
+                kwargs={"submission_id": submission.pk, "action_name": submission.action_name},
+            )
+            for task, submission in messages
+        )
+        return
+    with app.producer_or_acquire() as producer:
+        for task, submission in messages:
+            task.apply_async(
+                kwargs={"submission_id": submission.pk, "action_name": submission.action_name},
+                producer=producer,
+            )
 
-@app.task()
+
+def get_delivery_cutoff():
+    # Submissions older than the SUBMISSION_FILTER_HOURS setting are not sent again.
+    return timezone.now() - timedelta(hours=settings.SUBMISSION_FILTER_HOURS)
+
+
+def get_due_deliveries():
+    # Bulk emails are retried by send_gov_notify_bulk_email.
+    return SubmissionDelivery.objects.filter(
+        status=constants.DELIVERY_STATUS_PENDING,
+        next_attempt_at__lte=timezone.now(),
+        submission__created__gte=get_delivery_cutoff(),
+    ).exclude(action_name=constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL)
+
+
+def expire_deliveries():
+    """
+    Mark the pending deliveries last due before the cutoff as dead, so they stop being scanned by the sweep.
+    Their submissions are older still, as a delivery is first due when its submission is created. A single
+    UPDATE over delivery_due_idx, returning the number expired.
+    """
+
+    return SubmissionDelivery.objects.filter(
+        status=constants.DELIVERY_STATUS_PENDING,
+        next_attempt_at__lt=get_delivery_cutoff(),
+    ).update(status=constants.DELIVERY_STATUS_DEAD, last_error="Expired", next_attempt_at=None)
+
+
+def get_dead_letter_reason(delivery):
+    submission = delivery.submission
+    if delivery.attempts >= helpers.get_max_attempts(delivery.action_name):
+        return "MaxAttemptsExceeded"
+    if submission.sender and not submission.sender.is_enabled:
+        return "SenderDisabled"
+    if delivery.action_name not in action_map:
+        return "UnknownAction"
+    return None
+
+
+@app.task(base=BaseTask, singleton=True)
+def sweep_submission_deliveries():
+    """
+    Queues the action of undelivered submissions again once their next attempt is due, claiming
+    DELIVERY_SWEEP_BATCH_SIZE deliveries at a time with SELECT ... FOR UPDATE SKIP LOCKED.
+
+    The next attempt of each delivery is pushed back by the retry delay before it is queued, so it is not swept
+    again while in flight, and a failure backs off further (see helpers.record_delivery_failure). Deliveries
+    that have used up their attempts, belong to a disabled sender or are no longer valid are marked as dead, as
+    are those of submissions older than SUBMISSION_FILTER_HOURS, which are never sent again. Any other error
+    while queueing a delivery counts as a failed attempt, and the sweep carries on with the next one.
+    """
+
+    metrics.increment("delivery.expired", expire_deliveries())
+    swept = failed = dead = 0
+    while True:
+        with transaction.atomic():
+            deliveries = list(
+                get_due_deliveries()
+                .order_by("next_attempt_at")
+                .select_related("submission", "submission__sender")
+                .select_for_update(skip_locked=True, of=("self",))[
+                    : settings.DELIVERY_SWEEP_BATCH_SIZE
+                ]
+            )
+            if not deliveries:
+                break
+            for delivery in deliveries:
+                reason = get_dead_letter_reason(delivery)
+                if reason is None:
+                    try:
+                        # A savepoint per delivery, so one that fails does not roll back the rest of the batch.
+                        with transaction.atomic():
+                            delivery.next_attempt_at = timezone.now() + helpers.get_retry_delay(
+                                delivery.attempts
+                            )
+                            delivery.save(update_fields=["next_attempt_at"])
+                            execute_for_submission(delivery.submission)
+                        swept += 1
+                        continue
+                    except ValidationError:
+                        reason = "ValidationError"
+                    except Exception as exc:
+                        logger.exception("Unable to sweep submission %s", delivery.submission_id)
+                        helpers.record_delivery_failure(delivery.submission_id, exc)
+                        failed += 1
+                        continue
+                helpers.mark_delivery_dead(delivery.submission_id, reason)
+                dead += 1
+    metrics.increment("delivery.swept", swept)
+    metrics.increment("delivery.failed", failed)
+    metrics.increment("delivery.dead", dead)
+
+
+def relay_outbox(batch_size=None):
+    """
+    Publishes the oldest outbox messages to the broker and deletes them, returning how many were published.
+
+    Messages are claimed with SELECT ... FOR UPDATE SKIP LOCKED so the relay can run on several nodes at once.
+    Publishing stops at the first broker error, leaving that message and the rest of the batch for the next run.
+    A message that fails for any other reason, e.g. its task has since been renamed, is skipped so it never holds
+    up the rest of the outbox, and is dead-lettered once it has failed SUBMISSION_OUTBOX_MAX_ATTEMPTS times.
+    Delivery is at least once.
+    """
+
+    batch_size = batch_size or settings.SUBMISSION_OUTBOX_BATCH_SIZE
+    dead = 0
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.order_by("id").select_for_update(skip_locked=True)[
+                :batch_size
+            ]
+        )
+        published_ids = []
+        for message in messages:
+            try:
+                app.tasks[message.task_name].apply_async(kwargs=message.kwargs)
+            except Exception as exc:
+                logger.exception("Unable to publish outbox message %s", message.id)
+                if isinstance(exc, (OperationalError, OSError)):
+                    # The broker is unavailable, which is no fault of the message.
+                    OutboxMessage.objects.filter(id=message.id).update(attempts=F("attempts") + 1)
+                    break
+                if message.attempts + 1 >= settings.SUBMISSION_OUTBOX_MAX_ATTEMPTS:
+                    helpers.mark_delivery_dead(message.submission_id, f"OutboxPublishFailed: {type(exc).__name__}")
+                    message.delete()
+                    dead += 1
+                else:
+                    OutboxMessage.objects.filter(id=message.id).update(attempts=F("attempts") + 1)
+                continue
+            published_ids.append(message.id)
+        OutboxMessage.objects.filter(id__in=published_ids).delete()
+    metrics.increment("outbox.published", len(published_ids))
+    metrics.increment("outbox.dead", dead)
+    return len(published_ids)
+
+
+@app.task(base=BaseTask, singleton=True)
+def relay_submission_outbox():
+    """Backstop for the relay_outbox command, draining the outbox on a schedule."""
+
+    while relay_outbox() == settings.SUBMISSION_OUTBOX_BATCH_SIZE:
+        pass
+
+
+@app.task(base=BaseTask, singleton=True)
+def flush_submission_status():
+    """Backstop for SentStatusBuffer, marks submissions left in the buffer as sent."""
+
+    helpers.sent_status_buffer.flush()
+
+
+# Runs write the same email.csv, so an overlapping run waits for the one in progress.
+@app.task(base=BaseTask, singleton=True, singleton_overlap=SINGLETON_QUEUE)
 def send_buy_from_uk_enquiries_as_csv(*args, **kwargs):
     helpers.send_buy_from_uk_enquiries_as_csv(*args, **kwargs)
 
 
-@app.task(base=BaseTask)
+def get_pending_gov_notify_bulk_email_deliveries():
+    return SubmissionDelivery.objects.filter(
+        action_name=constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+        status=constants.DELIVERY_STATUS_PENDING,
+        next_attempt_at__lte=timezone.now(),
+        submission__created__gte=get_delivery_cutoff(),
+    )
+
+
+@app.task(base=BaseTask, singleton=True)
 def send_gov_notify_bulk_email():
     """
-    Retrieves all submissions for type 'gov-notify-bulk-email' that are not marked as sent, and attempts to
-    send an email for them.
+    Fans out GOV_NOTIFY_BULK_EMAIL_CONCURRENCY tasks which drain the pending 'gov-notify-bulk-email'
+    deliveries in parallel.
     """
 
-    # Get submissions to process - filter any that are older than the SUBMISSION_FILTER_HOURS setting.
-    time_delay = timezone.now() - timedelta(hours=settings.SUBMISSION_FILTER_HOURS)
-    submissions = Submission.objects.filter(is_sent=False, created__gte=time_delay)
+    if not get_pending_gov_notify_bulk_email_deliveries().exists():
+        return
+    for _ in range(settings.GOV_NOTIFY_BULK_EMAIL_CONCURRENCY):
+        send_gov_notify_bulk_email_chunks.delay()
 
-    # We have to do a secondary filter here as Django ORM does not support filtering on @property methods.
-    submissions = [
-        x
-        for x in submissions
-        if x.action_name == constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL
-    ]
 
-    for submission in submissions:
-        try:
-            helpers.send_gov_notify_email(
-                template_id=submission.meta["template_id"],
-                email_address=submission.recipient_email,
-                personalisation=submission.data,
-            )
-            # Mark email as sent
-            submission.is_sent = True
-            submission.save()
-
-        except Exception as e:
-            sentry_sdk.capture_message(
-                f"Sending gov.notify bulk email notification failed for {submission.id}: {e}",
-                "fatal",
+def get_client_weights(deliveries):
+    """The weight of each client with deliveries in the queryset, with None for submissions without a client."""
+
+    client_ids = set(deliveries.order_by().values_list("client_id", flat=True).distinct())
+    weights = dict(
+        Client.objects.filter(identifier__in=client_ids).values_list("identifier", "weight")
+    )
+    return {client_id: max(weights.get(client_id, 1), 1) for client_id in client_ids}
+
+
+def send_gov_notify_bulk_email_chunk(client_id, last_id):
+    """
+    Claim and send the client's next chunk of pending deliveries after submission last_id. Returns the deliveries
+    and the error the rest of the chunk was deferred by, if Notify asked us to slow down.
+    """
+
+    with transaction.atomic():
+        deliveries = list(
+            get_pending_gov_notify_bulk_email_deliveries()
+            .filter(client_id=client_id, submission_id__gt=last_id)
+            .order_by("submission_id")
+            .select_related("submission")
+            .only(
+                "submission_id",
+                "submission__data",
+                "submission__meta",
+                "submission__action_name",
             )
+            .select_for_update(skip_locked=True, of=("self",))[
+                : settings.GOV_NOTIFY_BULK_EMAIL_CHUNK_SIZE
+            ]
+        )
+
+        provider_references = {}
+        deferred = None
+        for delivery in deliveries:
+            submission = delivery.submission
+            try:
+                provider_references[submission.id] = helpers.send_gov_notify_email(
+                    template_id=submission.meta["template_id"],
+                    email_address=submission.recipient_email,
+                    personalisation=submission.data,
+                )
+            except Exception as e:
+                error = helpers.classify_provider_error(e)
+                if error == helpers.ERROR_THROTTLED:
+                    deferred = e
+                    break
+                if error == helpers.ERROR_PERMANENT:
+                    helpers.mark_delivery_dead(
+                        submission.id, f"{type(e).__name__}: {helpers.get_status_code(e)}"
+                    )
+                else:
+                    helpers.record_delivery_failure(submission.id, e)
+                sentry_sdk.capture_message(
+                    f"Sending gov.notify bulk email notification failed for {submission.id}: {e}",
+                    "fatal",
+                )
+        # Mark emails as sent
+        helpers.mark_submissions_sent(list(provider_references), provider_references)
+    return deliveries, deferred
+
+
+@app.task(base=BaseTask, singleton=True, singleton_slots=settings.GOV_NOTIFY_BULK_EMAIL_CONCURRENCY)
+def send_gov_notify_bulk_email_chunks():
+    """
+    Claims pending 'gov-notify-bulk-email' deliveries a chunk at a time and sends an email for each of them.
+
+    Deliveries are claimed with SELECT ... FOR UPDATE SKIP LOCKED so that several of these tasks can work
+    through the same backlog without sending an email twice, and each client's are walked in submission id
+    order so only one chunk is ever held in memory. Failed attempts are recorded on the delivery, which is left
+    pending for the next scheduled run.
+
+    Clients take turns by weighted round robin, a client sending as many chunks in its turn as its weight, so a
+    large campaign from one client delays another client's emails by at most one round. Looking the clients up
+    scans every pending delivery, so it is done at most every GOV_NOTIFY_BULK_EMAIL_CLIENT_REFRESH_INTERVAL
+    seconds: clients submitting part way through a campaign join the first round after that, and clients with
+    nothing left drop out until then. The clients are always looked up again before the task gives up.
+
+    At most GOV_NOTIFY_BULK_EMAIL_CONCURRENCY of these run across the cluster, so the tasks fanned out by a run
+    of send_gov_notify_bulk_email that is still draining the backlog when the next one starts skip it.
+    """
+
+    last_ids = {}
+    weights = None
+    refreshed_at = 0
+    while True:
+        refresh = weights is None or (
+            time.monotonic() - refreshed_at >= settings.GOV_NOTIFY_BULK_EMAIL_CLIENT_REFRESH_INTERVAL
+        )
+        if refresh:
+            weights = get_client_weights(get_pending_gov_notify_bulk_email_deliveries())
+            refreshed_at = time.monotonic()
+        claimed = False
+        for client_id, weight in list(weights.items()):
+            for _ in range(weight):
+                deliveries, deferred = send_gov_notify_bulk_email_chunk(
+                    client_id, last_ids.get(client_id, 0)
+                )
+                if deferred:
+                    # Pick up where this left off once Notify is available again.
+                    send_gov_notify_bulk_email_chunks.apply_async(
+                        countdown=send_gov_notify_bulk_email_chunks.get_retry_countdown(deferred)
+                    )
+                    return
+                if not deliveries:
+                    del weights[client_id]
+                    break
+                claimed = True
+                last_ids[client_id] = deliveries[-1].submission_id
+        if not claimed:
+            if refresh:
+                # Anything still pending is being sent by another task.
+                return
+            weights = None
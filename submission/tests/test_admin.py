@@ -0,0 +1,50 @@
+from unittest import mock
+
+import pytest
+from django.contrib import admin
+from django.test import RequestFactory
+
+from submission import constants, models
+from submission.admin import SubmissionAdmin, SubmissionDeliveryInline
+from submission.tests.factories import SubmissionFactory
+
+
+@pytest.mark.django_db
+@mock.patch("submission.admin.messages")
+@mock.patch("submission.tasks.execute_for_submission")
+def test_retry(mock_execute_for_submission, mock_messages):
+    sent = SubmissionFactory(is_sent=True)
+    failed = SubmissionFactory(is_sent=False)
+    bulk = SubmissionFactory(
+        is_sent=False,
+        meta={"action_name": constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL},
+    )
+    models.SubmissionDelivery.objects.filter(submission=failed).update(
+        status=constants.DELIVERY_STATUS_DEAD, attempts=8, next_attempt_at=None
+    )
+    model_admin = SubmissionAdmin(models.Submission, admin.site)
+
+    response = model_admin.retry(
+        RequestFactory().post("/"), models.Submission.objects.all()
+    )
+
+    assert response.status_code == 302
+    assert mock_execute_for_submission.call_args_list == [mock.call(failed)]
+    assert mock_messages.info.call_count == 1
+    assert mock_messages.success.call_count == 2
+    for submission in [failed, bulk]:
+        submission.delivery.refresh_from_db()
+        assert submission.delivery.status == constants.DELIVERY_STATUS_PENDING
+        assert submission.delivery.attempts == 0
+        assert submission.delivery.next_attempt_at is not None
+    sent.delivery.refresh_from_db()
+    assert sent.delivery.status == constants.DELIVERY_STATUS_SENT
+
+
+def test_submission_delivery_inline_read_only():
+    request = RequestFactory().get("/")
+    request.user = mock.Mock()
+    inline = SubmissionDeliveryInline(models.Submission, admin.site)
+
+    # Only the hidden key to the submission, the delivery is changed by the tasks and the retry action.
+    assert list(inline.get_formset(request).form.base_fields) == ["submission"]
@@ -1,11 +1,22 @@
 import csv
+import smtplib
 from unittest import mock
 
 import pytest
+import requests
+from django.core.cache import cache
 from freezegun import freeze_time
+from notifications_python_client.errors import APIError as NotifyAPIError
 
-from submission import helpers
-from submission.tests.factories import SubmissionFactory
+from core import circuitbreaker
+from submission import constants, helpers
+from submission.models import Submission, SubmissionDelivery
+from submission.tests.factories import SenderFactory, SubmissionFactory
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
 
 
 def test_send_email_with_html(mailoutbox, settings):
@@ -166,6 +177,7 @@ def test_zendesk_client_create_ticket(mock_ticket, parameters, settings):
 
 @mock.patch("submission.helpers.ZendeskClient")
 def test_create_zendesk_ticket(mock_zendesk_client, settings):
+    mock_zendesk_client.return_value.get_or_create_user.return_value = mock.Mock(id=1)
     zendesk_email = "test@example.com"
     zendesk_token = "token123"
     settings.ZENDESK_CREDENTIALS = {
@@ -211,6 +223,7 @@ def test_create_zendesk_ticket(mock_zendesk_client, settings):
 
 @mock.patch("submission.helpers.ZendeskClient")
 def test_create_zendesk_ticket_subdomain(mock_zendesk_client, settings):
+    mock_zendesk_client.return_value.get_or_create_user.return_value = mock.Mock(id=1)
     zendesk_email = "123@example.com"
     zendesk_token = "123token"
     settings.ZENDESK_CREDENTIALS = {
@@ -239,6 +252,48 @@ def test_create_zendesk_ticket_subdomain(mock_zendesk_client, settings):
     )
 
 
+@mock.patch("submission.helpers.ZendeskClient")
+def test_create_zendesk_ticket_reuses_client_and_user(mock_zendesk_client, settings):
+    mock_zendesk_client.return_value.get_or_create_user.return_value = mock.Mock(id=1)
+    kwargs = {
+        "subject": "subject123",
+        "full_name": "jim example",
+        "payload": {"field": "value"},
+        "service_name": "some-service",
+        "subdomain": settings.ZENDESK_SUBDOMAIN_DEFAULT,
+    }
+
+    helpers.create_zendesk_ticket(email_address="test@example.com", **kwargs)
+    helpers.create_zendesk_ticket(email_address="TEST@example.com", **kwargs)
+    helpers.create_zendesk_ticket(email_address="other@example.com", **kwargs)
+
+    client = mock_zendesk_client.return_value
+    assert mock_zendesk_client.call_count == 1
+    assert client.get_or_create_user.call_count == 2
+    assert client.create_ticket.call_count == 3
+    assert client.create_ticket.call_args_list[1][1]["zendesk_user"].id == 1
+
+
+def test_get_zendesk_user_shares_concurrent_upsert():
+    client = mock.Mock()
+    email_hash = helpers.hashlib.sha256(b"a@b.com").hexdigest()
+
+    def wait_for_other_caller(**kwargs):
+        # Another caller holding the lock resolves the user before we acquire it.
+        cache.set(f"zendesk-user:sub:{email_hash}", 2)
+        return True
+
+    with mock.patch("submission.helpers.cache.lock") as mock_lock:
+        mock_lock.return_value.acquire.side_effect = wait_for_other_caller
+        user = helpers.get_zendesk_user(
+            client=client, subdomain="sub", full_name="A", email_address="a@b.com"
+        )
+
+    assert user.id == 2
+    assert client.get_or_create_user.call_count == 0
+    assert mock_lock.return_value.release.call_count == 1
+
+
 @mock.patch("submission.helpers.ZendeskClient")
 def test_create_zendesk_ticket_unsupported_subdomain(mock_zendesk_client, settings):
     settings.ZENDESK_CREDENTIALS = {}
@@ -307,8 +362,81 @@ def test_send_gov_notify_letter(mock_notify_client, settings):
     )
 
 
-@mock.patch("requests.post")
-def test_send_pardor(mock_post):
+@mock.patch("submission.helpers.NotificationsAPIClient")
+def test_send_gov_notify_email_reuses_client(mock_notify_client, settings):
+    settings.GOV_NOTIFY_API_KEY = "123456"
+
+    for _ in range(3):
+        helpers.send_gov_notify_email(
+            email_address="test@example.com",
+            template_id="123-456-789",
+            personalisation={"title": "Mr"},
+        )
+
+    assert mock_notify_client.call_count == 1
+    assert mock_notify_client().send_email_notification.call_count == 3
+
+
+def test_client_pool_keyed_by_credentials():
+    factory = mock.Mock(side_effect=lambda key: mock.Mock(key=key))
+    pool = helpers.ClientPool("test", factory=factory, get_session=mock.Mock())
+
+    assert pool.get("a") is pool.get("a")
+    assert pool.get("a") is not pool.get("b")
+    assert factory.call_count == 2
+
+
+def test_client_pool_discarded_after_fork():
+    pool = helpers.ClientPool(
+        "test", factory=lambda key: object(), get_session=mock.Mock()
+    )
+    client = pool.get("a")
+
+    with mock.patch("os.getpid", return_value=pool.pid + 1):
+        assert pool.get("a") is not client
+
+
+def test_client_pool_stats():
+    connection_pool = mock.Mock(num_requests=5, num_connections=2)
+    adapter = mock.Mock()
+    adapter.poolmanager.pools = {"host": connection_pool}
+    session = mock.Mock(adapters={"https://": adapter})
+    pool = helpers.ClientPool(
+        "test", factory=lambda key: object(), get_session=lambda client: session
+    )
+    pool.get("a")
+
+    assert pool.stats() == {"requests": 5, "connections": 2, "connections_reused": 3}
+
+
+@mock.patch("submission.helpers.metrics")
+def test_client_pool_record_usage(mock_metrics):
+    connection_pool = mock.Mock(num_requests=5, num_connections=2)
+    adapter = mock.Mock()
+    adapter.poolmanager.pools = {"host": connection_pool}
+    session = mock.Mock(adapters={"https://": adapter})
+    pool = helpers.ClientPool(
+        "test", factory=lambda key: object(), get_session=lambda client: session
+    )
+    pool.get("a")
+
+    pool.record_usage()
+    connection_pool.num_requests = 8
+    pool.record_usage()
+
+    assert mock_metrics.increment.call_args_list[-3:] == [
+        mock.call("test.requests", 3),
+        mock.call("test.connections_opened", 0),
+        mock.call("test.connections_reused", 3),
+    ]
+
+
+@mock.patch("requests.Session.post")
+def test_send_pardor(mock_post, settings):
+    settings.PARDOT_CONNECT_TIMEOUT = 1
+    settings.PARDOT_READ_TIMEOUT = 2
+    mock_post.return_value.status_code = 200
+
     helpers.send_pardot(
         pardot_url="http://www.example.com/some/submission/path/",
         payload={"field": "value"},
@@ -319,9 +447,38 @@ def test_send_pardor(mock_post):
         "http://www.example.com/some/submission/path/",
         {"field": "value"},
         allow_redirects=False,
+        timeout=(1, 2),
     )
 
 
+@mock.patch("submission.helpers.metrics.observe")
+def test_send_pardot_reuses_session(mock_observe, requests_mock):
+    url = "http://www.example.com/some/submission/path/"
+    requests_mock.post(url, status_code=200)
+
+    helpers.send_pardot(pardot_url=url, payload={"field": "value"})
+    helpers.send_pardot(pardot_url=url, payload={"field": "value"})
+
+    assert requests_mock.call_count == 2
+    assert requests_mock.last_request.text == "field=value"
+    assert len(helpers.pardot_session_pool.clients) == 1
+    assert mock_observe.call_count == 2
+    assert mock_observe.call_args[0][0] == "pardot.request"
+
+
+def test_pardot_session_retries(settings):
+    settings.PARDOT_MAX_RETRIES = 2
+    settings.PARDOT_POOL_MAXSIZE = 5
+
+    adapter = helpers.create_pardot_session().get_adapter("https://pardot.example")
+
+    assert adapter._pool_maxsize == 5
+    assert adapter._pool_block is True
+    assert adapter.max_retries.connect == 2
+    assert adapter.max_retries.read == 0
+    assert adapter.max_retries.status == 0
+
+
 class TestGetSenderEmailAddresses:
     @pytest.mark.parametrize(
         "action_payload,expected",
@@ -478,3 +635,385 @@ def test_send_buy_from_uk_enquiries_as_csv_with_older_submission(mock_notify_cli
 def test_get_recipient_email_address_hcsat_submission(hcsat_bulk_instance):
     email = helpers.get_recipient_email_address(hcsat_bulk_instance['meta'])
     assert email is None
+
+
+@pytest.fixture
+def email_kwargs():
+    return {
+        "subject": "this thing",
+        "reply_to": ["reply@example.com"],
+        "recipients": ["to@example.com"],
+        "text_body": "Hello",
+    }
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.get_connection")
+def test_email_batch_dispatcher_drain(mock_get_connection, settings, email_kwargs):
+    settings.EMAIL_BATCH_MAX_SIZE = 2
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(3)]
+    dispatcher = helpers.EmailBatchDispatcher()
+    for submission in submissions:
+        dispatcher.enqueue(submission_id=submission.pk, **email_kwargs)
+
+    assert dispatcher.drain() == 3
+
+    connection = mock_get_connection.return_value
+    assert mock_get_connection.call_count == 1
+    assert [len(call[0][0]) for call in connection.send_messages.call_args_list] == [1, 1, 1]
+    for submission in submissions:
+        submission.refresh_from_db()
+        assert submission.is_sent is True
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.get_connection")
+def test_email_batch_dispatcher_rejected_message(mock_get_connection, email_kwargs):
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(3)]
+    send_messages = mock_get_connection.return_value.send_messages
+    send_messages.side_effect = [
+        None,
+        smtplib.SMTPRecipientsRefused({"b@example.com": (550, b"No such user")}),  # /PS-IGNORE
+        None,
+    ]
+    dispatcher = helpers.EmailBatchDispatcher()
+    for submission in submissions:
+        dispatcher.enqueue(submission_id=submission.pk, **email_kwargs)
+
+    assert dispatcher.drain() == 2
+    assert dispatcher.drain() == 0
+
+    assert send_messages.call_count == 3
+    statuses = [SubmissionDelivery.objects.get(pk=submission.pk).status for submission in submissions]
+    assert statuses == ["sent", "dead", "sent"]
+    assert SubmissionDelivery.objects.get(pk=submissions[1].pk).last_error == "SMTPRecipientsRefused: 550"
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.get_connection")
+def test_email_batch_dispatcher_skips_sent(mock_get_connection, email_kwargs):
+    submission = SubmissionFactory(is_sent=False)
+    sent = SubmissionFactory(is_sent=False)
+    helpers.mark_submissions_sent([sent.pk])
+    dispatcher = helpers.EmailBatchDispatcher()
+    # Queued again by the sweep while waiting.
+    for submission_id in [submission.pk, submission.pk, sent.pk]:
+        dispatcher.enqueue(submission_id=submission_id, **email_kwargs)
+
+    assert dispatcher.drain() == 1
+    assert mock_get_connection.return_value.send_messages.call_count == 1
+
+
+def test_email_batch_dispatcher_schedule(settings, email_kwargs):
+    settings.EMAIL_BATCH_MAX_SIZE = 3
+    settings.EMAIL_BATCH_LINGER_SECONDS = 5
+    dispatcher = helpers.EmailBatchDispatcher()
+
+    assert dispatcher.enqueue(submission_id=1, **email_kwargs) == 5
+    assert dispatcher.enqueue(submission_id=2, **email_kwargs) is None
+    assert dispatcher.enqueue(submission_id=3, **email_kwargs) == 0
+
+
+@mock.patch("submission.helpers.get_connection")
+def test_email_batch_dispatcher_reconnects(mock_get_connection):
+    dropped = mock.Mock()
+    dropped.connection.noop.side_effect = smtplib.SMTPServerDisconnected()
+    dispatcher = helpers.EmailBatchDispatcher()
+    dispatcher.connection = dropped
+
+    connection = dispatcher.get_connection()
+
+    assert dropped.close.call_count == 1
+    assert connection is mock_get_connection.return_value
+    assert connection.open.call_count == 1
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.get_connection")
+def test_email_batch_dispatcher_requeues_failed_batch(
+    mock_get_connection, email_kwargs
+):
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(3)]
+    mock_get_connection.return_value.send_messages.side_effect = [
+        None,
+        smtplib.SMTPServerDisconnected(),
+    ]
+    dispatcher = helpers.EmailBatchDispatcher()
+    for submission in submissions:
+        dispatcher.enqueue(submission_id=submission.pk, **email_kwargs)
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        dispatcher.drain()
+
+    assert dispatcher.connection is None
+    # Only the emails not yet sent are queued again.
+    assert [item["submission_id"] for item in dispatcher.pop_batch()] == [
+        submissions[1].pk,
+        submissions[2].pk,
+    ]
+    assert SubmissionDelivery.objects.get(pk=submissions[0].pk).status == "sent"
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.get_connection")
+def test_email_batch_dispatcher_requeues_batch_circuit_open(
+    mock_get_connection, email_kwargs, settings
+):
+    settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD = 1
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(2)]
+    dispatcher = helpers.EmailBatchDispatcher()
+    for submission in submissions:
+        dispatcher.enqueue(submission_id=submission.pk, **email_kwargs)
+    helpers.email_breaker.record_failure()
+
+    with pytest.raises(circuitbreaker.CircuitOpen):
+        dispatcher.drain()
+
+    assert mock_get_connection.call_count == 0
+    assert dispatcher.redis.llen(dispatcher.queue_key) == 2
+
+
+@pytest.mark.django_db
+def test_mark_submissions_sent():
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(2)]
+    sent = SubmissionFactory(is_sent=True)
+    modified = submissions[0].modified
+
+    assert helpers.mark_submissions_sent([s.pk for s in submissions] + [sent.pk]) == 2
+
+    for submission in submissions:
+        submission.refresh_from_db()
+        assert submission.is_sent is True
+    assert submissions[0].modified == modified
+    assert helpers.mark_submissions_sent([]) == 0
+
+
+@pytest.mark.django_db
+def test_sent_status_buffer(settings):
+    settings.SUBMISSION_STATUS_FLUSH_INTERVAL = 60
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(3)]
+    buffer = helpers.SentStatusBuffer()
+
+    for submission in submissions:
+        buffer.add(submission.pk)
+
+    # The first add flushes straight away, the rest wait for the next flush.
+    assert [
+        submission.is_sent
+        for submission in Submission.objects.filter(
+            id__in=[s.pk for s in submissions]
+        ).order_by("id")
+    ] == [True, False, False]
+
+    assert buffer.flush() == 2
+    assert Submission.objects.filter(is_sent=False).count() == 0
+    assert buffer.flush() == 0
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.mark_submissions_sent")
+def test_sent_status_buffer_flush_failure(mock_mark_submissions_sent):
+    mock_mark_submissions_sent.side_effect = Exception()
+    buffer = helpers.SentStatusBuffer()
+    buffer.redis.hset(buffer.key, mapping={1: "", 2: "notification-id"})
+
+    with pytest.raises(Exception):
+        buffer.flush()
+
+    assert buffer.redis.hgetall(buffer.key) == {b"1": b"", b"2": b"notification-id"}
+
+
+@pytest.mark.django_db
+def test_sent_status_buffer_provider_reference(settings):
+    settings.SUBMISSION_STATUS_FLUSH_INTERVAL = 60
+    submission = SubmissionFactory(is_sent=False)
+    buffer = helpers.SentStatusBuffer()
+    buffer.redis.set(buffer.flush_key, 1)
+
+    buffer.add(submission.pk, "notification-id")
+    buffer.flush()
+
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.status == "sent"
+    assert submission.delivery.provider_reference == "notification-id"
+
+
+@pytest.mark.django_db
+def test_record_delivery_failure():
+    submission = SubmissionFactory(is_sent=False)
+
+    helpers.record_delivery_failure(submission.pk, ValueError())
+
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.status == "pending"
+    assert submission.delivery.attempts == 1
+    assert submission.delivery.last_error == "ValueError"
+    assert submission.delivery.next_attempt_at is not None
+
+
+@mock.patch("submission.helpers.time.sleep")
+@mock.patch("submission.helpers.provider_limiter.acquire")
+def test_wait_for_provider(mock_acquire, mock_sleep, settings):
+    settings.RATE_SHAPING_MAX_WAIT = 5
+    mock_acquire.side_effect = [0.5, 0]
+
+    helpers.wait_for_provider("notify", "key", "60/m")
+
+    assert mock_sleep.call_args == mock.call(0.5)
+    assert mock_acquire.call_args == mock.call("notify", "key", "60/m")
+
+
+@mock.patch("submission.helpers.time.sleep")
+@mock.patch("submission.helpers.provider_limiter.acquire", return_value=30)
+def test_wait_for_provider_throttled(mock_acquire, mock_sleep, settings):
+    settings.RATE_SHAPING_MAX_WAIT = 5
+
+    with pytest.raises(helpers.ProviderThrottled) as excinfo:
+        helpers.wait_for_provider("notify", "key", "60/m")
+
+    assert excinfo.value.countdown == 30
+    assert mock_sleep.call_count == 0
+
+
+@mock.patch("submission.helpers.wait_for_provider")
+def test_send_pardot_rate_shaping(mock_wait_for_provider, requests_mock, settings):
+    settings.PARDOT_RATE_LIMIT = "10/s"
+    requests_mock.post("https://pardot.example.com/form", status_code=200)
+
+    helpers.send_pardot("https://pardot.example.com/form", {"field": "value"})
+
+    assert mock_wait_for_provider.call_args == mock.call(
+        "pardot", "pardot.example.com", "10/s"
+    )
+
+
+def test_send_pardot_circuit_breaker(requests_mock, settings):
+    settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD = 2
+    requests_mock.post(
+        "https://pardot.example.com/form", exc=requests.exceptions.ConnectTimeout
+    )
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            helpers.send_pardot("https://pardot.example.com/form", {"field": "value"})
+    with pytest.raises(circuitbreaker.CircuitOpen):
+        helpers.send_pardot("https://pardot.example.com/form", {"field": "value"})
+
+    assert requests_mock.call_count == 2
+
+
+def response_error(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+@pytest.mark.parametrize(
+    "exception,expected",
+    [
+        (helpers.ProviderThrottled("notify", 1), helpers.ERROR_THROTTLED),
+        (circuitbreaker.CircuitOpen("notify", 1), helpers.ERROR_THROTTLED),
+        (response_error(429), helpers.ERROR_THROTTLED),
+        (response_error(502), helpers.ERROR_RETRYABLE),
+        (requests.ConnectionError(), helpers.ERROR_RETRYABLE),
+        (smtplib.SMTPServerDisconnected(), helpers.ERROR_RETRYABLE),
+        (NotifyAPIError(), helpers.ERROR_RETRYABLE),
+        (NotifyAPIError(response=response_error(400).response), helpers.ERROR_PERMANENT),
+        (response_error(422), helpers.ERROR_PERMANENT),
+        (response_error(403), None),
+        (KeyError(), None),
+    ],
+)
+def test_classify_provider_error(exception, expected):
+    assert helpers.classify_provider_error(exception) == expected
+
+
+@freeze_time("2026-01-01 12:00:00")
+@pytest.mark.parametrize(
+    "headers,expected",
+    [
+        ({"Retry-After": "120"}, 120),
+        ({"Retry-After": "Thu, 01 Jan 2026 12:01:30 GMT"}, 90),
+        ({"Retry-After": "Thu, 01 Jan 2026 11:00:00 GMT"}, 0),
+        ({"Retry-After": "soon"}, None),
+        ({}, None),
+    ],
+)
+def test_get_retry_after(headers, expected):
+    assert helpers.get_retry_after(response_error(429, headers)) == expected
+
+
+def test_send_pardot_raises_when_throttled(requests_mock):
+    requests_mock.post(
+        "https://pardot.example.com/form",
+        status_code=429,
+        headers={"Retry-After": "60"},
+    )
+
+    with pytest.raises(requests.HTTPError) as excinfo:
+        helpers.send_pardot("https://pardot.example.com/form", {"field": "value"})
+
+    assert requests_mock.call_count == 1
+    assert helpers.get_retry_after(excinfo.value) == 60
+
+
+def test_zendesk_client_does_not_wait_for_retry_after(requests_mock):
+    requests_mock.post(
+        "https://test.zendesk.com/api/v2/users/create_or_update.json",
+        status_code=429,
+        headers={"Retry-After": "30"},
+    )
+    client = helpers.ZendeskClient(
+        email="a@example.com", token="token", subdomain="test", custom_field_id=1
+    )
+
+    with pytest.raises(requests.HTTPError) as excinfo:
+        client.get_or_create_user(full_name="Jim Example", email_address="b@example.com")
+
+    assert requests_mock.call_count == 1
+    assert helpers.get_retry_after(excinfo.value) == 30
+
+
+def test_provider_slot(settings):
+    semaphore = helpers.threading.BoundedSemaphore(1)
+
+    with mock.patch.dict(helpers.provider_semaphores, {"notify": semaphore}):
+        with helpers.provider_slot("notify"):
+            assert semaphore.acquire(blocking=False) is False
+        assert semaphore.acquire(blocking=False) is True
+        semaphore.release()
+
+        with helpers.provider_slot("unlimited"):
+            pass
+
+
+@pytest.mark.django_db
+def test_bulk_create_submissions(settings, django_assert_num_queries):
+    settings.SUBMISSION_BULK_CREATE_BATCH_SIZE = 2
+    existing = SenderFactory(email_address="existing@example.com")
+
+    def build(email_address):
+        return Submission(
+            data={},
+            meta={
+                "action_name": constants.ACTION_NAME_GOV_NOTIFY_EMAIL,
+                "email_address": email_address,
+            },
+            action_name=constants.ACTION_NAME_GOV_NOTIFY_EMAIL,
+        )
+
+    # Each batch looks up its senders, creates and reads back any new ones, then inserts the submissions and
+    # their deliveries.
+    with django_assert_num_queries(5 + 3):
+        submissions = helpers.bulk_create_submissions(
+            build(email_address)
+            for email_address in ["existing@example.com", "new@example.com", "new@example.com"]
+        )
+
+    assert len(submissions) == 3
+    assert submissions[0].sender == existing
+    assert submissions[1].sender.email_address == "new@example.com"
+    assert submissions[2].sender == submissions[1].sender
+    assert Submission.objects.count() == 3
+    assert SubmissionDelivery.objects.filter(status=constants.DELIVERY_STATUS_PENDING).count() == 3
@@ -1,6 +1,8 @@
 from copy import deepcopy
+from datetime import timedelta
 
 import pytest
+from django.utils import timezone
 
 
 @pytest.mark.django_db
@@ -73,3 +75,108 @@ def test_update_blacklist_reason(migration):
     assert post_sender_1.blacklisted_reason == "MA"
     assert post_sender_2.blacklisted_reason == "MA"
     assert post_sender_3.blacklisted_reason is None
+
+
+@pytest.mark.django_db
+def test_backfill_submission_action_name(
+    migration, email_action_payload, zendesk_action_payload
+):
+    old_apps = migration.before([("submission", "0016_submission_action_name")])
+    Submission = old_apps.get_model("submission", "Submission")
+
+    submission_a = Submission.objects.create(**email_action_payload)
+    submission_b = Submission.objects.create(**zendesk_action_payload)
+    submission_c = Submission.objects.create(data={}, meta={})
+
+    new_apps = migration.apply("submission", "0017_backfill_submission_action_name")
+
+    Submission = new_apps.get_model("submission", "Submission")
+
+    assert Submission.objects.get(pk=submission_a.pk).action_name == "email"
+    assert Submission.objects.get(pk=submission_b.pk).action_name == "zendesk"
+    assert Submission.objects.get(pk=submission_c.pk).action_name == "unknown action"
+
+
+@pytest.mark.django_db
+def test_backfill_submission_delivery(migration, email_action_payload):
+    old_apps = migration.before([("submission", "0020_submissiondelivery")])
+    Submission = old_apps.get_model("submission", "Submission")
+
+    sent = Submission.objects.create(
+        **email_action_payload, action_name="email", is_sent=True
+    )
+    unsent = Submission.objects.create(
+        **email_action_payload, action_name="email", is_sent=False
+    )
+
+    new_apps = migration.apply("submission", "0021_backfill_submission_delivery")
+
+    SubmissionDelivery = new_apps.get_model("submission", "SubmissionDelivery")
+
+    sent_delivery = SubmissionDelivery.objects.get(submission_id=sent.pk)
+    unsent_delivery = SubmissionDelivery.objects.get(submission_id=unsent.pk)
+    assert sent_delivery.action_name == "email"
+    assert sent_delivery.status == "sent"
+    assert sent_delivery.next_attempt_at is None
+    assert unsent_delivery.status == "pending"
+    assert unsent_delivery.next_attempt_at is not None
+
+
+@pytest.mark.django_db
+def test_backfill_delivery_client(migration, email_action_payload):
+    old_apps = migration.before(
+        [
+            ("submission", "0022_submissiondelivery_dead_status"),
+            ("client", "0005_auto_20190814_1056"),
+        ]
+    )
+    Client = old_apps.get_model("client", "Client")
+    Submission = old_apps.get_model("submission", "Submission")
+    SubmissionDelivery = old_apps.get_model("submission", "SubmissionDelivery")
+
+    client = Client.objects.create(name="Great")
+    pending = Submission.objects.create(
+        **email_action_payload, action_name="email", client=client
+    )
+    sent = Submission.objects.create(
+        **email_action_payload, action_name="email", client=client, is_sent=True
+    )
+    SubmissionDelivery.objects.create(
+        submission=pending, action_name="email", status="pending"
+    )
+    SubmissionDelivery.objects.create(submission=sent, action_name="email", status="sent")
+
+    new_apps = migration.apply("submission", "0023_submissiondelivery_client")
+
+    SubmissionDelivery = new_apps.get_model("submission", "SubmissionDelivery")
+    assert SubmissionDelivery.objects.get(submission_id=pending.pk).client_id == client.pk
+    assert SubmissionDelivery.objects.get(submission_id=sent.pk).client_id is None
+
+
+@pytest.mark.django_db
+def test_expire_backfilled_deliveries(migration, email_action_payload, settings):
+    settings.SUBMISSION_FILTER_HOURS = 72
+    old_apps = migration.before([("submission", "0023_submissiondelivery_client")])
+    Submission = old_apps.get_model("submission", "Submission")
+    SubmissionDelivery = old_apps.get_model("submission", "SubmissionDelivery")
+
+    old = Submission.objects.create(**email_action_payload, action_name="email")
+    recent = Submission.objects.create(**email_action_payload, action_name="email")
+    old_sent = Submission.objects.create(**email_action_payload, action_name="email", is_sent=True)
+    Submission.objects.filter(pk__in=[old.pk, old_sent.pk]).update(
+        created=timezone.now() - timedelta(hours=73)
+    )
+    for submission, status in [(old, "pending"), (recent, "pending"), (old_sent, "sent")]:
+        SubmissionDelivery.objects.create(
+            submission=submission, action_name="email", status=status, next_attempt_at=timezone.now()
+        )
+
+    new_apps = migration.apply("submission", "0024_expire_backfilled_deliveries")
+
+    SubmissionDelivery = new_apps.get_model("submission", "SubmissionDelivery")
+    old_delivery = SubmissionDelivery.objects.get(submission_id=old.pk)
+    assert old_delivery.status == "dead"
+    assert old_delivery.last_error == "Expired"
+    assert old_delivery.next_attempt_at is None
+    assert SubmissionDelivery.objects.get(submission_id=recent.pk).status == "pending"
+    assert SubmissionDelivery.objects.get(submission_id=old_sent.pk).status == "sent"
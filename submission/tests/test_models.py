@@ -1,10 +1,16 @@
 import pytest
+from django.core.cache import cache
 
 from client.tests.factories import ClientFactory
-from submission import constants, models
+from submission import constants, helpers, models
 from submission.tests import factories
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
 @pytest.fixture
 def submission():
     return models.Submission(
@@ -25,6 +31,23 @@ def test_submission_action_name(submission):
     assert submission.action_name == constants.ACTION_NAME_EMAIL
 
 
+@pytest.mark.django_db
+def test_submission_action_name_deferred(django_assert_num_queries):
+    factories.SubmissionFactory()
+
+    # One query each, neither fetching the deferred fields again.
+    with django_assert_num_queries(2):
+        assert models.Submission.objects.only("id").get().pk
+        assert models.Submission.objects.defer("action_name").get().pk
+
+
+@pytest.mark.django_db
+def test_submission_action_name_unknown():
+    submission = factories.SubmissionFactory(meta={})
+
+    assert submission.action_name == "unknown action"
+
+
 @pytest.mark.django_db
 def test_submission_funnel(submission):
     assert submission.funnel == ["one", "two", "three"]
@@ -37,6 +60,27 @@ def test_sender():
     assert str(sender) == sender.email_address
 
 
+@pytest.mark.django_db
+def test_sender_blacklist():
+    sender = factories.SenderFactory()
+
+    sender.blacklist(reason=constants.IP_RESTRICTED, ip_address="192.168.0.1")
+
+    assert sender.is_blacklisted
+    assert helpers.blocklist.is_blocked(email_address=sender.email_address)
+    assert helpers.blocklist.is_blocked(ip_address="192.168.0.1")
+
+
+@pytest.mark.django_db
+def test_sender_blacklist_whitelisted():
+    sender = factories.SenderFactory(is_whitelisted=True)
+
+    sender.blacklist(reason=constants.IP_RESTRICTED)
+
+    assert sender.is_blacklisted
+    assert not helpers.blocklist.is_blocked(email_address=sender.email_address)
+
+
 @pytest.mark.django_db
 def test_submission_ip_no_sender(submission):
     assert submission.ip_address is None
@@ -271,3 +271,10 @@ def test_gov_notify_letter_action_serializer_from_submission(
             "name": gov_notify_letter_submission.data["name"],
         },
     }
+
+
+@pytest.mark.django_db
+def test_form_submission_serializer_sets_action_name(gov_notify_email_submission):
+    gov_notify_email_submission.refresh_from_db()
+
+    assert gov_notify_email_submission.action_name == "gov-notify-email"
@@ -1,16 +1,36 @@
+import os
+import threading
 from datetime import timedelta
 from unittest import mock
 
 import pytest
+import requests
+from celery.exceptions import Retry
 from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
 from django.utils import timezone
+from notifications_python_client.errors import APIError as NotifyAPIError
 
-from submission import tasks
-from submission.constants import ACTION_NAME_GOV_NOTIFY_BULK_EMAIL
-from submission.models import Submission
+from client.tests.factories import ClientFactory
+from conf.celery import app, get_queue_depths
+from core import locks
+from submission import helpers, tasks
+from submission.constants import (
+    ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+    ACTION_NAME_GOV_NOTIFY_EMAIL,
+    ACTION_NAME_HCSAT_SUBMISSION,
+    ACTION_NAME_SAVE_ONLY_IN_DB,
+    DELIVERY_STATUS_DEAD,
+    DELIVERY_STATUS_PENDING,
+    DELIVERY_STATUS_SENT,
+)
+from submission.models import OutboxMessage, Submission, SubmissionDelivery
 from submission.tests.factories import SubmissionFactory
 
 
+@pytest.mark.django_db
 @mock.patch("submission.helpers.send_email")
 def test_task_send_email(mock_send_email):
     kwargs = {
@@ -25,6 +45,63 @@ def test_task_send_email(mock_send_email):
     assert mock_send_email.call_args == mock.call(**kwargs)
 
 
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_task_send_email_reference_only(mock_send_email):
+    submission = SubmissionFactory(
+        is_sent=False,
+        data={"text_body": "Hello", "html_body": "<p>Hello</p>"},
+        meta={
+            "action_name": "email",
+            "subject": "this thing",
+            "reply_to": ["reply@example.com"],
+            "recipients": ["to@example.com"],
+        },
+    )
+
+    tasks.send_email.delay(submission_id=submission.pk, action_name="email")
+
+    assert mock_send_email.call_args == mock.call(
+        subject="this thing",
+        reply_to=["reply@example.com"],
+        recipients=["to@example.com"],
+        text_body="Hello",
+        html_body="<p>Hello</p>",
+    )
+    submission.refresh_from_db()
+    assert submission.is_sent is True
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_task_send_email_reference_only_deleted_submission(mock_send_email):
+    tasks.send_email.delay(submission_id=0, action_name="email")
+
+    assert mock_send_email.call_count == 0
+
+
+@pytest.mark.django_db
+def test_task_send_email_batched(mailoutbox, settings):
+    cache.clear()
+    settings.EMAIL_BATCHING_ENABLED = True
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(2)]
+    kwargs = {
+        "subject": "this thing",
+        "reply_to": ["reply@example.com"],
+        "recipients": ["to@example.com"],
+        "text_body": "Hello",
+    }
+
+    for submission in submissions:
+        tasks.send_email.delay(submission_id=submission.pk, **kwargs)
+
+    assert len(mailoutbox) == 2
+    for submission in submissions:
+        submission.refresh_from_db()
+        assert submission.is_sent is True
+
+
+@pytest.mark.django_db
 @mock.patch("submission.helpers.create_zendesk_ticket")
 def test_create_zendesk_ticket(mock_create_zendesk_ticket):
     kwargs = {
@@ -40,6 +117,7 @@ def test_create_zendesk_ticket(mock_create_zendesk_ticket):
     assert mock_create_zendesk_ticket.call_args == mock.call(**kwargs)
 
 
+@pytest.mark.django_db
 @mock.patch("submission.helpers.send_gov_notify_email")
 def test_task_send_gov_notify_email(mock_send_gov_notify_email):
     kwargs = {
@@ -59,6 +137,7 @@ def test_task_send_gov_notify_email(mock_send_gov_notify_email):
 def test_task_send_gov_notify_bulk_email(mock_send_gov_notify_email):
     # create 5x fake submissions - one already marked as sent, one expired, one with the wrong action and two active.
     # We expect only the action active submissions to be called
+    mock_send_gov_notify_email.return_value = "notification-id"
     meta = {
         "action_name": ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
         "recipients": ["foo@bar.com"],
@@ -101,6 +180,59 @@ def test_task_send_gov_notify_bulk_email(mock_send_gov_notify_email):
     assert [x.is_sent for x in submissions]
 
 
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_send_gov_notify_bulk_email_chunks(mock_send_gov_notify_email, settings):
+    settings.GOV_NOTIFY_BULK_EMAIL_CHUNK_SIZE = 2
+    meta = {
+        "action_name": ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+        "email_address": "hello@acme.com",
+        "template_id": "123456",
+    }
+    client = ClientFactory()
+    submissions = [
+        SubmissionFactory(meta=meta, client=client, is_sent=False) for _ in range(5)
+    ]
+    mock_send_gov_notify_email.side_effect = ["1", ValueError("boom"), "3", "4", "5"]
+
+    tasks.send_gov_notify_bulk_email_chunks()
+
+    assert mock_send_gov_notify_email.call_count == 5
+    assert [
+        Submission.objects.get(pk=submission.pk).is_sent for submission in submissions
+    ] == [True, False, True, True, True]
+    deliveries = SubmissionDelivery.objects.filter(
+        submission__in=submissions
+    ).order_by("submission_id")
+    assert [
+        (delivery.status, delivery.attempts, delivery.last_error)
+        for delivery in deliveries
+    ] == [
+        (DELIVERY_STATUS_SENT, 1, ""),
+        (DELIVERY_STATUS_PENDING, 1, "ValueError"),
+        (DELIVERY_STATUS_SENT, 1, ""),
+        (DELIVERY_STATUS_SENT, 1, ""),
+        (DELIVERY_STATUS_SENT, 1, ""),
+    ]
+    assert deliveries[0].provider_reference == "1"
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.send_gov_notify_bulk_email_chunks.delay")
+def test_task_send_gov_notify_bulk_email_fan_out(mock_delay, settings):
+    settings.GOV_NOTIFY_BULK_EMAIL_CONCURRENCY = 3
+
+    tasks.send_gov_notify_bulk_email()
+    assert mock_delay.call_count == 0
+
+    SubmissionFactory(
+        meta={"action_name": ACTION_NAME_GOV_NOTIFY_BULK_EMAIL}, is_sent=False
+    )
+    tasks.send_gov_notify_bulk_email()
+    assert mock_delay.call_count == 3
+
+
+@pytest.mark.django_db
 @mock.patch("submission.helpers.send_gov_notify_letter")
 def test_task_send_gov_notify_letter(mock_send_gov_notify_letter):
     kwargs = {
@@ -113,6 +245,7 @@ def test_task_send_gov_notify_letter(mock_send_gov_notify_letter):
     assert mock_send_gov_notify_letter.call_args == mock.call(**kwargs)
 
 
+@pytest.mark.django_db
 @mock.patch("submission.helpers.send_pardot")
 def test_task_send_pardot(mock_send_pardot):
     kwargs = {
@@ -132,3 +265,700 @@ def test_task_send_buy_from_uk_enquiries_as_csv(mock_send_gov_notify_email):
     tasks.send_buy_from_uk_enquiries_as_csv(**kwargs)
 
     assert mock_send_gov_notify_email.call_count == 1
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.no_operation.delay")
+def test_execute_for_submission_outbox(mock_delay, settings):
+    settings.SUBMISSION_OUTBOX_ENABLED = True
+    submission = SubmissionFactory(
+        is_sent=False, meta={"action_name": ACTION_NAME_SAVE_ONLY_IN_DB}
+    )
+
+    tasks.execute_for_submission(submission)
+
+    assert mock_delay.call_count == 0
+    message = OutboxMessage.objects.get()
+    assert message.submission == submission
+    assert message.task_name == "submission.tasks.no_operation"
+    assert message.kwargs == {
+        "submission_id": submission.pk,
+        "action_name": ACTION_NAME_SAVE_ONLY_IN_DB,
+    }
+
+
+@pytest.mark.django_db
+def test_relay_outbox(settings):
+    settings.SUBMISSION_OUTBOX_ENABLED = True
+    submissions = [
+        SubmissionFactory(
+            is_sent=False, meta={"action_name": ACTION_NAME_SAVE_ONLY_IN_DB}
+        )
+        for _ in range(3)
+    ]
+    for submission in submissions:
+        tasks.execute_for_submission(submission)
+
+    assert tasks.relay_outbox(batch_size=2) == 2
+    assert tasks.relay_outbox(batch_size=2) == 1
+    assert tasks.relay_outbox(batch_size=2) == 0
+
+    assert OutboxMessage.objects.count() == 0
+    assert Submission.objects.filter(is_sent=True).count() == 3
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.no_operation.apply_async")
+def test_relay_outbox_broker_unavailable(mock_apply_async, settings):
+    settings.SUBMISSION_OUTBOX_ENABLED = True
+    mock_apply_async.side_effect = [None, ConnectionError()]
+    submissions = [
+        SubmissionFactory(
+            is_sent=False, meta={"action_name": ACTION_NAME_SAVE_ONLY_IN_DB}
+        )
+        for _ in range(3)
+    ]
+    for submission in submissions:
+        tasks.execute_for_submission(submission)
+
+    assert tasks.relay_outbox() == 1
+
+    assert mock_apply_async.call_count == 2
+    assert list(OutboxMessage.objects.values_list("submission", "attempts")) == [
+        (submissions[1].pk, 1),
+        (submissions[2].pk, 0),
+    ]
+
+
+@pytest.mark.django_db
+def test_relay_outbox_dead_letters_unpublishable(settings):
+    settings.SUBMISSION_OUTBOX_ENABLED = True
+    settings.SUBMISSION_OUTBOX_MAX_ATTEMPTS = 2
+    submissions = [
+        SubmissionFactory(
+            is_sent=False, meta={"action_name": ACTION_NAME_SAVE_ONLY_IN_DB}
+        )
+        for _ in range(3)
+    ]
+    for submission in submissions:
+        tasks.execute_for_submission(submission)
+    # Queued by a task that has since been renamed.
+    OutboxMessage.objects.filter(submission=submissions[0]).update(
+        task_name="submission.tasks.renamed"
+    )
+
+    # The rest of the outbox is published past it.
+    assert tasks.relay_outbox() == 2
+    assert list(OutboxMessage.objects.values_list("submission", "attempts")) == [
+        (submissions[0].pk, 1)
+    ]
+
+    assert tasks.relay_outbox() == 0
+    assert OutboxMessage.objects.count() == 0
+    delivery = SubmissionDelivery.objects.get(pk=submissions[0].pk)
+    assert delivery.status == DELIVERY_STATUS_DEAD
+    assert delivery.last_error == "OutboxPublishFailed: NotRegistered"
+    assert Submission.objects.filter(is_sent=True).count() == 2
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.relay_outbox", return_value=0)
+def test_relay_outbox_command(mock_relay_outbox):
+    call_command("relay_outbox", "--once", "--batch-size=10")
+
+    assert mock_relay_outbox.call_args == mock.call(batch_size=10)
+
+
+@pytest.mark.django_db
+def test_task_marks_submission_sent_in_batches(settings):
+    settings.SUBMISSION_STATUS_BATCHING_ENABLED = True
+    settings.SUBMISSION_STATUS_FLUSH_INTERVAL = 60
+    cache.clear()
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(2)]
+
+    for submission in submissions:
+        tasks.no_operation.delay(submission_id=submission.pk)
+    tasks.flush_submission_status()
+
+    for submission in submissions:
+        submission.refresh_from_db()
+        assert submission.is_sent is True
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_records_delivery(mock_send_gov_notify_email):
+    mock_send_gov_notify_email.side_effect = ["notification-id", ValueError()]
+    submissions = [SubmissionFactory(is_sent=False) for _ in range(2)]
+    kwargs = {
+        "template_id": "123456",
+        "email_address": "to@example.com",
+        "personalisation": {},
+    }
+
+    for submission in submissions:
+        tasks.send_gov_notify_email.delay(submission_id=submission.pk, **kwargs)
+
+    sent, failed = [
+        SubmissionDelivery.objects.get(submission=submission)
+        for submission in submissions
+    ]
+    assert sent.status == DELIVERY_STATUS_SENT
+    assert sent.provider_reference == "notification-id"
+    assert failed.status == DELIVERY_STATUS_PENDING
+    assert failed.attempts == 1
+    assert failed.last_error == "ValueError"
+    assert failed.next_attempt_at > timezone.now()
+
+
+@pytest.fixture
+def due_delivery():
+    submission = SubmissionFactory(
+        is_sent=False,
+        data={"text_body": "Hello", "html_body": "<p>Hello</p>"},
+        meta={
+            "action_name": "email",
+            "subject": "this thing",
+            "reply_to": ["reply@example.com"],
+            "recipients": ["to@example.com"],
+        },
+    )
+    SubmissionDelivery.objects.filter(submission=submission).update(
+        next_attempt_at=timezone.now() - timedelta(seconds=1)
+    )
+    return submission.delivery
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_sweep_submission_deliveries(mock_send_email, due_delivery):
+    not_due = SubmissionFactory(is_sent=False)
+
+    tasks.sweep_submission_deliveries()
+
+    assert mock_send_email.call_count == 1
+    due_delivery.refresh_from_db()
+    assert due_delivery.status == DELIVERY_STATUS_SENT
+    assert Submission.objects.get(pk=due_delivery.submission_id).is_sent is True
+    not_due.delivery.refresh_from_db()
+    assert not_due.delivery.status == DELIVERY_STATUS_PENDING
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.no_operation.delay")
+@pytest.mark.parametrize(
+    "action_name", [ACTION_NAME_SAVE_ONLY_IN_DB, ACTION_NAME_HCSAT_SUBMISSION]
+)
+def test_sweep_submission_deliveries_save_only(mock_delay, action_name):
+    submission = SubmissionFactory(is_sent=False, meta={"action_name": action_name})
+
+    tasks.sweep_submission_deliveries()
+
+    assert mock_delay.call_count == 0
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.status == DELIVERY_STATUS_PENDING
+    # Never due, so not swept however long it waits.
+    assert submission.delivery.next_attempt_at is None
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_sweep_submission_deliveries_backoff(mock_send_email, due_delivery, settings):
+    settings.DELIVERY_MAX_ATTEMPTS = 2
+    settings.DELIVERY_RETRY_BACKOFF = 60
+    mock_send_email.side_effect = ValueError()
+
+    tasks.sweep_submission_deliveries()
+
+    due_delivery.refresh_from_db()
+    assert due_delivery.status == DELIVERY_STATUS_PENDING
+    assert due_delivery.attempts == 1
+    assert due_delivery.next_attempt_at > timezone.now() + timedelta(seconds=50)
+
+    # Nothing is due until the backoff has passed
+    tasks.sweep_submission_deliveries()
+    assert mock_send_email.call_count == 1
+
+    SubmissionDelivery.objects.filter(pk=due_delivery.pk).update(
+        next_attempt_at=timezone.now()
+    )
+    tasks.sweep_submission_deliveries()
+
+    due_delivery.refresh_from_db()
+    assert mock_send_email.call_count == 2
+    assert due_delivery.status == DELIVERY_STATUS_DEAD
+    assert due_delivery.next_attempt_at is None
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_sweep_submission_deliveries_dead_letters(
+    mock_send_email, due_delivery, settings
+):
+    settings.DELIVERY_MAX_ATTEMPTS_BY_ACTION = {"email": 1}
+    SubmissionDelivery.objects.filter(pk=due_delivery.pk).update(attempts=1)
+
+    tasks.sweep_submission_deliveries()
+
+    due_delivery.refresh_from_db()
+    assert mock_send_email.call_count == 0
+    assert due_delivery.status == DELIVERY_STATUS_DEAD
+    assert due_delivery.last_error == "MaxAttemptsExceeded"
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_sweep_submission_deliveries_sender_disabled(mock_send_email, due_delivery):
+    due_delivery.submission.sender.blacklist(reason="MA")
+
+    tasks.sweep_submission_deliveries()
+
+    due_delivery.refresh_from_db()
+    assert mock_send_email.call_count == 0
+    assert due_delivery.status == DELIVERY_STATUS_DEAD
+    assert due_delivery.last_error == "SenderDisabled"
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_sweep_submission_deliveries_expired(mock_send_email, due_delivery, settings):
+    settings.SUBMISSION_FILTER_HOURS = 72
+    # Backfilled as due since the submission was created.
+    created = timezone.now() - timedelta(hours=73)
+    Submission.objects.filter(pk=due_delivery.submission_id).update(created=created)
+    SubmissionDelivery.objects.filter(pk=due_delivery.pk).update(next_attempt_at=created)
+    retried = SubmissionFactory(is_sent=False)
+    Submission.objects.filter(pk=retried.pk).update(created=created)
+    # Last due within the window, so only skipped until then.
+    SubmissionDelivery.objects.filter(pk=retried.pk).update(
+        next_attempt_at=timezone.now() - timedelta(hours=1)
+    )
+
+    tasks.sweep_submission_deliveries()
+
+    assert mock_send_email.call_count == 0
+    due_delivery.refresh_from_db()
+    assert due_delivery.status == DELIVERY_STATUS_DEAD
+    assert due_delivery.last_error == "Expired"
+    retried.delivery.refresh_from_db()
+    assert retried.delivery.status == DELIVERY_STATUS_PENDING
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_email")
+def test_sweep_submission_deliveries_unexpected_error(mock_send_email, due_delivery, settings):
+    settings.DELIVERY_MAX_ATTEMPTS = 2
+    broken = SubmissionFactory(is_sent=False, data="oops", meta=due_delivery.submission.meta)
+    SubmissionDelivery.objects.filter(pk=broken.pk).update(
+        next_attempt_at=timezone.now() - timedelta(seconds=2)
+    )
+
+    tasks.sweep_submission_deliveries()
+
+    broken.delivery.refresh_from_db()
+    assert broken.delivery.status == DELIVERY_STATUS_PENDING
+    assert broken.delivery.attempts == 1
+    assert broken.delivery.last_error == "TypeError"
+    assert broken.delivery.next_attempt_at > timezone.now()
+    # The rest of the batch is still swept.
+    assert mock_send_email.call_count == 1
+    due_delivery.refresh_from_db()
+    assert due_delivery.status == DELIVERY_STATUS_SENT
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.wait_for_provider")
+@mock.patch("submission.helpers.notify_client_pool")
+def test_task_deferred_when_provider_throttled(
+    mock_notify_client_pool, mock_wait_for_provider
+):
+    mock_wait_for_provider.side_effect = [
+        helpers.ProviderThrottled("notify", 10),
+        None,
+    ]
+    submission = SubmissionFactory(is_sent=False)
+
+    with mock.patch.object(
+        tasks.send_gov_notify_email, "retry", wraps=tasks.send_gov_notify_email.retry
+    ) as mock_retry:
+        tasks.send_gov_notify_email.delay(
+            submission_id=submission.pk,
+            template_id="123456",
+            email_address="to@example.com",
+            personalisation={},
+        )
+
+    assert mock_retry.call_args.kwargs["countdown"] == 10
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.status == DELIVERY_STATUS_SENT
+    assert submission.delivery.last_error == ""
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.send_gov_notify_bulk_email_chunks.apply_async")
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_send_gov_notify_bulk_email_chunks_throttled(
+    mock_send_gov_notify_email, mock_apply_async
+):
+    meta = {
+        "action_name": ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+        "email_address": "hello@acme.com",
+        "template_id": "123456",
+    }
+    client = ClientFactory()
+    submissions = [
+        SubmissionFactory(meta=meta, client=client, is_sent=False) for _ in range(3)
+    ]
+    mock_send_gov_notify_email.side_effect = [
+        "1",
+        helpers.ProviderThrottled("notify", 20),
+    ]
+
+    tasks.send_gov_notify_bulk_email_chunks()
+
+    assert mock_apply_async.call_args == mock.call(countdown=20)
+    deliveries = SubmissionDelivery.objects.filter(
+        submission__in=submissions
+    ).order_by("submission_id")
+    assert [(delivery.status, delivery.attempts) for delivery in deliveries] == [
+        (DELIVERY_STATUS_SENT, 1),
+        (DELIVERY_STATUS_PENDING, 0),
+        (DELIVERY_STATUS_PENDING, 0),
+    ]
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.notify_client_pool")
+def test_task_deferred_when_circuit_open(mock_notify_client_pool, settings):
+    settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD = 1
+    helpers.notify_breaker.record_failure()
+    submission = SubmissionFactory(is_sent=False)
+
+    with mock.patch.object(
+        tasks.send_gov_notify_email, "retry", side_effect=Retry
+    ) as mock_retry:
+        with pytest.raises(Retry):
+            tasks.send_gov_notify_email(
+                submission_id=submission.pk,
+                template_id="123456",
+                email_address="to@example.com",
+                personalisation={},
+            )
+
+    assert mock_notify_client_pool.get.call_count == 0
+    assert 0 < mock_retry.call_args.kwargs["countdown"] <= 30
+    assert mock_retry.call_args.kwargs["max_retries"] is None
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.status == DELIVERY_STATUS_PENDING
+    assert submission.delivery.attempts == 0
+
+
+def notify_error(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return NotifyAPIError(response=response)
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_rescheduled_after_retry_after(mock_send_gov_notify_email):
+    mock_send_gov_notify_email.side_effect = notify_error(429, {"Retry-After": "120"})
+    submission = SubmissionFactory(is_sent=False)
+
+    with mock.patch.object(
+        tasks.send_gov_notify_email, "retry", side_effect=Retry
+    ) as mock_retry:
+        with pytest.raises(Retry):
+            tasks.send_gov_notify_email(
+                submission_id=submission.pk,
+                template_id="123456",
+                email_address="to@example.com",
+                personalisation={},
+            )
+
+    assert mock_retry.call_args.kwargs["countdown"] == 120
+    assert mock_retry.call_args.kwargs["max_retries"] is None
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.attempts == 0
+    # The sweeper leaves the delivery alone until the retry has had its turn.
+    assert submission.delivery.next_attempt_at > timezone.now() + timedelta(seconds=120)
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_retried_with_backoff_on_server_error(mock_send_gov_notify_email):
+    mock_send_gov_notify_email.side_effect = notify_error(502)
+    submission = SubmissionFactory(is_sent=False)
+
+    with mock.patch.object(
+        tasks.send_gov_notify_email, "retry", side_effect=Retry
+    ) as mock_retry:
+        with pytest.raises(Retry):
+            tasks.send_gov_notify_email(
+                submission_id=submission.pk,
+                template_id="123456",
+                email_address="to@example.com",
+                personalisation={},
+            )
+
+    assert 0 <= mock_retry.call_args.kwargs["countdown"] <= 30
+    assert mock_retry.call_args.kwargs["max_retries"] == 5
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_permanent_error_marks_delivery_dead(mock_send_gov_notify_email):
+    mock_send_gov_notify_email.side_effect = notify_error(400)
+    submission = SubmissionFactory(is_sent=False)
+
+    tasks.send_gov_notify_email.delay(
+        submission_id=submission.pk,
+        template_id="123456",
+        email_address="to@example.com",
+        personalisation={},
+    )
+
+    assert mock_send_gov_notify_email.call_count == 1
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.status == DELIVERY_STATUS_DEAD
+    assert submission.delivery.last_error == "APIError: 400"
+
+
+def test_every_task_is_routed_to_a_tier():
+    tiered_queues = {
+        queue for queues in settings.TASK_QUEUE_TIERS.values() for queue in queues
+    }
+    task_names = {name for name in app.tasks if name.startswith("submission.tasks.")}
+
+    assert task_names == set(settings.CELERY_TASK_ROUTES)
+    for route in settings.CELERY_TASK_ROUTES.values():
+        assert route["queue"] in tiered_queues
+
+
+@pytest.mark.parametrize("filename", ["Procfile", "docker-compose.yml", "makefile"])
+def test_every_tier_has_a_worker(filename):
+    with open(os.path.join(settings.BASE_DIR, filename)) as workers:
+        consumed = {
+            queue
+            for line in workers
+            if "celery" in line and " worker " in line
+            for queue in line.split(" -Q ")[1].split()[0].strip('"').split(",")
+        }
+
+    for queues in settings.TASK_QUEUE_TIERS.values():
+        assert set(queues) <= consumed
+
+
+def test_get_queue_depths():
+    cache.clear()
+    with app.connection_for_read() as connection:
+        connection.default_channel.client.rpush("reports", "message", "message")
+
+    depths = get_queue_depths()
+
+    assert depths["reports.reports"] == 2
+    assert depths["interactive.zendesk"] == 0
+    cache.clear()
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_send_gov_notify_bulk_email_chunks_takes_turns(
+    mock_send_gov_notify_email, settings
+):
+    settings.GOV_NOTIFY_BULK_EMAIL_CHUNK_SIZE = 2
+    meta = {
+        "action_name": ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+        "email_address": "hello@acme.com",
+        "template_id": "123456",
+    }
+    campaign_client = ClientFactory(weight=2)
+    for _ in range(8):
+        SubmissionFactory(
+            meta={**meta, "template_id": "campaign"}, client=campaign_client, is_sent=False
+        )
+    for _ in range(2):
+        SubmissionFactory(meta={**meta, "template_id": "other"}, is_sent=False)
+    sent = []
+    mock_send_gov_notify_email.side_effect = lambda **kwargs: sent.append(
+        kwargs["template_id"]
+    )
+
+    tasks.send_gov_notify_bulk_email_chunks()
+
+    assert len(sent) == 10
+    # The other client's emails go out within the first round, rather than after the campaign.
+    assert sorted(sent[:6]) == ["campaign"] * 4 + ["other"] * 2
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.get_client_weights", wraps=tasks.get_client_weights)
+@mock.patch("submission.helpers.send_gov_notify_email", return_value="notification-id")
+def test_task_send_gov_notify_bulk_email_chunks_client_refresh(
+    mock_send_gov_notify_email, mock_get_client_weights, settings
+):
+    settings.GOV_NOTIFY_BULK_EMAIL_CHUNK_SIZE = 2
+    settings.GOV_NOTIFY_BULK_EMAIL_CLIENT_REFRESH_INTERVAL = 3600
+    meta = {
+        "action_name": ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+        "email_address": "hello@acme.com",
+        "template_id": "123456",
+    }
+    campaign_client = ClientFactory()
+    for _ in range(10):
+        SubmissionFactory(meta=meta, client=campaign_client, is_sent=False)
+
+    tasks.send_gov_notify_bulk_email_chunks()
+
+    assert mock_send_gov_notify_email.call_count == 10
+    # Once at the start, and once more to check for new clients before giving up, rather than every round.
+    assert mock_get_client_weights.call_count == 2
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.is_gevent_pool", return_value=True)
+def test_database_connection_gevent_pool(mock_is_gevent_pool):
+    default_connection = connections["default"]
+
+    with tasks.database_connection():
+        pooled_connection = connections["default"]
+        with pooled_connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    with tasks.database_connection():
+        assert connections["default"] is pooled_connection
+
+    assert pooled_connection is not default_connection
+    assert pooled_connection.connection is not None
+    assert connections["default"] is default_connection
+    assert tasks.idle_database_connections == [pooled_connection]
+    tasks.idle_database_connections.clear()
+    pooled_connection.close()
+
+
+def test_database_connection_prefork_pool():
+    default_connection = connections["default"]
+
+    with tasks.database_connection():
+        assert connections["default"] is default_connection
+
+    assert tasks.idle_database_connections == []
+
+
+def test_save_submission_task_submission_id_per_thread():
+    task = tasks.send_gov_notify_email
+    task.submission_id = 1
+    thread = threading.Thread(target=setattr, args=(task, "submission_id", 2))
+    thread.start()
+    thread.join()
+
+    assert task.submission_id == 1
+
+
+@mock.patch("submission.tasks.metrics.increment")
+@mock.patch("submission.tasks.get_due_deliveries")
+def test_singleton_task_skips_overlapping_run(mock_get_due_deliveries, mock_increment):
+    cache.clear()
+    lease = locks.Lease("submission.tasks.sweep_submission_deliveries:0", ttl=60)
+
+    with lease.hold():
+        tasks.sweep_submission_deliveries.apply()
+
+    assert mock_get_due_deliveries.call_count == 0
+    assert mock_increment.call_args == mock.call(
+        "singleton.submission.tasks.sweep_submission_deliveries.skipped"
+    )
+
+
+@mock.patch("submission.helpers.send_buy_from_uk_enquiries_as_csv")
+def test_singleton_task_queues_overlapping_run(mock_send_buy_from_uk_enquiries_as_csv):
+    cache.clear()
+    task = tasks.send_buy_from_uk_enquiries_as_csv
+    lease = locks.Lease(f"{task.name}:0", ttl=60)
+
+    with mock.patch.object(task, "retry", side_effect=Retry()) as mock_retry:
+        with lease.hold():
+            task.apply(task_id="queued")
+            task.apply(task_id="overlapping")
+            # The queued run is still waiting.
+            task.apply(task_id="queued")
+        task.apply(task_id="queued")
+
+    assert mock_retry.call_args_list == [
+        mock.call(countdown=task.singleton_queue_countdown, max_retries=None)
+    ] * 2
+    assert mock_send_buy_from_uk_enquiries_as_csv.call_count == 1
+    assert cache.get(task.queued_key) is None
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.get_client_weights", return_value={})
+def test_singleton_task_slots(mock_get_client_weights):
+    cache.clear()
+    task = tasks.send_gov_notify_bulk_email_chunks
+    leases = [locks.Lease(f"{task.name}:{slot}", ttl=60) for slot in range(task.singleton_slots)]
+
+    for lease in leases[1:]:
+        lease.acquire()
+    task.apply()
+    assert mock_get_client_weights.call_count == 1
+
+    leases[0].acquire()
+    task.apply()
+    assert mock_get_client_weights.call_count == 1
+    cache.clear()
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.metrics.increment")
+@mock.patch("submission.helpers.send_gov_notify_email", return_value="notification-id")
+def test_task_sends_each_submission_once(mock_send_gov_notify_email, mock_increment):
+    cache.clear()
+    submission = SubmissionFactory(
+        is_sent=False,
+        meta={
+            "action_name": ACTION_NAME_GOV_NOTIFY_EMAIL,
+            "email_address": "hello@acme.com",
+            "template_id": "123456",
+        },
+    )
+    kwargs = {"submission_id": submission.pk, "action_name": ACTION_NAME_GOV_NOTIFY_EMAIL}
+    lease = locks.Lease(
+        f"delivery:{submission.pk}:{tasks.send_gov_notify_email.name}", ttl=60
+    )
+
+    with lease.hold():
+        tasks.send_gov_notify_email.apply(kwargs=kwargs)
+    assert mock_send_gov_notify_email.call_count == 0
+
+    tasks.send_gov_notify_email.apply(kwargs=kwargs)
+    tasks.send_gov_notify_email.apply(kwargs=kwargs)
+
+    assert mock_send_gov_notify_email.call_count == 1
+    assert mock_increment.call_args_list == [mock.call("delivery.duplicate_skipped")] * 2
+    assert lease.is_held() is False
+    submission.delivery.refresh_from_db()
+    assert submission.delivery.status == DELIVERY_STATUS_SENT
+
+
+@pytest.mark.django_db
+@mock.patch("submission.helpers.send_gov_notify_email")
+def test_task_skipped_while_sent_status_buffered(mock_send_gov_notify_email, settings):
+    cache.clear()
+    settings.SUBMISSION_STATUS_BATCHING_ENABLED = True
+    settings.SUBMISSION_STATUS_FLUSH_INTERVAL = 60
+    submission = SubmissionFactory(
+        is_sent=False,
+        meta={
+            "action_name": ACTION_NAME_GOV_NOTIFY_EMAIL,
+            "email_address": "hello@acme.com",
+            "template_id": "123456",
+        },
+    )
+    kwargs = {"submission_id": submission.pk, "action_name": ACTION_NAME_GOV_NOTIFY_EMAIL}
+
+    tasks.send_gov_notify_email.apply(kwargs=kwargs)
+    tasks.send_gov_notify_email.apply(kwargs=kwargs)
+
+    assert mock_send_gov_notify_email.call_count == 1
+    cache.clear()
@@ -7,7 +7,8 @@ from rest_framework.test import APIClient
 
 from client.tests.factories import ClientFactory
 from client.tests.utils import sign_invalid_client_hawk_header
-from submission import models
+from core import metrics
+from submission import models, tasks
 from submission.tests import factories
 
 
@@ -25,6 +26,7 @@ def clear_cache():
 def api_client(settings, user):
     settings.SIGAUTH_URL_NAMES_WHITELIST = [
         "submission",
+        "submission-batch",
         "gov-notify-bulk-email",
         "hcsat-feedback-submission",
     ]
@@ -252,13 +254,16 @@ def test_email_action(mock_delay, api_client, email_action_payload):
 
     assert response.status_code == 201
     assert mock_delay.call_count == 1
+    submission = models.Submission.objects.last()
     assert mock_delay.call_args == mock.call(
+        submission_id=submission.pk, action_name=submission.action_name
+    )
+    assert tasks.get_action_kwargs(submission) == dict(
         subject=email_action_payload["meta"]["subject"],
         reply_to=email_action_payload["meta"]["reply_to"],
         recipients=email_action_payload["meta"]["recipients"],
         text_body=email_action_payload["data"]["text_body"],
         html_body=email_action_payload["data"]["html_body"],
-        submission_id=models.Submission.objects.last().pk,
     )
 
 
@@ -278,14 +283,17 @@ def test_zendesk_action(mock_delay, api_client, zendesk_action_payload, settings
 
     assert response.status_code == 201
     assert mock_delay.call_count == 1
+    submission = models.Submission.objects.last()
     assert mock_delay.call_args == mock.call(
+        submission_id=submission.pk, action_name=submission.action_name
+    )
+    assert tasks.get_action_kwargs(submission) == dict(
         subject=zendesk_action_payload["meta"]["subject"],
         full_name=zendesk_action_payload["meta"]["full_name"],
         email_address=zendesk_action_payload["meta"]["email_address"],
         payload=expected_payload,
         service_name=zendesk_action_payload["meta"]["service_name"],
         subdomain=settings.ZENDESK_SUBDOMAIN_DEFAULT,
-        submission_id=models.Submission.objects.last().pk,
     )
 
 
@@ -300,11 +308,14 @@ def test_gov_notify_email_action(
 
     assert response.status_code == 201, response.json()
     assert mock_delay.call_count == 1
+    submission = models.Submission.objects.last()
     assert mock_delay.call_args == mock.call(
+        submission_id=submission.pk, action_name=submission.action_name
+    )
+    assert tasks.get_action_kwargs(submission) == dict(
         template_id=gov_notify_email_action_payload["meta"]["template_id"],
         email_address=gov_notify_email_action_payload["meta"]["email_address"],
         personalisation=gov_notify_email_action_payload["data"],
-        submission_id=models.Submission.objects.last().pk,
     )
 
 
@@ -320,11 +331,14 @@ def test_gov_notify_action_old_constant(
 
     assert response.status_code == 201, response.json()
     assert mock_delay.call_count == 1
+    submission = models.Submission.objects.last()
     assert mock_delay.call_args == mock.call(
+        submission_id=submission.pk, action_name=submission.action_name
+    )
+    assert tasks.get_action_kwargs(submission) == dict(
         template_id=gov_notify_action_payload_old["meta"]["template_id"],
         email_address=gov_notify_action_payload_old["meta"]["email_address"],
         personalisation=gov_notify_action_payload_old["data"],
-        submission_id=models.Submission.objects.last().pk,
     )
 
 
@@ -339,10 +353,13 @@ def test_gov_notify_letter_action(
 
     assert response.status_code == 201, response.json()
     assert mock_delay.call_count == 1
+    submission = models.Submission.objects.last()
     assert mock_delay.call_args == mock.call(
+        submission_id=submission.pk, action_name=submission.action_name
+    )
+    assert tasks.get_action_kwargs(submission) == dict(
         template_id=gov_notify_letter_action_payload["meta"]["template_id"],
         personalisation=gov_notify_letter_action_payload["data"],
-        submission_id=models.Submission.objects.last().pk,
     )
 
 
@@ -355,10 +372,13 @@ def test_pardot_action(mock_delay, api_client, pardot_action_payload):
 
     assert response.status_code == 201, response.json()
     assert mock_delay.call_count == 1
+    submission = models.Submission.objects.last()
     assert mock_delay.call_args == mock.call(
+        submission_id=submission.pk, action_name=submission.action_name
+    )
+    assert tasks.get_action_kwargs(submission) == dict(
         pardot_url=pardot_action_payload["meta"]["pardot_url"],
         payload=pardot_action_payload["data"],
-        submission_id=models.Submission.objects.last().pk,
     )
 
 
@@ -414,6 +434,105 @@ def test_email_action_rate_limit_exceeded(
     assert black_listed_sender.blacklisted_reason == "IP"
 
 
+@pytest.mark.django_db
+@mock.patch("submission.tasks.send_gov_notify_email.delay")
+def test_email_action_sender_rate_limit_exceeded(
+    mock_email, api_client, gov_notify_email_action_payload, settings
+):
+    del gov_notify_email_action_payload["meta"]["sender"]
+    settings.RATELIMIT_SENDER_RATE = "2/m"
+
+    status_codes = [
+        api_client.post(
+            reverse("api:submission"),
+            data=gov_notify_email_action_payload,
+            format="json",
+        ).status_code
+        for _ in range(3)
+    ]
+
+    assert status_codes == [201, 201, 429]
+    assert mock_email.call_count == 2
+    sender = models.Sender.objects.get(email_address="notify-user@example.com")
+    assert sender.is_blacklisted is False
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.send_gov_notify_email.delay")
+def test_email_action_rate_limit_exceeded_not_persisted(
+    mock_email, api_client, gov_notify_email_action_payload, settings
+):
+    settings.RATELIMIT_RATE = "2/m"
+
+    status_codes = [
+        api_client.post(
+            reverse("api:submission"),
+            data=gov_notify_email_action_payload,
+            format="json",
+        ).status_code
+        for _ in range(4)
+    ]
+
+    assert status_codes == [201, 201, 429, 429]
+    assert models.Submission.objects.count() == 2
+    counters = metrics.snapshot()["counters"]
+    assert counters["submission.rejected.ip"] == 1
+    assert counters["submission.rejected.blocked"] == 1
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.send_gov_notify_email.delay")
+def test_email_action_blocked_sender(
+    mock_email, api_client, gov_notify_email_action_payload
+):
+    sender = factories.SenderFactory(
+        email_address=gov_notify_email_action_payload["meta"]["sender"][
+            "email_address"
+        ]
+    )
+    sender.blacklist(reason="IP")
+
+    response = api_client.post(
+        reverse("api:submission"),
+        data=gov_notify_email_action_payload,
+        format="json",
+    )
+
+    assert response.status_code == 429
+    assert models.Submission.objects.count() == 0
+
+    sender.is_whitelisted = True
+    sender.save()
+    response = api_client.post(
+        reverse("api:submission"),
+        data=gov_notify_email_action_payload,
+        format="json",
+    )
+
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.send_gov_notify_email.delay")
+def test_email_action_outbox(
+    mock_email, api_client, gov_notify_email_action_payload, settings
+):
+    settings.SUBMISSION_OUTBOX_ENABLED = True
+
+    response = api_client.post(
+        reverse("api:submission"),
+        data=gov_notify_email_action_payload,
+        format="json",
+    )
+
+    assert response.status_code == 201
+    assert mock_email.call_count == 0
+    submission = models.Submission.objects.get()
+    assert submission.outbox_messages.get().task_name == (
+        "submission.tasks.send_gov_notify_email"
+    )
+
+
 @pytest.mark.django_db
 @mock.patch("submission.tasks.send_gov_notify_email.delay")
 def test_invalid_credential_unauthorized_error_on_submission(
@@ -503,6 +622,41 @@ class TestBulkGovNotifyEmail:
         assert models.Submission.objects.count() == 3
         assert response.status_code == 201, response.json()
 
+    @pytest.mark.django_db
+    def test_gov_notify_bulk_email_action_bulk_inserts(
+        self,
+        api_client,
+        gov_notify_bulk_email_action_payload,
+        settings,
+        user,
+        django_assert_max_num_queries,
+    ):
+        settings.SUBMISSION_BULK_CREATE_BATCH_SIZE = 2
+        entries = gov_notify_bulk_email_action_payload["bulk_email_entries"]
+        gov_notify_bulk_email_action_payload["bulk_email_entries"] = entries * 10
+
+        # A savepoint and its release, then two INSERTs for each of the 15 batches.
+        with django_assert_max_num_queries(32):
+            response = api_client.post(
+                reverse("api_v2:gov-notify-bulk-email"),
+                data=gov_notify_bulk_email_action_payload,
+                format="json",
+            )
+
+        assert response.status_code == 201
+        submission = models.Submission.objects.filter(
+            meta__email_address=entries[0]["email_address"]
+        ).first()
+        assert submission.client == user
+        assert submission.data == entries[0]
+        assert submission.meta == {
+            "action_name": "gov-notify-bulk-email",
+            "template_id": gov_notify_bulk_email_action_payload["template_id"],
+            "email_address": entries[0]["email_address"],
+        }
+        assert submission.delivery.status == "pending"
+        assert submission.delivery.client_id == user.pk
+
     @pytest.mark.django_db
     def test_gov_notify_bulk_email_action_fails_on_bad_input(
         self, api_client, gov_notify_bulk_email_action_payload
@@ -541,6 +695,181 @@ class TestBulkGovNotifyEmail:
         assert models.Submission.objects.count() == 0
         assert response.status_code == 400, response.json()
 
+    @pytest.mark.django_db
+    def test_gov_notify_bulk_email_action_stream(
+        self, api_client, gov_notify_bulk_email_action_payload, settings, user
+    ):
+        settings.SUBMISSION_BULK_CREATE_BATCH_SIZE = 2
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + "?stream=true",
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 201, response.json()
+        assert response.json() == {"template_id": "1234", "email_reply_to_id": "5678", "count": 3}
+        entries = gov_notify_bulk_email_action_payload["bulk_email_entries"]
+        submissions = models.Submission.objects.order_by("pk")
+        assert [submission.data for submission in submissions] == entries
+        assert submissions[0].client == user
+        assert submissions[0].meta == {
+            "action_name": "gov-notify-bulk-email",
+            "template_id": "1234",
+            "email_address": entries[0]["email_address"],
+        }
+        assert submissions[0].delivery.status == "pending"
+
+    @pytest.mark.django_db
+    def test_gov_notify_bulk_email_action_stream_invalid_entry(
+        self, api_client, gov_notify_bulk_email_action_payload, settings
+    ):
+        settings.SUBMISSION_BULK_CREATE_BATCH_SIZE = 2
+        del gov_notify_bulk_email_action_payload["bulk_email_entries"][2]["email_address"]
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + "?stream=true",
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"bulk_email_entries": {"2": {"email_address": ["This field is required."]}}}
+        # The first batch was rolled back.
+        assert models.Submission.objects.count() == 0
+
+    @pytest.mark.django_db
+    def test_gov_notify_bulk_email_action_stream_template_id_after_entries(
+        self, api_client, gov_notify_bulk_email_action_payload
+    ):
+        template_id = gov_notify_bulk_email_action_payload.pop("template_id")
+        gov_notify_bulk_email_action_payload["template_id"] = template_id
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + "?stream=true",
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"template_id": ["This field is required."]}
+        assert models.Submission.objects.count() == 0
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("query", ["", "?stream=true"])
+    def test_gov_notify_bulk_email_action_too_many_entries(
+        self, api_client, gov_notify_bulk_email_action_payload, settings, query
+    ):
+        settings.BULK_SUBMISSION_MAX_ENTRIES = 2
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + query,
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"bulk_email_entries": ["Ensure this field has no more than 2 elements."]}
+        assert models.Submission.objects.count() == 0
+
+    @pytest.mark.django_db
+    def test_gov_notify_bulk_email_action_too_large(
+        self, api_client, gov_notify_bulk_email_action_payload, settings
+    ):
+        settings.BULK_SUBMISSION_MAX_BYTES = 100
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email"),
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 413
+        assert models.Submission.objects.count() == 0
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        "query,headers",
+        [("?response=compact", {}), ("", {"HTTP_PREFER": "return=minimal"}), ("?stream=true&response=compact", {})],
+    )
+    def test_gov_notify_bulk_email_action_compact(
+        self, api_client, gov_notify_bulk_email_action_payload, settings, query, headers
+    ):
+        settings.SUBMISSION_BULK_CREATE_BATCH_SIZE = 2
+        entries = gov_notify_bulk_email_action_payload["bulk_email_entries"]
+        gov_notify_bulk_email_action_payload["bulk_email_entries"] = [entries[0], {"name": "no email"}, *entries[1:]]
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + query,
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+            **headers,
+        )
+
+        assert response.status_code == 201
+        assert response["Preference-Applied"] == "return=minimal"
+        body = response.json()
+        submissions = models.Submission.objects.order_by("pk")
+        assert [submission.data for submission in submissions] == entries
+        assert {submission.meta["batch_id"] for submission in submissions} == {body["batch_id"]}
+        assert body == {
+            "batch_id": body["batch_id"],
+            "accepted": 3,
+            "rejected": 1,
+            "submission_ids": {"first": submissions.first().pk, "last": submissions.last().pk},
+            "errors": {"1": {"email_address": ["This field is required."]}},
+        }
+
+    @pytest.mark.django_db
+    def test_gov_notify_bulk_email_action_compact_all_rejected(
+        self, api_client, gov_notify_bulk_email_action_payload
+    ):
+        gov_notify_bulk_email_action_payload["bulk_email_entries"] = ["one@example.com"]  # /PS-IGNORE
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + "?response=compact",
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 400
+        body = response.json()
+        assert body["accepted"] == 0
+        assert body["rejected"] == 1
+        assert body["submission_ids"] is None
+        assert list(body["errors"]) == ["0"]
+        assert models.Submission.objects.count() == 0
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("query", ["", "?response=compact", "?stream=true&response=compact"])
+    def test_gov_notify_bulk_email_action_empty(self, api_client, gov_notify_bulk_email_action_payload, query):
+        gov_notify_bulk_email_action_payload["bulk_email_entries"] = []
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + query,
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 201
+        assert models.Submission.objects.count() == 0
+
+    @pytest.mark.django_db
+    def test_gov_notify_bulk_email_action_compact_invalid_fields(
+        self, api_client, gov_notify_bulk_email_action_payload
+    ):
+        del gov_notify_bulk_email_action_payload["template_id"]
+
+        response = api_client.post(
+            reverse("api_v2:gov-notify-bulk-email") + "?response=compact",
+            data=gov_notify_bulk_email_action_payload,
+            format="json",
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"template_id": ["This field is required."]}
+        assert models.Submission.objects.count() == 0
+
 
 @pytest.mark.django_db
 def test_hcsat_submmission_success(api_client, hcsat_bulk_instance):
@@ -574,3 +903,172 @@ def test_hcsat_submmission_bad_input_failure(api_client, hcsat_bulk_instance):
 
     assert response.status_code == 400
     assert models.Submission.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_hcsat_submmission_stream(api_client, hcsat_bulk_instance):
+    response = api_client.post(
+        reverse("api_v2:hcsat-feedback-submission") + "?stream=true",
+        data=hcsat_bulk_instance,
+        format="json",
+    )
+
+    assert response.status_code == 201
+    assert response.json() == {"count": 2}
+    assert [submission.data for submission in models.Submission.objects.order_by("pk")] == (
+        hcsat_bulk_instance["hcsat_feedback_entries"]
+    )
+
+
+@pytest.mark.django_db
+def test_hcsat_submmission_stream_malformed(api_client):
+    response = api_client.post(
+        reverse("api_v2:hcsat-feedback-submission") + "?stream=true",
+        data='{"hcsat_feedback_entries": [{"id": "1"',
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+    assert models.Submission.objects.count() == 0
+
+
+@pytest.mark.django_db
+@mock.patch("submission.tasks.send_gov_notify_email.apply_async")
+@mock.patch("submission.tasks.send_email.apply_async")
+def test_submission_batch(
+    mock_send_email,
+    mock_send_gov_notify_email,
+    api_client,
+    email_action_payload,
+    gov_notify_email_action_payload,
+    user,
+):
+    factories.SenderFactory(email_address="email-user@example.com")  # /PS-IGNORE
+    blacklisted = factories.SenderFactory(is_blacklisted=True)
+    blacklisted_payload = {
+        **gov_notify_email_action_payload,
+        "meta": {
+            **gov_notify_email_action_payload["meta"],
+            "sender": {"email_address": blacklisted.email_address},
+        },
+    }
+    invalid_payload = {
+        **email_action_payload,
+        "meta": {**email_action_payload["meta"], "recipients": ["nobody"]},
+    }
+
+    response = api_client.post(
+        reverse("api:submission-batch"),
+        data=[
+            email_action_payload,
+            gov_notify_email_action_payload,
+            invalid_payload,
+            {"meta": {"action_name": "unknown"}, "data": {}},
+            "nonsense",
+            blacklisted_payload,
+        ],
+        format="json",
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [201, 201, 400, 400, 400, 201]
+    assert results[2]["errors"] == {"recipients": {"0": ["Enter a valid email address."]}}
+    submissions = models.Submission.objects.in_bulk(
+        [results[0]["id"], results[1]["id"], results[5]["id"]]
+    )
+    assert len(submissions) == 3
+    email_submission = submissions[results[0]["id"]]
+    assert email_submission.client == user
+    assert email_submission.sender.email_address == "email-user@example.com"  # /PS-IGNORE
+    assert email_submission.delivery.status == "pending"
+    assert email_submission.delivery.client_id == user.pk
+    assert submissions[results[1]["id"]].sender.email_address == (
+        "erp+testform@jhgk.com"  # /PS-IGNORE
+    )
+    assert mock_send_email.call_args_list == [
+        mock.call(
+            kwargs={"submission_id": results[0]["id"], "action_name": "email"},
+            producer=mock.ANY,
+        )
+    ]
+    # The blacklisted sender's submission is saved but not sent.
+    assert mock_send_gov_notify_email.call_count == 1
+
+
+@pytest.mark.django_db
+def test_submission_batch_outbox(api_client, email_action_payload, settings):
+    settings.SUBMISSION_OUTBOX_ENABLED = True
+
+    response = api_client.post(
+        reverse("api:submission-batch"),
+        data=[email_action_payload, email_action_payload],
+        format="json",
+    )
+
+    assert response.status_code == 200
+    assert models.OutboxMessage.objects.count() == 2
+    assert models.Sender.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_submission_batch_rate_limited(api_client, gov_notify_email_action_payload, settings):
+    settings.SUBMISSION_OUTBOX_ENABLED = True
+    settings.RATELIMIT_RATE = "2/m"
+
+    response = api_client.post(
+        reverse("api:submission-batch"),
+        data=[gov_notify_email_action_payload] * 3,
+        format="json",
+    )
+
+    assert [result["status"] for result in response.json()["results"]] == [201, 201, 429]
+    assert models.Submission.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_submission_batch_too_large(api_client, email_action_payload, settings):
+    settings.SUBMISSION_BATCH_MAX_SIZE = 1
+
+    response = api_client.post(
+        reverse("api:submission-batch"),
+        data=[email_action_payload] * 2,
+        format="json",
+    )
+
+    assert response.status_code == 400
+    assert models.Submission.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_submission_batch_missing_action_name(api_client, email_action_payload):
+    invalid = {**email_action_payload, "meta": {**email_action_payload["meta"]}}
+    del invalid["meta"]["action_name"]
+
+    response = api_client.post(
+        reverse("api:submission-batch"),
+        data=[email_action_payload, invalid],
+        format="json",
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["status"] == 201
+    assert results[1] == {"status": 400, "errors": {"meta": {"action_name": ["This field is required."]}}}
+    assert models.Submission.objects.count() == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("data", ["oops", ["oops"]])
+def test_submission_batch_data_not_an_object(api_client, email_action_payload, data):
+    response = api_client.post(
+        reverse("api:submission-batch"),
+        data=[{**email_action_payload, "data": data}, email_action_payload],
+        format="json",
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0] == {"status": 400, "errors": {"data": ["Expected an object."]}}
+    assert results[1]["status"] == 201
+    assert models.Submission.objects.count() == 1
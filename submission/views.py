@@ -1,22 +1,36 @@
+import io
+import itertools
+import uuid
+from contextlib import nullcontext
+
+from django.conf import settings
 from django.db import transaction
 from django.http import Http404
 from django.shortcuts import get_list_or_404
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import APIException, AuthenticationFailed, ValidationError
+from rest_framework.fields import ListField
 from rest_framework.generics import CreateAPIView, DestroyAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from client.authentication import ClientSenderIdAuthentication
+from core import jsonstream, metrics
 from submission import constants, helpers, serializers, tasks
-from submission.models import Submission
+from submission.models import Sender, Submission
 
 
 class Ratelimited(Exception):
     pass
 
 
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request body too large."
+    default_code = "request_too_large"
+
+
 # API V1 - LEGACY
 
 
@@ -31,15 +45,57 @@ class SubmissionCreateAPIView(CreateAPIView):
     serializer_class = serializers.SubmissionModelSerializer
     authentication_classes = [ClientSenderIdAuthentication]
 
-    def perform_ratelimit_check(self, submission):
-        if helpers.is_ratelimited(submission.ip_address):
-            submission.sender.blacklist(reason=constants.IP_RESTRICTED)
+    @staticmethod
+    def get_admission_details(data):
+        """The sender's IP and email address from the raw payload, or None where they are missing."""
+        try:
+            meta = data["meta"]
+            ip_address = (meta.get("sender") or {}).get("ip_address")
+        except (KeyError, TypeError, AttributeError):
+            return None, None
+        try:
+            email_address = helpers.get_sender_email_address(meta)
+        except (KeyError, TypeError, IndexError):
+            email_address = None
+        return ip_address, email_address
+
+    def perform_ratelimit_check(self, data, client_id):
+        """
+        Refuse blocked or rate limited traffic before the payload is validated or anything is written to the
+        database. Rejections are only counted in core.metrics.
+        """
+
+        ip_address, email_address = self.get_admission_details(data)
+        if helpers.blocklist.is_blocked(
+            email_address=email_address, ip_address=ip_address
+        ):
+            metrics.increment("submission.rejected.blocked")
+            raise Ratelimited
+        exceeded = helpers.is_ratelimited(
+            ip_address=ip_address,
+            sender_email_address=email_address,
+            client_id=client_id,
+        )
+        if exceeded:
+            metrics.increment(f"submission.rejected.{exceeded}")
+            if exceeded == "ip" and email_address:
+                sender, _ = Sender.objects.get_or_create(email_address=email_address)
+                sender.blacklist(reason=constants.IP_RESTRICTED, ip_address=ip_address)
             raise Ratelimited
 
+    def create(self, request, *args, **kwargs):
+        self.perform_ratelimit_check(request.data, request.user.pk)
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        super().perform_create(serializer)
-        self.perform_ratelimit_check(serializer.instance)
-        tasks.execute_for_submission(serializer.instance)
+        # With the outbox enabled the submission and its outbox message are committed together.
+        with (
+            transaction.atomic()
+            if settings.SUBMISSION_OUTBOX_ENABLED
+            else nullcontext()
+        ):
+            super().perform_create(serializer)
+            tasks.execute_for_submission(serializer.instance)
 
     def handle_exception(self, exc):
         if isinstance(exc, Ratelimited):
@@ -49,6 +105,83 @@ class SubmissionCreateAPIView(CreateAPIView):
         return super().handle_exception(exc)
 
 
+@extend_schema(methods=["POST"], description="Submit a batch of forms")
+class SubmissionBatchCreateAPIView(SubmissionCreateAPIView):
+    """
+    Batch variant of the V1 /submission endpoint for clients that buffer submissions, e.g. to replay them after
+    an outage. Takes a list of up to SUBMISSION_BATCH_MAX_SIZE submissions and returns a result for each, in
+    order: its status code and either the id of the submission created or the errors. Each submission is still
+    subject to the blocklist and rate limits.
+
+    The request is authenticated once, the submissions created by helpers.bulk_create_submissions and their
+    actions queued together.
+    """
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or len(items) > settings.SUBMISSION_BATCH_MAX_SIZE:
+            return Response(
+                {"detail": f"Expected a list of up to {settings.SUBMISSION_BATCH_MAX_SIZE} submissions."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [None] * len(items)
+        submissions = {}
+        for index, item in enumerate(items):
+            try:
+                self.perform_ratelimit_check(item, request.user.pk)
+                submissions[index] = self.build_submission(item)
+            except Ratelimited:
+                results[index] = {"status": status.HTTP_429_TOO_MANY_REQUESTS}
+            except ValidationError as exc:
+                results[index] = {"status": status.HTTP_400_BAD_REQUEST, "errors": exc.detail}
+
+        created = list(submissions.values())
+        # With the outbox enabled the submissions and their outbox messages are committed together.
+        with transaction.atomic():
+            helpers.bulk_create_submissions(created)
+            if settings.SUBMISSION_OUTBOX_ENABLED:
+                tasks.execute_for_submissions(created)
+        if not settings.SUBMISSION_OUTBOX_ENABLED:
+            tasks.execute_for_submissions(created)
+
+        for index, submission in submissions.items():
+            results[index] = {"status": status.HTTP_201_CREATED, "id": submission.pk}
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    def build_submission(self, item):
+        """An unsaved submission for the item, raising ValidationError if it would be refused by /submission."""
+
+        if not isinstance(item, dict) or not isinstance(item.get("meta"), dict) or "data" not in item:
+            raise ValidationError({"non_field_errors": ["Expected an object with data and meta."]})
+        # Every action's kwargs are built by unpacking data.
+        if not isinstance(item["data"], dict):
+            raise ValidationError({"data": ["Expected an object."]})
+        # SubmissionModelSerializer.to_internal_value reads the action name before validating anything.
+        if "action_name" not in item["meta"]:
+            raise ValidationError({"meta": {"action_name": ["This field is required."]}})
+        serializer = self.get_serializer(data=item)
+        serializer.is_valid(raise_exception=True)
+        validated_data = serializer.validated_data
+        meta = validated_data["meta"]
+        if meta.get("action_name") not in tasks.action_map:
+            raise ValidationError({"meta": {"action_name": ["Unknown action."]}})
+        try:
+            helpers.get_sender_email_address(meta)
+        except (KeyError, TypeError, IndexError):
+            raise ValidationError({"meta": {"sender": ["Missing sender email address."]}})
+        submission = Submission(
+            data=validated_data["data"],
+            meta=meta,
+            form_url=validated_data["form_url"],
+            client=validated_data["client"],
+            action_name=meta["action_name"],
+        )
+        # The action's kwargs are validated here, as execute_for_submission does for /submission.
+        tasks.get_action_kwargs(submission)
+        return submission
+
+
 class SubmissionDestroyAPIView(SubmissionCreateAPIView, DestroyAPIView):
     """
     Deletes all entries for a particular email within directory-forms-api.
@@ -78,74 +211,223 @@ class APIBase(APIView):
     authentication_classes = [ClientSenderIdAuthentication]
 
 
-@extend_schema(methods=["POST"], description="Gov.notify Bulk Email")
-class GovNotifyBulkEmailAPIView(APIBase):
+class BulkAcknowledgement:
     """
-    This endpoint accepts emails submissions for Gov.notify. It is capable of accepting single or bulk
-    submissions (where the same email is to be sent to multiple recipients).
+    The compact response to a V2 bulk request: a batch id, saved in the meta of every submission created, the
+    number of entries accepted and rejected, the range of the ids of the submissions created and the errors of the
+    rejected entries by their index. The id range may include submissions created by concurrent requests, whereas
+    the batch id identifies the batch's submissions exactly.
+    """
+
+    def __init__(self):
+        self.batch_id = str(uuid.uuid4())
+        self.accepted = 0
+        self.errors = {}
+        self.first_id = None
+        self.last_id = None
+
+    def add_submissions(self, submissions):
+        if not submissions:
+            return
+        ids = [submission.pk for submission in submissions]
+        if self.first_id is not None:
+            ids += [self.first_id, self.last_id]
+        self.first_id, self.last_id = min(ids), max(ids)
+        self.accepted += len(submissions)
+
+    @property
+    def data(self):
+        return {
+            "batch_id": self.batch_id,
+            "accepted": self.accepted,
+            "rejected": len(self.errors),
+            "submission_ids": {"first": self.first_id, "last": self.last_id} if self.accepted else None,
+            "errors": self.errors,
+        }
+
+
+class BulkSubmissionAPIBase(APIBase):
+    """
+    Base class for the V2 endpoints creating a submission for each entry of the list entries_field, validated by
+    serializer_class. Requests over BULK_SUBMISSION_MAX_BYTES or BULK_SUBMISSION_MAX_ENTRIES are refused before
+    their entries are validated.
+
+    With ?stream=true the body is parsed by core.jsonstream, and the entries validated and saved
+    SUBMISSION_BULK_CREATE_BATCH_SIZE at a time as they are read, so memory use does not grow with their number.
+    The other fields must then precede entries_field, and the response holds them and the count of entries saved
+    rather than echoing the entries. Either way the entries are saved in one transaction, and none are saved if any
+    is invalid.
+
+    With ?response=compact or a "Prefer: return=minimal" header the valid entries are saved even if others are
+    invalid, and the response is a BulkAcknowledgement rather than an echo of the request.
     """
 
+    serializer_class = None
+    entries_field = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if int(request.META.get("CONTENT_LENGTH") or 0) > settings.BULK_SUBMISSION_MAX_BYTES:
+            raise RequestTooLarge(f"Expected a request body of up to {settings.BULK_SUBMISSION_MAX_BYTES} bytes.")
+
+    @staticmethod
+    def is_compact(request):
+        preferences = [preference.strip() for preference in request.headers.get("Prefer", "").split(",")]
+        return request.query_params.get("response") == "compact" or "return=minimal" in preferences
+
+    def build_submission(self, fields, entry):
+        """An unsaved submission for the entry, given the validated fields other than entries_field."""
+        raise NotImplementedError
+
+    def get_too_many_entries_error(self):
+        message = ListField.default_error_messages["max_length"].format(
+            max_length=settings.BULK_SUBMISSION_MAX_ENTRIES
+        )
+        return {self.entries_field: [message]}
+
     def post(self, request):
-        """
-        Acts as a wrapper for SubmissionModelSerializer, taking email data is a list of dicts ('bulk_email_entries')
-        and calling the SubmissionModelSerializer for each, saving a Submission entry in the DB. This is picked up by
-        a scheduled task for email delivery.
-
-        POST request data params:
-        template_id: The gov.notify email template id to be used for the email.
-        bulk_email_entries: List of dicts representing email data. MUST have an 'email_address' key.
-        email_reply_to_id: Reply to email (optional).
-        """
+        acknowledgement = BulkAcknowledgement() if self.is_compact(request) else None
+        if request.query_params.get("stream") == "true":
+            return self.post_stream(request, acknowledgement)
+
+        entries = request.data.get(self.entries_field) if isinstance(request.data, dict) else None
+        if isinstance(entries, list) and len(entries) > settings.BULK_SUBMISSION_MAX_ENTRIES:
+            return Response(self.get_too_many_entries_error(), status=status.HTTP_400_BAD_REQUEST)
+
+        if acknowledgement is not None and isinstance(entries, list):
+            fields = {key: value for key, value in request.data.items() if key != self.entries_field}
+            validated_fields = self.validate_fields(fields).validated_data
+            with transaction.atomic():
+                self.save_entries(validated_fields, iter(entries), acknowledgement)
+            return self.acknowledge(acknowledgement)
 
-        serializer = serializers.GovNotifyBulkEmailSerializer(data=request.data)
+        serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
-            # Create a submission entry for each entry in the bulk_email_entries dict submitted
+            # Create a submission entry for each entry submitted, with one INSERT per
+            # SUBMISSION_BULK_CREATE_BATCH_SIZE entries.
             with transaction.atomic():
                 # We use request.data rather than serializer.data here to retain unknown dict keys
-                # that would otherwise be removed by the GovNotifyBulkEmailEntrySerializer.
-                for entry in request.data["bulk_email_entries"]:
-                    submission_data = {
-                        "data": entry,
-                        "meta": {
-                            "action_name": constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
-                            "template_id": serializer.data["template_id"],
-                            "email_address": entry["email_address"],
-                        },
-                    }
-
-                    submission = serializers.SubmissionModelSerializer(
-                        data=submission_data, context={"request": request}
-                    )
-                    if submission.is_valid(raise_exception=True):
-                        submission.save()
-
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+                # that would otherwise be removed by the entry serializers.
+                helpers.bulk_create_submissions(
+                    self.build_submission(serializer.validated_data, entry) for entry in entries
+                )
+
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def validate_fields(self, fields):
+        """The validated fields other than entries_field, raising ValidationError if any is invalid."""
+        serializer = self.serializer_class(data={**fields, self.entries_field: []})
+        serializer.is_valid(raise_exception=True)
+        return serializer
 
-@extend_schema(methods=["POST"], description="HCSat Feedback Bulk Submission")
-class HCSatAPIView(APIBase):
+    def save_entries(self, validated_fields, entries, acknowledgement=None):
+        """
+        Validate and save the entries read from the iterator SUBMISSION_BULK_CREATE_BATCH_SIZE at a time,
+        returning the count read. Invalid entries are recorded in the acknowledgement when there is one, and
+        otherwise raise ValidationError.
+        """
 
-    def post(self, request):
-        serializer = serializers.HCSatSerializer(data=request.data)
-        if serializer.is_valid():
-            # Create a submission entry for each entry in the hcsat_feedback_entries dict submitted
-            with transaction.atomic():
-                for entry in request.data["hcsat_feedback_entries"]:
-                    submission_data = {
-                        "data": entry,
-                        "meta": {
-                            "action_name": constants.ACTION_NAME_HCSAT_SUBMISSION,
-                        },
-                    }
-
-                    submission = serializers.SubmissionModelSerializer(
-                        data=submission_data, context={"request": request}
-                    )
-                    if submission.is_valid(raise_exception=True):
-                        submission.save()
-
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+        entry_serializer_class = type(self.serializer_class().fields[self.entries_field].child)
+        count = 0
+        while True:
+            batch = list(itertools.islice(entries, settings.SUBMISSION_BULK_CREATE_BATCH_SIZE))
+            if not batch:
+                return count
+            if count + len(batch) > settings.BULK_SUBMISSION_MAX_ENTRIES:
+                raise ValidationError(self.get_too_many_entries_error())
+            entry_serializer = entry_serializer_class(data=batch, many=True)
+            errors = {} if entry_serializer.is_valid() else {
+                index: error for index, error in enumerate(entry_serializer.errors, start=count) if error
+            }
+            if errors and acknowledgement is None:
+                raise ValidationError({self.entries_field: errors})
+            submissions = []
+            for index, entry in enumerate(batch, start=count):
+                if index not in errors:
+                    submissions.append(self.build_submission(validated_fields, entry))
+                    if acknowledgement is not None:
+                        submissions[-1].meta["batch_id"] = acknowledgement.batch_id
+            created = helpers.bulk_create_submissions(submissions)
+            if acknowledgement is not None:
+                acknowledgement.errors.update(errors)
+                acknowledgement.add_submissions(created)
+            count += len(batch)
+
+    def post_stream(self, request, acknowledgement=None):
+        fields = {}
+        count = None
+        with transaction.atomic():
+            for key, value in jsonstream.iter_object(request.stream or io.BytesIO(), self.entries_field):
+                if key == self.entries_field:
+                    count = self.save_entries(self.validate_fields(fields).validated_data, value, acknowledgement)
+                else:
+                    fields[key] = value
+            if count is None:
+                raise ValidationError({self.entries_field: ["This field is required."]})
+            # Fields following the entries are validated once they have all been read.
+            data = self.validate_fields(fields).data
+
+        if acknowledgement is not None:
+            return self.acknowledge(acknowledgement)
+        del data[self.entries_field]
+        return Response({**data, "count": count}, status=status.HTTP_201_CREATED)
+
+    def acknowledge(self, acknowledgement):
+        # A 400 only when every entry was rejected, an empty list is accepted as it is by the full response.
+        rejected = acknowledgement.errors and not acknowledgement.accepted
+        response = Response(
+            acknowledgement.data,
+            status=status.HTTP_400_BAD_REQUEST if rejected else status.HTTP_201_CREATED,
+        )
+        response["Preference-Applied"] = "return=minimal"
+        return response
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@extend_schema(methods=["POST"], description="Gov.notify Bulk Email")
+class GovNotifyBulkEmailAPIView(BulkSubmissionAPIBase):
+    """
+    This endpoint accepts emails submissions for Gov.notify. It is capable of accepting single or bulk
+    submissions (where the same email is to be sent to multiple recipients).
+
+    Takes email data as a list of dicts ('bulk_email_entries'), validated by GovNotifyBulkEmailSerializer, and
+    saves a Submission entry in the DB for each. These are picked up by a scheduled task for email delivery.
+
+    POST request data params:
+    template_id: The gov.notify email template id to be used for the email.
+    bulk_email_entries: List of dicts representing email data. MUST have an 'email_address' key.
+    email_reply_to_id: Reply to email (optional).
+    """
+
+    serializer_class = serializers.GovNotifyBulkEmailSerializer
+    entries_field = "bulk_email_entries"
+
+    def build_submission(self, fields, entry):
+        return Submission(
+            data=entry,
+            meta={
+                "action_name": constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+                "template_id": fields["template_id"],
+                "email_address": entry["email_address"],
+            },
+            action_name=constants.ACTION_NAME_GOV_NOTIFY_BULK_EMAIL,
+            form_url="",
+            client=self.request.user,
+        )
+
+
+@extend_schema(methods=["POST"], description="HCSat Feedback Bulk Submission")
+class HCSatAPIView(BulkSubmissionAPIBase):
+
+    serializer_class = serializers.HCSatSerializer
+    entries_field = "hcsat_feedback_entries"
+
+    def build_submission(self, fields, entry):
+        return Submission(
+            data=entry,
+            meta={"action_name": constants.ACTION_NAME_HCSAT_SUBMISSION},
+            action_name=constants.ACTION_NAME_HCSAT_SUBMISSION,
+            form_url="",
+            client=self.request.user,
+        )